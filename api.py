@@ -1,26 +1,52 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form, BackgroundTasks
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from agent_lang.agent import get_agent_executor
 from langchain_core.messages import HumanMessage
+from pipeline.pipeline_runner import run_pipeline
+from pipeline.manifest import JobManifest, manifest_path
+from merge_video.encoding import ENCODER_PROFILES
+from srt.alignment_pool import get_alignment_metrics, warm_up as warm_up_whisper
+from task_store.task_store import get_task_store
+from job_queue.job_queue import JOB_RETRY_AFTER, QueueFullError, get_job_queue
+from pipeline.stage_limits import get_stage_limit_metrics
+from progress.progress_events import current_run, emit, format_sse, get_progress_bus, is_terminal, TERMINAL_STATUSES
+from upload_store.upload_store import (
+    UPLOAD_MAX_BYTES,
+    UnsupportedUploadType,
+    UploadTooLarge,
+    forget_uploads,
+    is_upload_path,
+    purge_uploads,
+    save_upload,
+)
+from common.result_files import publish_result
+from common.static_files import ResultStaticFiles
+from workspace.job_workspace import JobWorkspace, use_workspace, OUTPUT_FILES_DIR
 import os
 import time
-import shutil
 import uuid
 import asyncio
 import websocket
 import ssl  
-from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 
 load_dotenv()
 
 app = FastAPI()
-OUTPUT_FILES_DIR = "output_files"
 DOMAIN_URL="https://haeksimnoonsongi-production-9a31.up.railway.app/"
+# 결과 파일을 CDN / Caddy 등이 output_files 폴더에서 직접 제공할 때의 기준 URL
+# (예: https://cdn.example.com/results → https://cdn.example.com/results/{task_id}/output.{hash}.mp4)
+# 비워두면 이 서버의 /static 경로를 사용합니다.
+RESULT_BASE_URL = os.getenv("RESULT_BASE_URL", "")
+# 생성 방식: "pipeline" (툴을 고정 순서로 직접 실행) 또는 "agent" (LLM 에이전트가 툴 실행)
+GENERATION_MODES = ("pipeline", "agent")
+DEFAULT_GENERATION_MODE = os.getenv("GENERATION_MODE", "pipeline")
 os.makedirs(OUTPUT_FILES_DIR, exist_ok=True) 
 
-app.mount("/static", StaticFiles(directory=OUTPUT_FILES_DIR), name="static")
+# Range 요청(영상 탐색) + ETag + 내용 해시 파일은 Cache-Control: immutable (CDN의 원본 서버로도 사용 가능)
+app.mount("/static", ResultStaticFiles(directory=OUTPUT_FILES_DIR), name="static")
 
 # 1. CORS 설정 (프론트엔드와 통신하기 위해 필수)
 app.add_middleware(
@@ -30,7 +56,76 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-tasks = {} 
+# 업로드를 받는 경로 / 파일 외 form 필드(prompt 등)에 허용하는 여유 크기
+UPLOAD_PATHS = ("/api/generate",)
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Content-Length가 한도를 넘으면 본문을 받기 전에 바로 거절 (413)
+    if request.method == "POST" and request.url.path in UPLOAD_PATHS:
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > UPLOAD_MAX_BYTES + FORM_OVERHEAD_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"업로드 파일은 최대 {UPLOAD_MAX_BYTES // (1024 * 1024)}MB까지 가능합니다."},
+            )
+    return await call_next(request)
+
+# 작업 상태 저장소 (TASK_STORE=memory | sqlite, sqlite는 여러 worker가 공유)
+tasks = get_task_store()
+# 생성 작업 대기열 (JOB_WORKERS개만 동시에 실행, JOB_QUEUE_MAX개까지 대기)
+job_queue = get_job_queue()
+
+
+@app.on_event("startup")
+async def warm_up_models():
+    # WHISPER_WARMUP=1 이면 서버 시작 시 Whisper 모델을 미리 로드 (요청 처리를 막지 않도록 스레드에서 실행)
+    if os.getenv("WHISPER_WARMUP", "0") == "1":
+        asyncio.get_running_loop().run_in_executor(None, warm_up_whisper)
+
+
+# 끝난 작업 정리 주기 (초)
+TASK_PURGE_INTERVAL = int(os.getenv("TASK_PURGE_INTERVAL", "600"))
+
+
+def _is_active_task(task_id: str) -> bool:
+    task = tasks.get(task_id)
+    return task is not None and task.get("status") in ("queued", "processing")
+
+
+@app.on_event("startup")
+async def start_task_purge():
+    # TTL이 지난 완료/실패 작업을 주기적으로 저장소에서 삭제하고, 오래된 업로드 파일도 정리
+    async def _purge_loop():
+        while True:
+            await asyncio.sleep(TASK_PURGE_INTERVAL)
+            try:
+                removed = await asyncio.to_thread(tasks.purge_expired)
+                if removed:
+                    # 만료된 작업(실패한 작업 포함)의 중간 파일과 결과물(output_files/{task_id})도 함께 삭제
+                    for task_id in removed:
+                        await _cleanup_workspace(JobWorkspace(task_id), results=True)
+                    print(f"🧹 만료된 작업 {len(removed)}개 삭제")
+            except Exception as e:
+                print(f"⚠️ 작업 저장소 정리 실패: {e}")
+            try:
+                await asyncio.to_thread(purge_uploads, _is_active_task)
+            except Exception as e:
+                print(f"⚠️ 업로드 파일 정리 실패: {e}")
+
+    asyncio.create_task(_purge_loop())
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
 
 class ChatRequest(BaseModel):
     prompt: str  # 프론트에서 { "prompt": "노래 만들어줘" } 형태로 보냄
@@ -39,6 +134,14 @@ class ChatRequest(BaseModel):
 async def test_api():
     return {"status": "ok", "message": "API server is running normally!"}
 
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "alignment": get_alignment_metrics(),
+        "job_queue": job_queue.snapshot(),
+        "stage_limits": get_stage_limit_metrics(),
+    }
+
 @app.get("/api/test2")
 async def test_websocket_connection():
     """
@@ -141,64 +244,127 @@ async def test_cloud_urls():
     return results
 
 
-async def process_generation(task_id: str, prompt: str, file_path: str):
+async def run_agent(prompt: str, file_path: str, workspace: JobWorkspace) -> str:
+    """LLM 에이전트가 툴 순서를 정해서 실행하는 기존 방식. 최종 파일 경로를 반환합니다."""
+    # 에이전트 실행 준비
+    combined_prompt = f"{prompt}\n\n[Attached File Path: {file_path}]"
+    agent_executor = get_agent_executor()
 
-    try:
-        # 상태 업데이트: 처리 중
-        tasks[task_id]["status"] = "processing"
-        print(f"🔄 [Task {task_id}] 백그라운드 작업 시작...")
-
-        # 에이전트 실행 준비
-        combined_prompt = f"{prompt}\n\n[Attached File Path: {file_path}]"
-        agent_executor = get_agent_executor()
-
-        # 여기서 시간이 오래 걸림 (노래/영상 생성)
+    # 여기서 시간이 오래 걸림 (노래/영상 생성)
+    # with 블록 안에서 실행되는 툴들은 모두 이 작업의 workspace에 파일을 씀
+    with use_workspace(workspace):
         response = await agent_executor.ainvoke({
             "messages": [HumanMessage(content=combined_prompt)]
         })
 
-        # 결과 추출
-        final_path = ""
-        if "messages" in response and response["messages"]:
-            last_message = response['messages'][-1]
-
-            # last_message가 content 속성을 가진 객체인 경우
-            if hasattr(last_message, 'content'):
-                content = last_message.content
+    # 결과 추출
+    final_path = ""
+    if "messages" in response and response["messages"]:
+        last_message = response['messages'][-1]
 
-                # content가 리스트인 경우 (현재 상황)
-                if isinstance(content, list) and len(content) > 0:
-                    first_item = content[0]
+        # last_message가 content 속성을 가진 객체인 경우
+        if hasattr(last_message, 'content'):
+            content = last_message.content
 
-                    # 딕셔너리이고 'text' 키가 있는 경우
-                    if isinstance(first_item, dict) and 'text' in first_item:
-                        final_path = first_item['text']
-                    else:
-                        final_path = str(first_item)
+            # content가 리스트인 경우 (현재 상황)
+            if isinstance(content, list) and len(content) > 0:
+                first_item = content[0]
 
-                # content가 문자열인 경우
-                elif isinstance(content, str):
-                    final_path = content
+                # 딕셔너리이고 'text' 키가 있는 경우
+                if isinstance(first_item, dict) and 'text' in first_item:
+                    final_path = first_item['text']
                 else:
-                    final_path = str(content)
+                    final_path = str(first_item)
 
-            # last_message가 문자열인 경우
-            elif isinstance(last_message, str):
-                final_path = last_message
+            # content가 문자열인 경우
+            elif isinstance(content, str):
+                final_path = content
             else:
-                final_path = str(last_message)
+                final_path = str(content)
 
-        elif "output" in response:
-            final_path = response.get("output", "")
+        # last_message가 문자열인 경우
+        elif isinstance(last_message, str):
+            final_path = last_message
         else:
-            final_path = "No output generated"
+            final_path = str(last_message)
+
+    elif "output" in response:
+        final_path = response.get("output", "")
+    else:
+        final_path = "No output generated"
+
+    # 문자열이 아닌 경우 변환
+    if not isinstance(final_path, str):
+        final_path = str(final_path)
+
+    return final_path
+
+
+def _update_task(task_id: str, **fields):
+    """작업 상태를 저장하고, 같은 내용을 진행 이벤트(status)로도 알림 (/api/events 구독자에게 전달)"""
+    tasks.update(task_id, **fields)
+    emit("status", task_id=task_id, **fields)
+
 
-        # 문자열이 아닌 경우 변환
-        if not isinstance(final_path, str):
-            final_path = str(final_path)
+def _queue_full_error(e: QueueFullError) -> HTTPException:
+    """대기열이 가득 찼을 때의 429 응답 (잠시 후 다시 요청하도록 Retry-After 포함)"""
+    return HTTPException(
+        status_code=429,
+        detail={
+            "message": "대기 중인 작업이 너무 많습니다. 잠시 후 다시 시도하세요.",
+            "queued": e.queued,
+            "max_queue": e.max_size,
+        },
+        headers={"Retry-After": str(JOB_RETRY_AFTER)},
+    )
+
+
+async def _cleanup_workspace(workspace: JobWorkspace, results: bool = False):
+    """작업 중간 파일(results면 결과물까지)과 업로드 MIME 기록을 삭제합니다."""
+    await asyncio.to_thread(workspace.remove if results else workspace.cleanup)
+    forget_uploads(workspace)
+
+
+def _static_url(task_id: str, file_name: str) -> str:
+    """output_files/{task_id}/ 안의 파일을 외부에서 받을 수 있는 URL (RESULT_BASE_URL이 있으면 CDN 주소)"""
+    if RESULT_BASE_URL:
+        return f"{RESULT_BASE_URL.rstrip('/')}/{task_id}/{file_name.replace(os.path.sep, '/')}"
+    base_url = DOMAIN_URL.rstrip('/')
+    return f"{base_url}/static/{task_id}/{file_name.replace(os.path.sep, '/')}"
+
+
+async def process_generation(task_id: str, prompt: str, file_path: str, mode: str = DEFAULT_GENERATION_MODE,
+                             profile: str = None):
+
+    # 작업별 전용 폴더 (files/jobs/{task_id}, output_files/{task_id})
+    workspace = JobWorkspace(task_id)
+
+    try:
+        # 상태 업데이트: 처리 중
+        _update_task(task_id, status="processing")
+        print(f"🔄 [Task {task_id}] 백그라운드 작업 시작... (mode: {mode}, workspace: {workspace.root})")
+
+        if mode == "pipeline":
+            def on_stage_done(stage: str, output):
+                # 최종 인코딩을 기다리지 않고 미리보기 영상을 먼저 공개
+                if stage == "preview" and output.path:
+                    preview_url = _static_url(task_id, os.path.basename(output.path))
+                    tasks.update(task_id, preview=preview_url)
+                    emit("preview", task_id=task_id, url=preview_url)
+                    print(f"👀 [Task {task_id}] 미리보기 공개: {preview_url}")
+
+            # 에이전트 없이 lyric → song → srt → prompt → video → merge 를 직접 실행
+            result = await run_pipeline(
+                file_path, prompt, workspace, encoder_profile=profile, on_stage_done=on_stage_done
+            )
+            final_path = result.output_path
+            tasks.update(task_id, timings=result.timings)
+        else:
+            final_path = await run_agent(prompt, file_path, workspace)
 
         processed_path = final_path.strip()
         final_url = processed_path
+        published = False
 
         if DOMAIN_URL and not processed_path.startswith("http"):
 
@@ -206,34 +372,35 @@ async def process_generation(task_id: str, prompt: str, file_path: str):
             file_name = os.path.basename(processed_path)
 
             # 2. 파일 복사/이동 (Agent가 생성한 파일이 존재할 경우)
+            #    이름에 내용 해시를 붙여 output_files/{task_id}에 둠 (output.mp4 → output.{hash}.mp4)
             if os.path.exists(processed_path):
-                destination_path = os.path.join(OUTPUT_FILES_DIR, file_name)
-                if os.path.abspath(processed_path) != os.path.abspath(destination_path):
-                    shutil.copy(processed_path, destination_path)
-                    print(f"결과 파일 output_files로 복사 (덮어쓰기) 완료: {destination_path}")
-                else:
-                    print("동일 파일 경로 감지: copy 수행하지 않음.")
+                published_path = await asyncio.to_thread(publish_result, processed_path, workspace.output_dir)
+                file_name = os.path.basename(published_path)
+                published = True
+                print(f"결과 파일 공개: {published_path}")
 
-            # 3. URL 생성: https://도메인/static/파일명
-            base_url = DOMAIN_URL.rstrip('/')
-            final_url = f"{base_url}/static/{file_name.replace(os.path.sep, '/')}"
+            # 3. URL 생성: https://도메인/static/{task_id}/파일명
+            final_url = _static_url(task_id, file_name)
 
         # 작업 완료 처리
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["result"] = final_url
+        _update_task(task_id, status="completed", result=final_url)
         print(f"✅ [Task {task_id}] 작업 완료: {final_url}")
 
+        # 결과가 output_files로 공개되었으면 중간 파일(files/jobs/{task_id})은 필요 없음
+        # (공개하지 않은 경우와 실패한 작업은 작업 기록이 만료될 때 정리)
+        if published:
+            await _cleanup_workspace(workspace)
+
     except Exception as e:
         print(f"❌ [Task {task_id}] 에러 발생: {e}")
         import traceback
         traceback.print_exc()
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["error"] = str(e)
+        _update_task(task_id, status="failed", error=str(e))
 
 
 async def process_fake_generation(task_id: str, prompt: str, wait_time: int):
     try:
-        tasks[task_id]["status"] = "processing"
+        _update_task(task_id, status="processing")
         print(f"🔄 [Fake Task {task_id}] 가짜 작업 시작. {wait_time}초 대기...")
 
         await asyncio.sleep(wait_time)
@@ -246,16 +413,17 @@ async def process_fake_generation(task_id: str, prompt: str, wait_time: int):
         # 파일 이름만 URL에 붙여서 /static/파일명 형태로 생성
         final_url = f"{base_url}/static/{processed_path.replace(os.path.sep, '/')}" 
 
-
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["result"] = final_url
-        tasks[task_id]["message"] = f"Fake completed after {wait_time} seconds with prompt: {prompt}"
+        _update_task(
+            task_id,
+            status="completed",
+            result=final_url,
+            message=f"Fake completed after {wait_time} seconds with prompt: {prompt}",
+        )
         print(f"✅ [Fake Task {task_id}] 가짜 작업 완료: {final_url}")
 
     except Exception as e:
         print(f"❌ [Fake Task {task_id}] 에러 발생: {e}")
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["error"] = str(e)
+        _update_task(task_id, status="failed", error=str(e))
 
 
 # --- [추가] 로컬 환경 테스트용 가짜 작업 처리 함수 ---
@@ -264,7 +432,7 @@ async def process_local_fake_generation(task_id: str, prompt: str, wait_time: in
     LOCAL_URL = "http://127.0.0.1:8000" 
 
     try:
-        tasks[task_id]["status"] = "processing"
+        _update_task(task_id, status="processing")
         print(f"🔄 [Local Fake Task {task_id}] 로컬 테스트 시작. {wait_time}초 대기...")
 
         await asyncio.sleep(wait_time)
@@ -274,57 +442,79 @@ async def process_local_fake_generation(task_id: str, prompt: str, wait_time: in
         # URL 생성: 로컬 주소와 /static/파일명 형태로 생성
         final_url = f"{LOCAL_URL}/static/{processed_path.replace(os.path.sep, '/')}" 
 
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["result"] = final_url
-        tasks[task_id]["message"] = f"Local Fake completed after {wait_time} seconds with prompt: {prompt}"
+        _update_task(
+            task_id,
+            status="completed",
+            result=final_url,
+            message=f"Local Fake completed after {wait_time} seconds with prompt: {prompt}",
+        )
         print(f"✅ [Local Fake Task {task_id}] 가짜 작업 완료: {final_url}")
 
     except Exception as e:
         print(f"❌ [Local Fake Task {task_id}] 에러 발생: {e}")
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["error"] = str(e)
+        _update_task(task_id, status="failed", error=str(e))
 
 
 @app.post("/api/generate")
 async def generate_response(
-    background_tasks: BackgroundTasks, # FastAPI의 백그라운드 기능
     prompt: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    mode: str = Form(DEFAULT_GENERATION_MODE),
+    profile: str = Form(None),
+    priority: int = Form(0)   # 클수록 먼저 실행 (같으면 먼저 들어온 순서)
 ):
-    try:
-        # [핵심 수정 6] 파일 이름 중복 방지: UUID와 원래 파일명 조합
-        original_file_name = file.filename
-        unique_file_name = f"{uuid.uuid4()}_{original_file_name}"
+    if mode not in GENERATION_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {GENERATION_MODES}")
+    if profile is not None and profile not in ENCODER_PROFILES:
+        raise HTTPException(status_code=400, detail=f"profile must be one of {tuple(ENCODER_PROFILES)}")
+    # 업로드 파일을 저장하기 전에 먼저 거절
+    if job_queue.is_full():
+        raise _queue_full_error(QueueFullError(job_queue.snapshot()["queued"], job_queue.max_size))
 
-        # 1. 파일 서버에 저장하기 (프로젝트 루트 폴더에 임시 저장)
-        file_path = unique_file_name
-
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # 절대 경로로 변환 (에이전트가 파일을 확실히 찾을 수 있도록)
-        abs_file_path = os.path.abspath(file_path)
-
-        # 2. 작업 ID 생성 (대기표 번호)
+    try:
+        # 1. 작업 ID 생성 (대기표 번호)
         task_id = str(uuid.uuid4())
+        workspace = JobWorkspace(task_id)
+
+        # 2. 업로드 파일을 작업 폴더(files/jobs/{task_id}/uploads)에 조각 단위로 저장
+        #    (이벤트 루프를 막지 않고, 크기 한도 / 파일 형식을 받는 도중에 확인, 절대 경로 반환)
+        try:
+            abs_file_path, _, _ = await save_upload(file, workspace)
+        except (UploadTooLarge, UnsupportedUploadType) as e:
+            await _cleanup_workspace(workspace)
+            status_code = 413 if isinstance(e, UploadTooLarge) else 415
+            raise HTTPException(status_code=status_code, detail=str(e))
 
         # 3. 작업 목록에 '대기 중'으로 등록
-        tasks[task_id] = {
+        tasks.create(task_id, {
             "status": "queued",
+            "preview": None,
             "result": None,
             "error": None
-        }
+        })
 
-        # 4. 백그라운드 작업 시작 (기다리지 않고 함수만 등록해둠)
-        background_tasks.add_task(process_generation, task_id, prompt, abs_file_path)
+        # 4. 작업 대기열에 등록 (worker가 비는 순서대로 실행)
+        try:
+            position = await job_queue.submit(
+                task_id, process_generation, task_id, prompt, abs_file_path, mode, profile, priority=priority
+            )
+        except QueueFullError as e:
+            _update_task(task_id, status="failed", error=str(e))
+            await _cleanup_workspace(workspace)
+            raise _queue_full_error(e)
+        emit("status", task_id=task_id, status="queued", queue_position=position)
 
         # 5. 즉시 응답 (프론트엔드는 이 task_id를 받아서 로딩 화면을 띄움)
         return {
             "task_id": task_id,
             "status": "queued",
-            "message": "작업이 시작되었습니다. /api/status/{task_id} 로 상태를 확인하세요."
+            "mode": mode,
+            "queue_position": position,
+            "message": "작업이 대기열에 등록되었습니다. /api/status/{task_id} 로 상태를 확인하세요."
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -346,11 +536,11 @@ async def generate_fake_response_async(
 
     task_id = str(uuid.uuid4())
 
-    tasks[task_id] = {
+    tasks.create(task_id, {
         "status": "queued",
         "result": None,
         "error": None
-    }
+    })
 
     # 파일이 넘어왔다면, 파일 저장 및 절대 경로 생성 로직이 필요합니다.
     # 여기서는 가짜 테스트를 위해 파일을 저장하지 않고 바로 가짜 작업으로 넘깁니다.
@@ -380,11 +570,11 @@ async def generate_fake2_async(
 
     task_id = str(uuid.uuid4())
 
-    tasks[task_id] = {
+    tasks.create(task_id, {
         "status": "queued",
         "result": None,
         "error": None
-    }
+    })
 
     # 로컬 전용 가짜 작업 함수 호출
     background_tasks.add_task(process_local_fake_generation, task_id, prompt, wait_time)
@@ -396,11 +586,129 @@ async def generate_fake2_async(
     }
 
 
+@app.post("/api/tasks/{task_id}/retry")
+async def retry_task(task_id: str):
+    """
+    실패한 작업을 다시 실행합니다. (pipeline 모드 전용)
+    manifest에 완료로 기록된 단계와 세그먼트는 건너뛰고 실패한 부분부터 이어서 실행합니다.
+    """
+    task = tasks.get(task_id)
+    if task and task["status"] in ("queued", "processing"):
+        raise HTTPException(status_code=409, detail="Task is still running")
+
+    workspace = JobWorkspace(task_id)
+    if not os.path.exists(manifest_path(workspace)):
+        raise HTTPException(status_code=404, detail="No pipeline manifest for this task (retry is only supported in pipeline mode)")
+
+    saved_input = JobManifest(manifest_path(workspace)).input or {}
+    if not saved_input.get("topic"):
+        raise HTTPException(status_code=404, detail="No pipeline input recorded for this task")
+    if is_upload_path(saved_input["topic"]) and not os.path.exists(saved_input["topic"]):
+        raise HTTPException(status_code=410, detail="Uploaded file for this task has been removed")
+    if job_queue.is_full():
+        raise _queue_full_error(QueueFullError(job_queue.snapshot()["queued"], job_queue.max_size))
+
+    retries = (task or {}).get("retries", 0) + 1
+    tasks.create(task_id, {
+        "status": "queued",
+        "preview": None,
+        "result": None,
+        "error": None,
+        "retries": retries,
+    })
+
+    try:
+        position = await job_queue.submit(
+            task_id,
+            process_generation,
+            task_id,
+            saved_input.get("style"),
+            saved_input["topic"],
+            "pipeline",
+            saved_input.get("encoder_profile"),
+        )
+    except QueueFullError as e:
+        _update_task(task_id, status="failed", error=str(e))
+        raise _queue_full_error(e)
+    emit("status", task_id=task_id, status="queued", queue_position=position, retries=retries)
+
+    return {
+        "task_id": task_id,
+        "status": "queued",
+        "retries": retries,
+        "queue_position": position,
+        "message": "완료된 단계는 건너뛰고 실패한 단계부터 다시 실행합니다."
+    }
+
+
 @app.get("/api/status/{task_id}")
 async def check_status(task_id: str):
     # ID가 없으면 404 에러
-    if task_id not in tasks:
+    task = tasks.get(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task ID not found")
 
+    # 대기 중이면 현재 대기 순번도 함께 반환 (다른 worker 프로세스의 대기열에 있으면 None)
+    if task.get("status") == "queued":
+        task["queue_position"] = job_queue.position(task_id)
+
     # 현재 상태(processing, completed 등)와 결과를 반환
-    return tasks[task_id]
\ No newline at end of file
+    return task
+
+
+# 연결이 끊기지 않도록 이벤트가 없을 때 보내는 주석 메시지 간격 (초)
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+
+@app.get("/api/events/{task_id}")
+async def task_events(task_id: str, request: Request):
+    """
+    작업 진행 이벤트를 Server-Sent Events로 전달합니다. (status 폴링 대신 사용)
+    연결하면 현재 상태(snapshot)와 지금까지의 이벤트를 먼저 보내고, 이후 이벤트를 실시간으로 보냅니다.
+    이벤트: status, queue, stage, song, segment, comfyui, preview, merge
+    재연결 시 Last-Event-ID 헤더를 보내면 그 이후 이벤트만 받습니다. 작업이 끝나면(completed/failed) 스트림을 닫습니다.
+    """
+    task = tasks.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task ID not found")
+
+    last_event_id = request.headers.get("last-event-id", "")
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+    bus = get_progress_bus()
+
+    async def _stream():
+        past, queue = bus.subscribe(task_id, after)
+        # 구독한 뒤의 상태로 판단 (그 사이에 끝났거나 재시도된 작업)
+        current = tasks.get(task_id) or task
+        finished = current.get("status") in TERMINAL_STATUSES
+        # 재시도한 작업이면 이전 실행의 이벤트는 보내지 않음
+        past = current_run(past, finished)
+        try:
+            yield format_sse({"event": "snapshot", "task_id": task_id, **current})
+            for event in past:
+                yield format_sse(event)
+                if is_terminal(event):
+                    return
+            # 이미 끝난 작업 (이벤트 기록이 없는 다른 worker 프로세스의 작업 포함)
+            if finished:
+                return
+
+            while True:
+                if await request.is_disconnected():
+                    return
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+                if is_terminal(event):
+                    return
+        finally:
+            bus.unsubscribe(task_id, queue)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
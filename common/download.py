@@ -0,0 +1,172 @@
+import os
+import uuid
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+import requests
+
+# 한 번에 메모리에 올리는 최대 크기 (파일 전체를 메모리에 올리지 않음)
+CHUNK_SIZE = 1024 * 1024
+# 이 크기 이상이고 서버가 Range를 지원하면 여러 구간으로 나눠서 동시에 다운로드
+PARALLEL_THRESHOLD = 16 * 1024 * 1024
+PARALLEL_PARTS = 4
+DOWNLOAD_TIMEOUT = 120
+
+
+def _temp_path(dest_path: str) -> str:
+    """같은 폴더에 임시 파일 경로 생성 (os.replace로 원자적으로 교체하기 위함)"""
+    return f"{dest_path}.{uuid.uuid4().hex[:8]}.part"
+
+
+def _split_ranges(size: int, parts: int):
+    step = -(-size // parts)
+    return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+
+def _finish(tmp_path: str, dest_path: str) -> str:
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def _cleanup(tmp_path: str):
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+# --- 동기 (requests) ---
+def _probe(session, url: str, headers: dict):
+    """파일 크기와 Range 지원 여부 확인. 실패하면 (None, False)"""
+    try:
+        response = session.head(url, headers=headers, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+        if response.status_code != 200:
+            return None, False
+        size = int(response.headers.get("Content-Length", 0)) or None
+        return size, response.headers.get("Accept-Ranges", "").lower() == "bytes"
+    except Exception:
+        return None, False
+
+
+def _download_range(session, url: str, headers: dict, tmp_path: str, start: int, end: int):
+    range_headers = {**headers, "Range": f"bytes={start}-{end}"}
+    with session.get(url, headers=range_headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        if response.status_code != 206:
+            raise Exception(f"Range 요청 실패 (status {response.status_code})")
+        with open(tmp_path, "r+b") as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+
+
+def download_file(
+    url: str,
+    dest_path: str,
+    session: Optional[requests.Session] = None,
+    headers: Optional[dict] = None,
+    parallel_parts: int = PARALLEL_PARTS,
+) -> str:
+    """
+    url의 파일을 CHUNK_SIZE 단위로 스트리밍하여 dest_path에 저장합니다.
+    임시 파일에 쓴 뒤 os.replace로 교체하므로, 중간에 실패해도 깨진 파일이 남지 않습니다.
+    큰 파일이고 서버가 Range를 지원하면 여러 구간을 동시에 받습니다.
+    """
+    session = session or requests
+    headers = headers or {}
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    tmp_path = _temp_path(dest_path)
+
+    try:
+        size, accepts_ranges = (None, False)
+        if parallel_parts > 1:
+            size, accepts_ranges = _probe(session, url, headers)
+
+        if size and accepts_ranges and size >= PARALLEL_THRESHOLD:
+            with open(tmp_path, "wb") as f:
+                f.truncate(size)
+            ranges = _split_ranges(size, parallel_parts)
+            with ThreadPoolExecutor(max_workers=len(ranges)) as exe:
+                futures = [exe.submit(_download_range, session, url, headers, tmp_path, s, e) for s, e in ranges]
+                for fut in futures:
+                    fut.result()
+        else:
+            with session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+
+        return _finish(tmp_path, dest_path)
+    except Exception:
+        _cleanup(tmp_path)
+        raise
+
+
+# --- 비동기 (httpx) ---
+# httpx는 requests와 달리 기본적으로 리다이렉트를 따라가지 않으므로 요청마다 follow_redirects=True를 지정하고,
+# 디스크 쓰기는 스레드에서 처리해 이벤트 루프(여러 ComfyUI 서버가 공유)를 막지 않습니다.
+async def _awrite_stream(response: httpx.Response, tmp_path: str, mode: str, offset: int = 0):
+    f = await asyncio.to_thread(open, tmp_path, mode)
+    try:
+        if offset:
+            await asyncio.to_thread(f.seek, offset)
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            await asyncio.to_thread(f.write, chunk)
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def _allocate(tmp_path: str, size: int):
+    with open(tmp_path, "wb") as f:
+        f.truncate(size)
+
+
+async def _adownload_range(client, url: str, params, tmp_path: str, start: int, end: int):
+    async with client.stream(
+        "GET", url, params=params, headers={"Range": f"bytes={start}-{end}"}, follow_redirects=True
+    ) as response:
+        if response.status_code != 206:
+            raise Exception(f"Range 요청 실패 (status {response.status_code})")
+        await _awrite_stream(response, tmp_path, "r+b", offset=start)
+
+
+async def adownload_file(
+    client: httpx.AsyncClient,
+    url: str,
+    dest_path: str,
+    params: Optional[dict] = None,
+    parallel_parts: int = PARALLEL_PARTS,
+) -> str:
+    """
+    download_file의 async 버전 (httpx 연결 풀 사용).
+    download_file처럼 리다이렉트(CDN 등)를 따라가며, 파일 쓰기는 스레드에서 처리합니다.
+    """
+    await asyncio.to_thread(os.makedirs, os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    tmp_path = _temp_path(dest_path)
+
+    try:
+        size, accepts_ranges = None, False
+        if parallel_parts > 1:
+            try:
+                head = await client.head(url, params=params, follow_redirects=True)
+                if head.status_code == 200:
+                    size = int(head.headers.get("Content-Length", 0)) or None
+                    accepts_ranges = head.headers.get("Accept-Ranges", "").lower() == "bytes"
+            except Exception:
+                pass
+
+        if size and accepts_ranges and size >= PARALLEL_THRESHOLD:
+            await asyncio.to_thread(_allocate, tmp_path, size)
+            await asyncio.gather(*[
+                _adownload_range(client, url, params, tmp_path, s, e)
+                for s, e in _split_ranges(size, parallel_parts)
+            ])
+        else:
+            async with client.stream("GET", url, params=params, follow_redirects=True) as response:
+                response.raise_for_status()
+                await _awrite_stream(response, tmp_path, "wb")
+
+        return await asyncio.to_thread(_finish, tmp_path, dest_path)
+    except BaseException:
+        _cleanup(tmp_path)
+        raise
@@ -0,0 +1,28 @@
+import os
+import hashlib
+import threading
+from typing import Dict, Tuple
+
+_digest_cache: Dict[Tuple[str, int, int], str] = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """파일 내용의 sha256 (경로 + 크기 + 수정시각이 같으면 다시 계산하지 않음)"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    with _digest_lock:
+        digest = _digest_cache.get(key)
+    if digest:
+        return digest
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _digest_lock:
+        _digest_cache[key] = digest
+    return digest
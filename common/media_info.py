@@ -0,0 +1,194 @@
+import os
+import struct
+import threading
+import subprocess
+from typing import Dict, Tuple
+
+# MPEG 오디오 프레임 헤더 표 (version: 3=MPEG1, 2=MPEG2, 0=MPEG2.5 / layer: 3=I, 2=II, 1=III)
+_BITRATES = {
+    (3, 3): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (3, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (3, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 3): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+# 첫 프레임을 찾기 위해 읽는 최대 크기
+_SCAN_BYTES = 64 * 1024
+
+_cache: Dict[Tuple[str, int, int], float] = {}
+_cache_lock = threading.Lock()
+
+
+class MediaInfoError(ValueError):
+    """헤더에서 길이를 읽을 수 없는 파일"""
+
+
+def _skip_id3v2(f) -> int:
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b"ID3":
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        footer = 10 if header[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _parse_frame_header(header: bytes):
+    """4바이트 MPEG 프레임 헤더 → (version, layer, bitrate(kbps), sample_rate, channel_mode). 잘못된 헤더면 None"""
+    b1, b2, b3 = header[1], header[2], header[3]
+    if header[0] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = (b2 >> 4) & 0x0F
+    rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _BITRATES[(3 if version == 3 else 2, layer)][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    channel_mode = (b3 >> 6) & 0x03
+    return version, layer, bitrate, sample_rate, channel_mode
+
+
+def _samples_per_frame(version: int, layer: int) -> int:
+    if layer == 3:
+        return 384
+    if layer == 2 or version == 3:
+        return 1152
+    return 576
+
+
+def mp3_duration(path: str) -> float:
+    """
+    MP3 길이(초)를 디코딩 없이 헤더에서 계산합니다.
+    VBR은 Xing/Info 또는 VBRI 헤더의 프레임 수를, CBR은 파일 크기와 비트레이트를 사용합니다.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        audio_start = _skip_id3v2(f)
+        f.seek(audio_start)
+        data = f.read(_SCAN_BYTES)
+
+        f.seek(max(0, file_size - 128))
+        has_id3v1 = f.read(3) == b"TAG"
+
+    for pos in range(len(data) - 4):
+        frame = _parse_frame_header(data[pos:pos + 4])
+        if frame:
+            break
+    else:
+        raise MediaInfoError(f"MP3 프레임을 찾을 수 없습니다: {path}")
+
+    version, layer, bitrate, sample_rate, channel_mode = frame
+    samples = _samples_per_frame(version, layer)
+    mono = channel_mode == 3
+
+    # Xing/Info 헤더 (side info 바로 뒤)
+    if version == 3:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", data[xing + 8:xing + 12])[0]
+            return frames * samples / sample_rate
+
+    # VBRI 헤더 (프레임 헤더 뒤 32바이트)
+    vbri = pos + 4 + 32
+    if data[vbri:vbri + 4] == b"VBRI":
+        frames = struct.unpack(">I", data[vbri + 14:vbri + 18])[0]
+        return frames * samples / sample_rate
+
+    # CBR
+    audio_bytes = file_size - (audio_start + pos) - (128 if has_id3v1 else 0)
+    return audio_bytes * 8 / (bitrate * 1000)
+
+
+def _iter_boxes(f, end: int):
+    """MP4 box (size, type, payload 시작 위치) 순회"""
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        size, box_type = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - start
+        if size < header:
+            raise MediaInfoError("잘못된 MP4 box 크기")
+        yield box_type, start + header, start + size
+        f.seek(start + size)
+
+
+def mp4_duration(path: str) -> float:
+    """MP4 길이(초)를 moov/mvhd box에서 읽습니다. (mdat는 읽지 않고 건너뜀)"""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        for box_type, payload, box_end in _iter_boxes(f, file_size):
+            if box_type != b"moov":
+                continue
+            f.seek(payload)
+            for child_type, child_payload, _ in _iter_boxes(f, box_end):
+                if child_type != b"mvhd":
+                    continue
+                f.seek(child_payload)
+                version = f.read(1)[0]
+                f.read(3)  # flags
+                if version == 1:
+                    f.read(16)  # creation/modification time
+                    timescale, duration = struct.unpack(">IQ", f.read(12))
+                else:
+                    f.read(8)
+                    timescale, duration = struct.unpack(">II", f.read(8))
+                if not timescale:
+                    raise MediaInfoError(f"mvhd timescale이 0입니다: {path}")
+                return duration / timescale
+    raise MediaInfoError(f"MP4 mvhd box를 찾을 수 없습니다: {path}")
+
+
+def _ffprobe_duration(path: str) -> float:
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path,
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise MediaInfoError(f"ffprobe 실패: {result.stderr.strip()}")
+    return float(result.stdout.strip())
+
+
+def get_duration(path: str) -> float:
+    """
+    오디오/영상 길이(초). MP3/MP4는 헤더만 읽고, 그 외 형식이나 헤더 파싱 실패 시에만 ffprobe를 사용합니다.
+    같은 파일(경로 + 크기 + 수정시각)은 다시 읽지 않습니다.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _cache_lock:
+        if key in _cache:
+            return _cache[key]
+
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".mp3":
+            duration = mp3_duration(path)
+        elif ext in (".mp4", ".m4a", ".mov"):
+            duration = mp4_duration(path)
+        else:
+            duration = _ffprobe_duration(path)
+    except (MediaInfoError, struct.error, IndexError) as e:
+        print(f"⚠️ 헤더에서 길이를 읽지 못해 ffprobe 사용: {path} ({e})")
+        duration = _ffprobe_duration(path)
+
+    with _cache_lock:
+        _cache[key] = duration
+    return duration
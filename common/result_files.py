@@ -0,0 +1,61 @@
+import os
+import re
+import shutil
+import uuid
+from typing import Optional
+
+from common.file_hash import file_digest
+
+# 결과 파일 이름에 붙이는 내용 해시 길이 (output.{hash}.mp4)
+CONTENT_HASH_LENGTH = 16
+_HASHED_NAME = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{%d})(?P<ext>\.[^.]+)$" % CONTENT_HASH_LENGTH)
+
+
+def content_digest_from_name(file_name: str) -> Optional[str]:
+    """내용 해시가 붙은 파일 이름이면 그 해시, 아니면 None"""
+    match = _HASHED_NAME.match(os.path.basename(file_name))
+    return match.group("digest") if match else None
+
+
+def _remove_old_versions(dest_dir: str, stem: str, ext: str, keep: str):
+    """같은 결과의 이전 버전(재실행 전 결과)을 삭제합니다."""
+    for name in os.listdir(dest_dir):
+        match = _HASHED_NAME.match(name)
+        if match and match.group("stem") == stem and match.group("ext") == ext and name != keep:
+            try:
+                os.remove(os.path.join(dest_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+def publish_result(path: str, dest_dir: Optional[str] = None) -> str:
+    """
+    결과 파일 이름에 내용 해시를 붙입니다. (output.mp4 → output.{hash}.mp4)
+    내용이 바뀌면 URL도 바뀌므로 브라우저 / CDN이 결과를 영구 캐시할 수 있습니다.
+    dest_dir이 같은 폴더(또는 None)면 이름만 바꾸고, 다른 폴더면 복사합니다. 새 경로를 반환합니다.
+    """
+    src_dir = os.path.dirname(os.path.abspath(path))
+    dest_dir = os.path.abspath(dest_dir or src_dir)
+    if content_digest_from_name(path) and src_dir == dest_dir:
+        return path
+
+    stem, ext = os.path.splitext(os.path.basename(path))
+    match = _HASHED_NAME.match(os.path.basename(path))
+    if match:
+        stem = match.group("stem")
+
+    digest = file_digest(path)[:CONTENT_HASH_LENGTH]
+    file_name = f"{stem}.{digest}{ext}"
+    target = os.path.join(dest_dir, file_name)
+
+    os.makedirs(dest_dir, exist_ok=True)
+    if src_dir == dest_dir:
+        os.replace(path, target)
+    else:
+        # 복사 중인 파일이 URL로 노출되지 않도록 임시 파일 → rename
+        tmp_path = f"{target}.{uuid.uuid4().hex[:8]}.tmp"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, target)
+
+    _remove_old_versions(dest_dir, stem, ext, keep=file_name)
+    return target
@@ -0,0 +1,41 @@
+import os
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from common.result_files import content_digest_from_name
+
+# 내용 해시가 붙은 결과 파일은 내용이 절대 바뀌지 않으므로 1년 동안 재검증 없이 캐시
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 그 외 파일(이름이 같아도 내용이 바뀔 수 있음)은 매번 ETag로 재검증
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+class ResultStaticFiles(StaticFiles):
+    """
+    결과 파일 전용 StaticFiles.
+    Range 요청(영상 탐색)은 Starlette FileResponse가 처리하고, 여기서는 캐시 헤더를 정합니다.
+    내용 해시가 붙은 파일(output.{hash}.mp4)은 그 해시를 강한 ETag로 사용하고 immutable로 응답합니다.
+    """
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+
+        digest = content_digest_from_name(os.fspath(full_path))
+        if digest:
+            headers = {"etag": f'"{digest}"', "cache-control": IMMUTABLE_CACHE_CONTROL}
+        else:
+            headers = {"cache-control": REVALIDATE_CACHE_CONTROL}
+
+        response = FileResponse(full_path, status_code=status_code, headers=headers, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
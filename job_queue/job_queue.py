@@ -0,0 +1,126 @@
+import os
+import heapq
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from progress.progress_events import emit
+
+# 동시에 실행할 생성 작업 수 (이보다 많은 작업은 대기열에서 차례를 기다림)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# 대기열 최대 길이 (가득 차면 새 요청은 429로 거절)
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "20"))
+# 대기열이 가득 찼을 때 다시 시도하라고 안내하는 시간 (초)
+JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "60"))
+
+
+class QueueFullError(Exception):
+    """대기열이 가득 차서 작업을 받을 수 없음"""
+
+    def __init__(self, queued: int, max_size: int):
+        super().__init__(f"작업 대기열이 가득 찼습니다. ({queued}/{max_size})")
+        self.queued = queued
+        self.max_size = max_size
+
+
+@dataclass(order=True)
+class _Job:
+    # 우선순위가 높은 작업 먼저, 같으면 먼저 들어온 작업 먼저 (FIFO)
+    sort_key: tuple
+    task_id: str = field(compare=False)
+    fn: Callable[..., Awaitable] = field(compare=False)
+    args: tuple = field(compare=False, default=())
+
+
+class JobQueue:
+    """
+    생성 작업 대기열 + 고정 개수의 worker.
+    요청이 몰려도 동시에 실행되는 작업은 workers개로 제한되고, 나머지는 우선순위 → 도착 순서대로 대기합니다.
+    대기열이 max_size에 도달하면 submit이 QueueFullError를 발생시킵니다. (API에서 429로 응답)
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_size: int = JOB_QUEUE_MAX):
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self._heap: List[_Job] = []
+        self._running: Dict[str, _Job] = {}
+        self._counter = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """현재 이벤트 루프에서 worker를 시작합니다. (서버 시작 시 1번)"""
+        if self._worker_tasks:
+            return
+        self._cond = asyncio.Condition()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i + 1), name=f"job-worker-{i + 1}") for i in range(self.workers)
+        ]
+        print(f"🧵 작업 worker {self.workers}개 시작 (대기열 최대 {self.max_size}개)")
+
+    async def stop(self):
+        for t in self._worker_tasks:
+            t.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def is_full(self) -> bool:
+        return len(self._heap) >= self.max_size
+
+    async def submit(self, task_id: str, fn: Callable[..., Awaitable], *args, priority: int = 0) -> int:
+        """작업을 대기열에 넣고 대기 순번(1부터)을 반환합니다. 대기열이 가득 찼으면 QueueFullError"""
+        if self._cond is None:
+            raise RuntimeError("JobQueue가 시작되지 않았습니다. (start() 필요)")
+        async with self._cond:
+            if self.is_full():
+                raise QueueFullError(len(self._heap), self.max_size)
+            job = _Job(sort_key=(-priority, next(self._counter)), task_id=task_id, fn=fn, args=args)
+            heapq.heappush(self._heap, job)
+            self._cond.notify()
+        return self.position(task_id)
+
+    def position(self, task_id: str) -> Optional[int]:
+        """대기 중인 작업의 순번 (1부터). 실행 중이거나 대기열에 없으면 None"""
+        for i, job in enumerate(sorted(self._heap)):
+            if job.task_id == task_id:
+                return i + 1
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "queued": len(self._heap),
+            "max_size": self.max_size,
+        }
+
+    async def _worker(self, worker_no: int):
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self._heap)
+                job = heapq.heappop(self._heap)
+
+            self._running[job.task_id] = job
+            print(f"🧵 [worker {worker_no}] 작업 시작: {job.task_id} (대기 {len(self._heap)}개)")
+            # 남은 작업들의 대기 순번이 바뀌었음을 알림
+            for i, waiting in enumerate(sorted(self._heap)):
+                emit("queue", task_id=waiting.task_id, position=i + 1)
+            try:
+                await job.fn(*job.args)
+            except Exception as e:
+                # 작업 함수가 상태 기록까지 처리하므로 여기서는 worker가 죽지 않도록만 함
+                print(f"❌ [worker {worker_no}] 작업 {job.task_id} 처리 중 예외: {e}")
+            finally:
+                self._running.pop(job.task_id, None)
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """프로세스당 1개의 작업 대기열"""
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
@@ -12,6 +12,9 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
 
+from upload_store.upload_store import is_upload_path, sniffed_mime
+from workspace.job_workspace import get_workspace
+
 load_dotenv()
 # key = os.getenv("GOOGLE_API_KEY_GEMINI") # 로컬 테스트용 
 llm = ChatGoogleGenerativeAI(
@@ -21,17 +24,25 @@ llm = ChatGoogleGenerativeAI(
 )
 
 
+def _input_type_from_mime(mime_type):
+    if mime_type == 'application/pdf':
+        return "PDF_FILE"
+    elif mime_type.startswith('text/'):
+        return "TEXT_FILE"
+    else:
+        return f"OTHER_FILE ({mime_type})"
+
 def check_input_type_with_magic(input_path):
     """입력 경로가 PDF, TEXT 파일인지, 아니면 그냥 텍스트인지 확인합니다."""
-    if os.path.exists(input_path) and (input_path.endswith('.pdf') or '.' not in input_path):
+    # API 업로드 파일은 저장하면서 이미 형식을 확인했으므로 파일을 다시 열지 않음
+    sniffed = sniffed_mime(input_path) if os.path.exists(input_path) else None
+    if sniffed is not None:
+        return _input_type_from_mime(sniffed)
+
+    if os.path.exists(input_path) and (input_path.endswith('.pdf') or '.' not in input_path or is_upload_path(input_path)):
       try:
           mime_type = magic.Magic(mime=True).from_file(input_path)
-          if mime_type == 'application/pdf':
-              return "PDF_FILE"
-          elif mime_type.startswith('text/'):
-             return "TEXT_FILE"
-          else:
-             return f"OTHER_FILE ({mime_type})"
+          return _input_type_from_mime(mime_type)
       except Exception as e:
          if input_path.endswith('.pdf'):
              print(f"Warning: magic 라이브러리 확인 실패 ({e}). PDF로 간주합니다.")
@@ -101,7 +112,7 @@ def generate_lyrics_tool(topic_or_filepath: str, style: str="kpop") -> str:
     """
     (LLM이 읽는 설명서)
     주제(텍스트 또는 파일 경로)와 스타일을 입력받아 노래 가사를 생성합니다.
-    가사를 'lyrics.txt' 파일로 저장하고, 가사 파일의 경로('lyrics.txt')를 반환합니다.
+    가사를 작업 폴더의 'lyrics.txt' 파일로 저장하고, 가사 파일의 경로를 반환합니다.
     """
     print(f"\n--- 🛠️ '가사 생성 및 저장' 툴 호출됨 ---")
     
@@ -137,11 +148,7 @@ def generate_lyrics_tool(topic_or_filepath: str, style: str="kpop") -> str:
         print(cleaned_lyrics)
         print("---------------------")
 
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(current_dir)
-        files_dir = os.path.join(project_root, "files")
-        os.makedirs(files_dir, exist_ok=True)
-        output_filename = os.path.join(files_dir, "lyrics.txt")
+        output_filename = get_workspace().lyrics_path
         
         with open(output_filename, 'w', encoding='utf-8') as f:
             f.write(cleaned_lyrics)
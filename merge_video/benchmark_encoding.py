@@ -0,0 +1,66 @@
+"""
+인코더 프로필 / 인코딩 모드별 최종 영상 인코딩 시간과 fps를 비교하는 스크립트. (CPU 전용 서버 기준)
+이미 생성된 작업 폴더(generated_videos, song.mp3, song.srt, video_prompt.json)를 사용합니다.
+
+사용법 (프로젝트 루트에서):
+    python -m merge_video.benchmark_encoding                 # files/ 사용
+    python -m merge_video.benchmark_encoding --task-id <id>  # files/jobs/<id> 사용
+"""
+import argparse
+import json
+import os
+import subprocess
+import time
+
+from merge_video.encoding import CPU_COUNT, ENCODER_PROFILES
+from merge_video.merge_video import merge_videos
+from workspace.job_workspace import JobWorkspace, use_workspace
+
+
+def count_frames(video_path: str) -> int:
+    """ffprobe로 영상 프레임 수 확인"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-count_packets",
+        "-show_entries", "stream=nb_read_packets",
+        "-of", "json",
+        video_path,
+    ]
+    output = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True).stdout
+    return int(json.loads(output)["streams"][0]["nb_read_packets"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="최종 영상 인코딩 벤치마크")
+    parser.add_argument("--task-id", default=None)
+    parser.add_argument("--profiles", default=",".join(ENCODER_PROFILES))
+    parser.add_argument("--modes", default="single,chunked")
+    args = parser.parse_args()
+
+    workspace = JobWorkspace(args.task_id)
+    profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    rows = []
+    with use_workspace(workspace):
+        for profile in profiles:
+            for mode in modes:
+                output_name = f"benchmark_{profile}_{mode}.mp4"
+                started = time.perf_counter()
+                output_path = merge_videos(profile=profile, mode=mode, output_name=output_name)
+                elapsed = time.perf_counter() - started
+
+                frames = count_frames(output_path)
+                size_mb = os.path.getsize(output_path) / (1024 * 1024)
+                rows.append((profile, mode, elapsed, frames / elapsed, size_mb))
+                os.remove(output_path)
+
+    print(f"\nCPU {CPU_COUNT}코어")
+    print(f"{'profile':<10}{'mode':<10}{'wall(s)':>10}{'fps':>10}{'size(MB)':>10}")
+    for profile, mode, elapsed, fps, size_mb in rows:
+        print(f"{profile:<10}{mode:<10}{elapsed:>10.2f}{fps:>10.1f}{size_mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import re
+import subprocess
+import threading
+from typing import Callable, List, Optional
+
+CPU_COUNT = os.cpu_count() or 1
+
+# 인코더 프로필 (CPU libx264 기준, 하드웨어 인코더에 의존하지 않음)
+#   preview : 최대한 빠르게 (화질/용량 희생)
+#   final   : 기존과 같은 화질 (libx264 기본값 medium / crf 23)
+ENCODER_PROFILES = {
+    "preview": {"preset": "ultrafast", "crf": "30", "tune": "fastdecode"},
+    "final": {"preset": "medium", "crf": "23", "tune": None},
+}
+ENCODER_PROFILE = os.getenv("ENCODER_PROFILE", "final")
+
+# 설정하면 프로필의 preset 대신 사용 (threads=0은 자동)
+FFMPEG_PRESET = os.getenv("FFMPEG_PRESET")
+FFMPEG_THREADS = os.getenv("FFMPEG_THREADS", "0")
+
+# 최종 mp4의 moov(메타데이터)를 파일 앞으로 옮겨, 다운로드가 끝나기 전에 재생을 시작할 수 있게 함
+FASTSTART_ARGS = ["-movflags", "+faststart"]
+
+SUBTITLE_STYLE = "Alignment=2,FontSize=16,FontName=NanumGothic,Outline=1,Shadow=0"
+
+
+def subtitle_filter(srt_path: str) -> str:
+    """자막을 영상에 입히는 ffmpeg 필터"""
+    return f"subtitles='{os.path.abspath(srt_path)}':force_style='{SUBTITLE_STYLE}'"
+
+
+def resolve_profile(profile: Optional[str] = None) -> str:
+    profile = profile or ENCODER_PROFILE
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"지원하지 않는 인코더 프로필: {profile} (가능: {', '.join(ENCODER_PROFILES)})")
+    return profile
+
+
+def video_encoder_args(profile: Optional[str] = None, threads: Optional[int] = None) -> List[str]:
+    """프로필에 맞는 libx264 인코딩 옵션"""
+    options = ENCODER_PROFILES[resolve_profile(profile)]
+    args = [
+        "-c:v", "libx264",
+        "-preset", FFMPEG_PRESET or options["preset"],
+        "-crf", options["crf"],
+        "-threads", str(threads) if threads is not None else FFMPEG_THREADS,
+    ]
+    if options["tune"]:
+        args += ["-tune", options["tune"]]
+    return args
+
+
+def run_ffmpeg(
+    cmd: list,
+    duration: Optional[float] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> subprocess.CompletedProcess:
+    """
+    ffmpeg 명령을 실행하고, 실패 시 예외 발생.
+    on_progress와 출력 길이(duration, 초)를 주면 -progress 출력을 읽어 진행률(%)이 오를 때마다 호출합니다.
+    """
+    if on_progress is None or not duration:
+        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if process.returncode != 0:
+            raise Exception(f"FFmpeg error: {process.stderr}")
+        return process
+
+    cmd = [cmd[0], "-progress", "pipe:1", *cmd[1:]]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    # stderr를 따로 읽지 않으면 파이프가 가득 차서 ffmpeg가 멈출 수 있음
+    stderr_chunks: List[str] = []
+    reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    reader.start()
+
+    last_percent = -1
+    for line in process.stdout:
+        key, _, value = line.strip().partition("=")
+        # out_time_ms도 실제로는 마이크로초 단위
+        if key in ("out_time_us", "out_time_ms") and value.isdigit():
+            percent = min(100, int(int(value) / 1_000_000 / duration * 100))
+            if percent > last_percent:
+                last_percent = percent
+                on_progress(percent)
+
+    process.wait()
+    reader.join()
+    stderr = "".join(stderr_chunks)
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg error: {stderr}")
+    return subprocess.CompletedProcess(cmd, process.returncode, "", stderr)
+
+
+def encode_speed(stderr: str):
+    """ffmpeg 진행 로그의 마지막 speed 값 (예: 3.2x → 3.2)"""
+    matches = re.findall(r"speed=\s*([\d.]+)x", stderr or "")
+    return float(matches[-1]) if matches else None
@@ -1,29 +1,35 @@
 import os
 import re
-import shutil
-import subprocess
+import json
+import time
+from typing import Dict, List, Optional, Tuple
 from langchain_core.tools import tool
 
-
-INPUT_DIR = "files/generated_videos"
-OUTPUT_DIR = "output_files"
-SONG_MP3 = "files/song.mp3"
-SONG_SRT = "files/song.srt"
+from common.media_info import get_duration
+from merge_video.encoding import (
+    CPU_COUNT,
+    FASTSTART_ARGS,
+    encode_speed,
+    resolve_profile,
+    run_ffmpeg,
+    subtitle_filter,
+    video_encoder_args,
+)
+from merge_video.progressive_merge import ProgressiveMerger
+from progress.progress_events import emit
+from workspace.job_workspace import JobWorkspace, get_workspace
 
 FILE_PATTERN = r"ByteDance-Seedance_(\d+)_\d+_\.mp4"
 
-
-def _run_ffmpeg(cmd: list):
-    """ffmpeg 명령을 실행하고, 실패 시 예외 발생"""
-    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if process.returncode != 0:
-        raise Exception(f"FFmpeg error: {process.stderr}")
-    return process.stdout
+# single: 전체를 ffmpeg 1개로 인코딩 / chunked: 세그먼트 경계로 나눠 여러 ffmpeg로 동시에 인코딩 후 이어 붙임
+MERGE_ENCODE_MODE = os.getenv("MERGE_ENCODE_MODE", "single")
+# chunked 모드에서 동시에 실행할 ffmpeg 개수 (각 프로세스는 CPU를 나눠 사용)
+CHUNK_WORKERS = int(os.getenv("MERGE_CHUNK_WORKERS", str(max(1, min(8, CPU_COUNT // 2)))))
 
 
-def _get_ordered_video_list():
-    """generated_videos 안에서 번호순으로 mp4 경로 반환"""
-    files = os.listdir(INPUT_DIR)
+def _get_ordered_videos(input_dir: str) -> List[Tuple[int, str]]:
+    """generated_videos 안에서 번호순으로 (index, mp4 경로) 반환"""
+    files = os.listdir(input_dir)
     matched = []
 
     for f in files:
@@ -31,7 +37,7 @@ def _get_ordered_video_list():
         if m:
             # 정규식의 첫 번째 그룹(\d+)인 인덱스를 추출
             num = int(m.group(1))
-            full_path = os.path.join(INPUT_DIR, f)
+            full_path = os.path.join(input_dir, f)
             matched.append((num, full_path))
             print(f"  - 매칭 성공: [Index {num}] {f}")
         else:
@@ -42,69 +48,159 @@ def _get_ordered_video_list():
         raise Exception("generated_videos 폴더에서 대상 mp4 파일을 찾을 수 없습니다.")
 
     matched.sort(key=lambda x: x[0])
-    return [path for _, path in matched]
+    return matched
 
 
-@tool
-def merge_video_tool(dummy: str = "start") -> str:
+def _get_ordered_video_list(input_dir: str):
+    """generated_videos 안에서 번호순으로 mp4 경로 반환"""
+    return [path for _, path in _get_ordered_videos(input_dir)]
+
+
+def _load_segment_items(workspace: JobWorkspace, videos: List[Tuple[int, str]]) -> Dict[int, dict]:
     """
-    generated_video 폴더의 파일들을 번호 순서대로 병합하고, 
-    song.srt 자막 + song.mp3 배경음악을 적용해 최종 mp4 생성.
+    세그먼트별 구간 정보 (chunked 인코딩에서 자막을 나누는 데 사용).
+    video_prompt.json 이 없으면 각 영상의 실제 길이(mp4 헤더)를 이어 붙여 구간을 정합니다.
     """
+    if os.path.exists(workspace.video_prompt_path):
+        with open(workspace.video_prompt_path, "r", encoding="utf-8") as f:
+            return {item["segment"]: item for item in json.load(f)}
 
-    if os.path.exists(OUTPUT_DIR):
-        print(f"[*] 기존 {OUTPUT_DIR} 폴더 삭제 및 초기화...")
-        shutil.rmtree(OUTPUT_DIR)
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    items, cursor = {}, 0.0
+    for index, path in videos:
+        duration = get_duration(path)
+        items[index] = {"segment": index, "time": int(round(duration)), "start": cursor, "end": cursor + duration}
+        cursor += duration
+    return items
 
-    try:
-        video_list = _get_ordered_video_list()
-    except Exception as e:
-        return f"Error finding videos: {e}"
 
-    print(f"[*] 병합 대상 파일 개수: {len(video_list)}개")
-
-    concat_list_path = os.path.join(OUTPUT_DIR, "concat_list.txt")
+def _merge_single(videos: List[Tuple[int, str]], workspace: JobWorkspace, output_path: str, profile: str):
+    """concat + 자막 + 음악을 한 번의 인코딩으로 처리 (중간 파일 없음)"""
+    concat_list_path = os.path.join(workspace.root, "concat_list.txt")
     with open(concat_list_path, "w") as f:
-        for v in video_list:
+        for _, v in videos:
             f.write(f"file '{os.path.abspath(v)}'\n")
 
-    merged_video_path = os.path.join(OUTPUT_DIR, "merged_temp.mp4")
-    final_output_path = os.path.join(OUTPUT_DIR, "output.mp4")
-
-    # 1) concat videos
-    concat_cmd = [
+    final_cmd = [
         "ffmpeg", "-y",
         "-f", "concat",
         "-safe", "0",
         "-i", concat_list_path,
-        "-c", "copy",
-        merged_video_path
+        "-i", workspace.song_path,
+        "-vf", subtitle_filter(workspace.srt_path),
+        "-map", "0:v",
+        "-map", "1:a",
+        *video_encoder_args(profile),
+        "-c:a", "aac",
+        "-b:a", "192k",
+        *FASTSTART_ARGS,
+        output_path
     ]
-    print("[*] Merging videos…")
-    _run_ffmpeg(concat_cmd)
 
-    # 2) subtitles + audio
-    filter_sub = (
-        f"subtitles='{os.path.abspath(SONG_SRT)}':force_style="
-        "'Alignment=2,FontSize=16,FontName=NanumGothic,Outline=1,Shadow=0'"
+    # 진행률(%) 계산용 출력 길이 (mp4 헤더에서 읽으므로 빠름)
+    try:
+        duration = sum(get_duration(v) for _, v in videos)
+    except Exception as e:
+        print(f"⚠️ 영상 길이를 읽지 못해 진행률을 표시하지 않습니다: {e}")
+        duration = None
+
+    print(f"[*] Merging videos + music + subtitles… (profile={profile})")
+    return run_ffmpeg(
+        final_cmd,
+        duration=duration,
+        on_progress=lambda percent: emit("merge", mode="single", percent=percent),
     )
 
-    final_cmd = [
+
+def _merge_chunked(videos: List[Tuple[int, str]], workspace: JobWorkspace, output_path: str, profile: str):
+    """세그먼트마다 별도의 ffmpeg로 동시에 인코딩(자막 포함)한 뒤 stream copy로 이어 붙이고 음악을 넣음"""
+    items = _load_segment_items(workspace, videos)
+    workers = max(1, min(CHUNK_WORKERS, len(videos)))
+    threads = max(1, CPU_COUNT // workers)
+
+    print(f"[*] Chunked encoding… (profile={profile}, 동시 {workers}개 x 스레드 {threads}개)")
+    # 점진적 병합(prepared_segments)이 실패해 재시도하는 경우에도 그 폴더를 건드리지 않도록 별도 폴더 사용
+    merger = ProgressiveMerger(
+        workspace.srt_path, workspace, workers=workers, profile=profile, threads=threads, dir_name="chunked_segments"
+    )
+    try:
+        for index, path in videos:
+            merger.add(items[index], {"local_files": [path]})
+        merger.finish(workspace.song_path, [index for index, _ in videos], output_path)
+    finally:
+        merger.close(wait=True)
+
+
+def build_preview(output_name: str = "preview.mp4") -> str:
+    """
+    세그먼트를 재인코딩 없이(stream copy) 이어 붙이고 음악만 넣은 미리보기 영상을 만듭니다.
+    자막은 없지만 몇 초 안에 끝나므로, 최종 인코딩이 끝나기 전에 먼저 보여줄 수 있습니다.
+    """
+    workspace = get_workspace()
+    videos = _get_ordered_videos(workspace.generated_videos_dir)
+
+    concat_list_path = os.path.join(workspace.root, "preview_concat_list.txt")
+    with open(concat_list_path, "w") as f:
+        for _, v in videos:
+            f.write(f"file '{os.path.abspath(v)}'\n")
+
+    preview_path = os.path.join(workspace.output_dir, output_name)
+    cmd = [
         "ffmpeg", "-y",
-        "-i", merged_video_path,
-        "-i", SONG_MP3,
-        "-vf", filter_sub,
+        "-f", "concat",
+        "-safe", "0",
+        "-i", concat_list_path,
+        "-i", workspace.song_path,
         "-map", "0:v",
         "-map", "1:a",
-        "-c:v", "libx264",
+        "-c:v", "copy",
         "-c:a", "aac",
-        "-b:a", "192k",
-        final_output_path
+        "-b:a", "128k",
+        *FASTSTART_ARGS,
+        preview_path
     ]
 
-    print("[*] Adding music + subtitles…")
-    _run_ffmpeg(final_cmd)
-    
+    started = time.time()
+    run_ffmpeg(cmd)
+    print(f"✅ 미리보기 영상 생성 완료 ({time.time() - started:.1f}초): {preview_path}")
+    return preview_path
+
+
+def merge_videos(profile: Optional[str] = None, mode: Optional[str] = None, output_name: str = "output.mp4") -> str:
+    """
+    현재 작업의 세그먼트 영상을 병합해 최종 mp4를 만들고 경로를 반환합니다.
+    profile: 인코더 프로필 (preview | final), mode: single | chunked
+    """
+    # 현재 작업의 폴더만 사용 (다른 작업의 결과물은 건드리지 않음)
+    workspace = get_workspace()
+    profile = resolve_profile(profile)
+    mode = mode or MERGE_ENCODE_MODE
+    os.makedirs(workspace.output_dir, exist_ok=True)
+
+    videos = _get_ordered_videos(workspace.generated_videos_dir)
+    print(f"[*] 병합 대상 파일 개수: {len(videos)}개")
+
+    final_output_path = os.path.join(workspace.output_dir, output_name)
+    started = time.time()
+
+    if mode == "chunked":
+        _merge_chunked(videos, workspace, final_output_path, profile)
+        print(f"[*] 인코딩 완료: {time.time() - started:.1f}초")
+        return final_output_path
+
+    speed = encode_speed(_merge_single(videos, workspace, final_output_path, profile).stderr)
+    print(f"[*] 인코딩 완료: {time.time() - started:.1f}초" + (f" (speed {speed}x)" if speed else ""))
+
     print(f"✅ 최종 영상 생성 완료: {final_output_path}")
-    return final_output_path
\ No newline at end of file
+    return final_output_path
+
+
+@tool
+def merge_video_tool(dummy: str = "start") -> str:
+    """
+    generated_video 폴더의 파일들을 번호 순서대로 병합하고, 
+    song.srt 자막 + song.mp3 배경음악을 적용해 최종 mp4 생성.
+    """
+    try:
+        return merge_videos()
+    except Exception as e:
+        return f"Error merging videos: {e}"
@@ -0,0 +1,198 @@
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from merge_video.encoding import FASTSTART_ARGS, resolve_profile, run_ffmpeg, subtitle_filter, video_encoder_args
+from progress.progress_events import emit
+from srt.fast_alignment import write_srt
+from workspace.job_workspace import JobWorkspace, get_workspace
+
+# 세그먼트 전처리(인코딩)를 동시에 실행할 개수
+MERGE_WORKERS = int(os.getenv("MERGE_WORKERS", "2"))
+# 모든 세그먼트를 같은 프레임레이트로 맞춰야 stream copy로 이어 붙일 수 있음
+SEGMENT_FPS = int(os.getenv("MERGE_SEGMENT_FPS", "24"))
+
+SRT_BLOCK_PATTERN = re.compile(
+    r"\d+\s*\n(\d{2}):(\d{2}):(\d{2}),(\d{3}) --> (\d{2}):(\d{2}):(\d{2}),(\d{3})\s*\n(.*?)(?=\n\s*\n|\Z)",
+    re.DOTALL,
+)
+
+
+def _to_seconds(h, m, s, ms) -> float:
+    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+
+def read_srt(srt_path: str) -> List[dict]:
+    """SRT → [{start, end, text}] (자막 텍스트의 스타일 태그는 그대로 유지)"""
+    with open(srt_path, "r", encoding="utf-8") as f:
+        content = f.read().replace("\r\n", "\n")
+
+    blocks = []
+    for match in SRT_BLOCK_PATTERN.finditer(content):
+        groups = match.groups()
+        text = groups[8].strip()
+        if text:
+            blocks.append({"start": _to_seconds(*groups[0:4]), "end": _to_seconds(*groups[4:8]), "text": text})
+    return blocks
+
+
+def slice_subtitles(subtitles: List[dict], start: float, end: float) -> List[dict]:
+    """[start, end) 구간에 걸친 자막만 골라 구간 시작 기준 시간으로 바꿉니다."""
+    sliced = []
+    for sub in subtitles:
+        if sub["end"] <= start or sub["start"] >= end:
+            continue
+        sliced.append({
+            "start": max(sub["start"], start) - start,
+            "end": min(sub["end"], end) - start,
+            "text": sub["text"],
+        })
+    return sliced
+
+
+def segment_bounds(item: dict):
+    """세그먼트의 노래 기준 (시작, 끝) 시간. (start/end가 없는 예전 video_prompt.json도 지원)"""
+    start = item.get("start")
+    end = item.get("end")
+    if start is None or end is None:
+        start = (item["segment"] - 1) * item["time"]
+        end = start + item["time"]
+    return float(start), float(end)
+
+
+class ProgressiveMerger:
+    """
+    세그먼트 영상이 생성되는 즉시 전처리(프레임레이트/길이 통일 + 해당 구간 자막 입히기)를 시작하고,
+    마지막에는 전처리된 세그먼트를 stream copy로 이어 붙이고 음악만 넣습니다.
+    → 인코딩 대부분이 나머지 세그먼트 렌더링과 겹쳐서 진행됩니다.
+
+    BackendScheduler의 on_result 콜백으로 add()를 연결해서 사용합니다.
+    콜백은 다른 스레드에서 호출되므로 workspace는 생성 시점에 고정합니다.
+    """
+
+    def __init__(
+        self,
+        srt_path: str,
+        workspace: Optional[JobWorkspace] = None,
+        workers: int = MERGE_WORKERS,
+        profile: Optional[str] = None,
+        threads: Optional[int] = None,
+        dir_name: str = "prepared_segments",
+    ):
+        self.workspace = workspace or get_workspace()
+        self.srt_path = srt_path
+        self.profile = resolve_profile(profile)
+        self.threads = threads
+        # 전처리 결과 폴더 (다른 병합 방식과 겹치지 않도록 용도별로 분리)
+        self.prepared_dir = os.path.join(self.workspace.root, dir_name)
+        self._subtitles: Optional[List[dict]] = None
+        self._futures: Dict[int, Future] = {}
+        self._prepared = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="merge-prepare")
+
+        if os.path.exists(self.prepared_dir):
+            shutil.rmtree(self.prepared_dir)
+        os.makedirs(self.prepared_dir, exist_ok=True)
+
+    def _get_subtitles(self) -> List[dict]:
+        with self._lock:
+            if self._subtitles is None:
+                self._subtitles = read_srt(self.srt_path)
+            return self._subtitles
+
+    def add(self, item: dict, result: dict):
+        """세그먼트 렌더링 결과를 받아 전처리를 예약합니다. (on_result 콜백)"""
+        videos = [f for f in result.get("local_files", []) if f.endswith(".mp4")]
+        if not videos:
+            print(f"⚠️ [Merge] 세그먼트 {item['segment']}: mp4 결과가 없어 전처리를 건너뜁니다.")
+            return
+
+        future = self._executor.submit(self._prepare, item, videos[0])
+        with self._lock:
+            self._futures[item["segment"]] = future
+
+    def _prepare(self, item: dict, video_path: str) -> str:
+        index = item["segment"]
+        start, end = segment_bounds(item)
+        # 프레임 단위로 경계를 계산해서 세그먼트를 이어 붙여도 오차가 누적되지 않게 함
+        frames = round(end * SEGMENT_FPS) - round(start * SEGMENT_FPS)
+        duration = frames / SEGMENT_FPS
+
+        filters = [
+            f"fps={SEGMENT_FPS}",
+            "format=yuv420p",
+            "setsar=1",
+            # 영상이 구간보다 짧으면 마지막 프레임을 늘려서 채움
+            f"tpad=stop_mode=clone:stop_duration={duration:.3f}",
+        ]
+
+        subtitles = slice_subtitles(self._get_subtitles(), start, end)
+        if subtitles:
+            srt_path = write_srt(subtitles, os.path.join(self.prepared_dir, f"segment_{index}.srt"))
+            filters.append(subtitle_filter(srt_path))
+
+        output_path = os.path.join(self.prepared_dir, f"segment_{index}.mp4")
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", video_path,
+            "-vf", ",".join(filters),
+            "-frames:v", str(frames),
+            "-an",
+            *video_encoder_args(self.profile, self.threads),
+            "-video_track_timescale", "90000",
+            output_path,
+        ]
+        run_ffmpeg(cmd)
+        print(f"[*] [Merge] 세그먼트 {index} 전처리 완료 ({duration:.2f}초, 자막 {len(subtitles)}개)")
+        with self._lock:
+            self._prepared += 1
+            prepared = self._prepared
+        # 전처리 스레드에는 작업 context가 없으므로 task_id를 직접 지정
+        emit("merge", task_id=self.workspace.task_id, mode="progressive", segment=index, prepared=prepared)
+        return output_path
+
+    def finish(self, song_path: str, indexes: List[int], output_path: Optional[str] = None) -> str:
+        """모든 세그먼트 전처리를 기다린 뒤 stream copy로 이어 붙이고 음악을 넣습니다."""
+        output_path = output_path or os.path.join(self.workspace.output_dir, "output.mp4")
+
+        with self._lock:
+            futures = dict(self._futures)
+        missing = [idx for idx in indexes if idx not in futures]
+        if missing:
+            raise Exception(f"전처리되지 않은 세그먼트: {missing}")
+
+        prepared = [futures[idx].result() for idx in indexes]
+
+        concat_list_path = os.path.join(self.prepared_dir, "concat_list.txt")
+        with open(concat_list_path, "w") as f:
+            for path in prepared:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", concat_list_path,
+            "-i", song_path,
+            "-map", "0:v",
+            "-map", "1:a",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            "-b:a", "192k",
+            *FASTSTART_ARGS,
+            output_path,
+        ]
+        print("[*] [Merge] 전처리된 세그먼트 이어 붙이기 + 음악 추가…")
+        emit("merge", task_id=self.workspace.task_id, mode="progressive", state="concat", prepared=len(prepared))
+        run_ffmpeg(cmd)
+
+        print(f"✅ 최종 영상 생성 완료: {output_path}")
+        return output_path
+
+    def close(self, wait: bool = False):
+        """대기 중인 전처리를 취소합니다. wait이면 이미 실행 중인 ffmpeg가 끝날 때까지 기다립니다."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+from workspace.job_workspace import JobWorkspace
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def inputs_hash(stage: str, inp: dict, dep_tokens: List[str]) -> str:
+    """단계 이름 + 단계가 읽는 파이프라인 입력 필드 + 이전 단계 실행 토큰으로 입력 해시 생성"""
+    payload = json.dumps({"stage": stage, "input": inp, "deps": dep_tokens}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JobManifest:
+    """
+    작업 폴더(files/jobs/{task_id}/manifest.json)에 단계별 입력 해시, 출력, 상태를 기록합니다.
+    같은 작업을 다시 실행하면 입력이 같고 완료된 단계는 건너뛰고,
+    영상 단계는 완료된 세그먼트를 제외한 나머지만 다시 렌더링합니다.
+
+    단계가 실제로 실행될 때마다 새 token을 발급하고, 다음 단계의 입력 해시에 이 token을 포함시킵니다.
+    → 어떤 단계가 다시 실행되면 그 뒤의 단계들도 모두 다시 실행됩니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._data = self._load()
+
+    def _load(self) -> dict:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ manifest 읽기 실패, 새로 시작합니다: {e}")
+        return {"input": None, "stages": {}}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    # --- 파이프라인 입력 ---
+    @property
+    def input(self) -> Optional[dict]:
+        with self._lock:
+            return self._data.get("input")
+
+    def record_input(self, inp: dict):
+        with self._lock:
+            self._data["input"] = inp
+            self._save()
+
+    # --- 단계 ---
+    def stage(self, name: str) -> Optional[dict]:
+        with self._lock:
+            return self._data["stages"].get(name)
+
+    def token(self, name: str) -> str:
+        stage = self.stage(name)
+        return stage.get("token", "") if stage else ""
+
+    def completed_output(self, name: str, input_hash: str) -> Optional[dict]:
+        """입력 해시가 같고 완료된 단계의 출력. 없으면 None"""
+        stage = self.stage(name)
+        if stage and stage.get("status") == "completed" and stage.get("inputs_hash") == input_hash:
+            return stage.get("output")
+        return None
+
+    def start_stage(self, name: str, input_hash: str):
+        with self._lock:
+            stage = self._data["stages"].get(name) or {}
+            if stage.get("inputs_hash") != input_hash:
+                # 입력이 바뀌었으면 이전 세그먼트 결과는 사용할 수 없음
+                stage = {}
+            stage.update({"status": "running", "inputs_hash": input_hash, "error": None, "started_at": time.time()})
+            self._data["stages"][name] = stage
+            self._save()
+
+    def complete_stage(self, name: str, input_hash: str, output: Any):
+        with self._lock:
+            stage = self._data["stages"].setdefault(name, {})
+            stage.update({
+                "status": "completed",
+                "inputs_hash": input_hash,
+                "output": output,
+                "token": uuid.uuid4().hex,
+                "finished_at": time.time(),
+            })
+            self._save()
+
+    def fail_stage(self, name: str, error: str):
+        with self._lock:
+            stage = self._data["stages"].setdefault(name, {})
+            stage.update({"status": "failed", "error": error, "finished_at": time.time()})
+            self._save()
+
+    # --- 세그먼트 (영상 단계) ---
+    def record_segment(self, stage_name: str, index: int, files: List[str]):
+        with self._lock:
+            stage = self._data["stages"].setdefault(stage_name, {})
+            stage.setdefault("segments", {})[str(index)] = {"status": "completed", "files": files}
+            self._save()
+
+    def completed_segments(self, stage_name: str) -> Dict[int, List[str]]:
+        """완료된 세그먼트 중 파일이 아직 남아 있는 것 → {index: files}"""
+        stage = self.stage(stage_name) or {}
+        done = {}
+        for index, info in (stage.get("segments") or {}).items():
+            files = info.get("files") or []
+            if info.get("status") == "completed" and files and all(os.path.exists(f) for f in files):
+                done[int(index)] = files
+        return done
+
+
+_manifests: Dict[str, JobManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def manifest_path(workspace: JobWorkspace) -> str:
+    return os.path.join(workspace.root, MANIFEST_FILENAME)
+
+
+def get_manifest(workspace: JobWorkspace) -> JobManifest:
+    """작업별 manifest (같은 작업은 같은 객체를 공유)"""
+    path = manifest_path(workspace)
+    with _manifests_lock:
+        manifest = _manifests.get(path)
+        if manifest is None:
+            manifest = JobManifest(path)
+            _manifests[path] = manifest
+        return manifest
+
+
+def release_manifest(workspace: JobWorkspace):
+    """실행이 끝난 작업의 manifest를 메모리에서 내림 (파일은 유지)"""
+    with _manifests_lock:
+        _manifests.pop(manifest_path(workspace), None)
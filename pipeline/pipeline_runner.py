@@ -0,0 +1,412 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common.result_files import publish_result
+from lyric.generate_lyric import generate_lyrics_tool, read_lyrics_file_tool
+from song.mureka_generate import generate_song_via_api
+from srt.whisper_tool import generate_srt_tool
+from video_prompt.generate_video_prompt import (
+    TOTAL_SEGMENTS,
+    generate_video_prompt_tool,
+    iter_video_prompts,
+    save_video_prompts,
+)
+from video.batch_generate_video import batch_generate_video_tool, stream_generate_videos, summarize_results
+from merge_video.merge_video import build_preview, merge_videos
+from merge_video.progressive_merge import ProgressiveMerger
+from pipeline.manifest import get_manifest, inputs_hash, release_manifest
+from pipeline.stage_limits import resource_slot, stage_slot
+from progress.progress_events import emit
+from workspace.job_workspace import JobWorkspace, get_workspace, use_workspace
+
+# 툴들이 실패 시 반환하는 문자열의 접두어
+ERROR_PREFIXES = ("오류", "실패", "Error")
+
+
+class PipelineError(Exception):
+    """파이프라인 단계 실행 실패"""
+
+    def __init__(self, stage: str, message: str):
+        super().__init__(f"[{stage}] {message}")
+        self.stage = stage
+
+
+# --- 단계별 출력 타입 ---
+@dataclass
+class LyricsOutput:
+    path: str
+    text: str
+
+
+@dataclass
+class SongOutput:
+    path: str
+
+
+@dataclass
+class SrtOutput:
+    path: str
+
+
+@dataclass
+class VideoPromptOutput:
+    segments: List[int]
+
+
+@dataclass
+class VideoOutput:
+    video_dir: str
+    merger: Optional[ProgressiveMerger] = None   # MERGE_MODE=progressive 일 때 세그먼트별 전처리 결과
+
+
+@dataclass
+class PreviewOutput:
+    path: Optional[str]   # 미리보기 생성에 실패하면 None (최종 병합은 계속 진행)
+
+
+@dataclass
+class MergeOutput:
+    path: str
+
+
+@dataclass
+class PipelineInput:
+    topic: str                 # 업로드된 파일 경로 또는 주제 텍스트
+    style: str = "kpop"        # 사용자가 입력한 프롬프트 (가사 스타일로 사용)
+    encoder_profile: Optional[str] = None   # 최종 영상 인코더 프로필 (preview | final, 없으면 ENCODER_PROFILE)
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[..., Any]
+    deps: List[str] = field(default_factory=list)
+    # 이 단계가 직접 읽는 PipelineInput 필드 (입력 해시에는 이 필드만 포함, 나머지 변경은 deps의 token으로 전파)
+    inputs: Tuple[str, ...] = ()
+
+
+@dataclass
+class PipelineResult:
+    output_path: str
+    outputs: Dict[str, Any]
+    timings: Dict[str, float]
+
+
+def _call_tool(tool_obj, **kwargs):
+    """@tool 로 감싼 함수의 실제 동기 함수를 호출 (LLM을 거치지 않음)"""
+    func = getattr(tool_obj, "func", None)
+    if callable(func):
+        return func(**kwargs)
+    return tool_obj.invoke(kwargs)
+
+
+def _check_path(stage: str, value) -> str:
+    """툴이 반환한 값이 오류 문자열이 아니고 실제 파일 경로인지 확인"""
+    if not isinstance(value, str) or value.startswith(ERROR_PREFIXES):
+        raise PipelineError(stage, str(value))
+    if not os.path.exists(value):
+        raise PipelineError(stage, f"결과 파일이 존재하지 않습니다: {value}")
+    return value
+
+
+# --- 단계 구현 (각 단계는 이전 단계의 출력만 입력으로 받음) ---
+def _lyrics_stage(inp: PipelineInput) -> LyricsOutput:
+    path = _check_path("lyrics", _call_tool(generate_lyrics_tool, topic_or_filepath=inp.topic, style=inp.style))
+    text = _call_tool(read_lyrics_file_tool, filepath=path)
+    if text.startswith(ERROR_PREFIXES):
+        raise PipelineError("lyrics", text)
+    return LyricsOutput(path=path, text=text)
+
+
+def _song_stage(inp: PipelineInput, lyrics: LyricsOutput) -> SongOutput:
+    path = _check_path("song", _call_tool(generate_song_via_api, lyrics=lyrics.text))
+    return SongOutput(path=path)
+
+
+def _srt_stage(inp: PipelineInput, lyrics: LyricsOutput, song: SongOutput) -> SrtOutput:
+    path = _check_path("srt", _call_tool(generate_srt_tool, audio_file_path=song.path, lyrics_file_path=lyrics.path))
+    return SrtOutput(path=path)
+
+
+def _video_prompt_stage(inp: PipelineInput, srt: SrtOutput) -> VideoPromptOutput:
+    segments = _call_tool(generate_video_prompt_tool, srt_file_path=srt.path)
+    if not segments or not all(isinstance(s, int) for s in segments):
+        raise PipelineError("video_prompt", str(segments))
+    return VideoPromptOutput(segments=segments)
+
+
+def _check_segments(summary: dict):
+    """세그먼트별 상태 중 완료되지 않은 것이 있으면 실패 처리"""
+    failed = {idx: info["error"] for idx, info in summary.items() if info["status"] != "completed"}
+    if failed:
+        raise PipelineError("video", f"영상 생성 실패 세그먼트: {failed}")
+
+
+def _video_stage(inp: PipelineInput, video_prompt: VideoPromptOutput) -> VideoOutput:
+    _check_segments(_call_tool(batch_generate_video_tool, indexes=video_prompt.segments))
+    return VideoOutput(video_dir=get_workspace().generated_videos_dir)
+
+
+def _load_saved_prompts() -> Optional[List[dict]]:
+    """이전 실행에서 저장한 video_prompt.json (모든 세그먼트가 있을 때만)"""
+    path = get_workspace().video_prompt_path
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    if {item["segment"] for item in saved} != set(range(1, TOTAL_SEGMENTS + 1)):
+        return None
+    return saved
+
+
+def _streaming_video_stage(inp: PipelineInput, srt: SrtOutput) -> VideoOutput:
+    """
+    프롬프트가 하나 생성될 때마다 바로 ComfyUI 영상 생성을 시작 (LLM 대기와 렌더링을 겹침)
+    재실행 시에는 manifest에 완료로 기록된 세그먼트는 다시 렌더링하지 않습니다.
+    """
+    manifest = get_manifest(get_workspace())
+    done = manifest.completed_segments("video")
+    saved_prompts = _load_saved_prompts() if done else None
+    if done:
+        print(f"[*] 이전 실행에서 완료된 세그먼트 재사용: {sorted(done)}")
+
+    items = []
+    merger = ProgressiveMerger(srt.path, profile=inp.encoder_profile) if MERGE_MODE == "progressive" else None
+
+    def _on_result(item: dict, result: dict):
+        manifest.record_segment("video", item["segment"], result.get("local_files", []))
+        if merger:
+            merger.add(item, result)
+
+    def _prompts():
+        # 프롬프트 생성(LLM 동시 호출)은 comfyui 슬롯과 별도로 llm 자원 제한에 포함 (저장된 프롬프트 재사용 시 제외)
+        task_id = get_workspace().task_id
+        label = f"Pipeline {task_id} 프롬프트" if task_id else "Pipeline 프롬프트"
+        slot = contextlib.nullcontext() if saved_prompts else resource_slot("llm", label=label)
+        with slot:
+            for item in saved_prompts or iter_video_prompts(srt.path):
+                items.append(item)
+                if item["segment"] in done:
+                    emit("segment", segment=item["segment"], state="reused")
+                    if merger:
+                        merger.add(item, {"local_files": done[item["segment"]]})
+                    continue
+                yield item
+
+    keep_files = [f for files in done.values() for f in files] if done else None
+    try:
+        results = stream_generate_videos(
+            _prompts(), on_result=_on_result, keep_files=keep_files, total=TOTAL_SEGMENTS - len(done)
+        )
+        results.update({idx: {"local_files": files} for idx, files in done.items()})
+        _check_segments(summarize_results(results, list(range(1, TOTAL_SEGMENTS + 1))))
+    except Exception as e:
+        if merger:
+            merger.close()
+        if isinstance(e, FileNotFoundError):
+            raise PipelineError("video", str(e))
+        raise
+    finally:
+        if items:
+            save_video_prompts(items)
+
+    return VideoOutput(video_dir=get_workspace().generated_videos_dir, merger=merger)
+
+
+def _preview_stage(inp: PipelineInput, video: VideoOutput, song: SongOutput) -> PreviewOutput:
+    """자막/재인코딩 없이 세그먼트 + 음악만 합친 미리보기 (최종 인코딩 전에 먼저 제공)"""
+    try:
+        return PreviewOutput(path=publish_result(build_preview()))
+    except Exception as e:
+        print(f"⚠️ [Preview] 미리보기 생성 실패 (최종 병합은 계속 진행): {e}")
+        return PreviewOutput(path=None)
+
+
+def _merge_stage(inp: PipelineInput, video: VideoOutput, srt: SrtOutput, song: SongOutput) -> MergeOutput:
+    path = None
+    if video.merger is not None:
+        # 세그먼트별 전처리가 끝났으면 이어 붙이고 음악만 넣음 (실패하면 한 번에 병합하는 방식으로 재시도)
+        try:
+            path = _check_path("merge", video.merger.finish(song.path, list(range(1, TOTAL_SEGMENTS + 1))))
+        except Exception as e:
+            print(f"⚠️ [Merge] 점진적 병합 실패, 전체 병합으로 재시도: {e}")
+        finally:
+            # 실패했으면 아직 실행 중인 전처리 ffmpeg가 끝난 뒤에 전체 병합으로 재시도
+            video.merger.close(wait=path is None)
+
+    if path is None:
+        try:
+            path = merge_videos(profile=inp.encoder_profile)
+        except Exception as e:
+            raise PipelineError("merge", str(e))
+        path = _check_path("merge", path)
+
+    # 결과 파일 이름에 내용 해시를 붙여 작업/재실행마다 URL이 달라지게 함 (영구 캐시 가능)
+    return MergeOutput(path=publish_result(path))
+
+
+# 1이면 최종 인코딩 전에 미리보기(preview.mp4)를 먼저 만듦
+BUILD_PREVIEW = os.getenv("PIPELINE_PREVIEW", "1") == "1"
+PREVIEW_STAGES = [Stage("preview", _preview_stage, deps=["video", "song"])] if BUILD_PREVIEW else []
+
+# lyrics → song → srt → video_prompt → video → (preview) → merge
+SEQUENTIAL_STAGES = [
+    Stage("lyrics", _lyrics_stage, inputs=("topic", "style")),
+    Stage("song", _song_stage, deps=["lyrics"]),
+    Stage("srt", _srt_stage, deps=["lyrics", "song"]),
+    Stage("video_prompt", _video_prompt_stage, deps=["srt"]),
+    Stage("video", _video_stage, deps=["video_prompt"]),
+    *PREVIEW_STAGES,
+    Stage("merge", _merge_stage, deps=["video", "srt", "song"], inputs=("encoder_profile",)),
+]
+
+# lyrics → song → srt → (video_prompt + video 동시 진행) → (preview) → merge
+STREAMING_STAGES = [
+    Stage("lyrics", _lyrics_stage, inputs=("topic", "style")),
+    Stage("song", _song_stage, deps=["lyrics"]),
+    Stage("srt", _srt_stage, deps=["lyrics", "song"]),
+    Stage("video", _streaming_video_stage, deps=["srt"]),
+    *PREVIEW_STAGES,
+    Stage("merge", _merge_stage, deps=["video", "srt", "song"], inputs=("encoder_profile",)),
+]
+
+STREAM_VIDEO = os.getenv("PIPELINE_STREAM_VIDEO", "1") == "1"
+# single: 모든 세그먼트 생성 후 한 번에 병합 / progressive: 세그먼트가 생성될 때마다 미리 인코딩 (스트리밍 모드 전용)
+MERGE_MODE = os.getenv("MERGE_MODE", "single")
+DEFAULT_STAGES = STREAMING_STAGES if STREAM_VIDEO else SEQUENTIAL_STAGES
+
+
+OUTPUT_TYPES = {
+    cls.__name__: cls
+    for cls in (LyricsOutput, SongOutput, SrtOutput, VideoPromptOutput, VideoOutput, PreviewOutput, MergeOutput)
+}
+# manifest에 저장하지 않는 (실행 중에만 의미 있는) 필드
+TRANSIENT_FIELDS = ("merger",)
+# 존재 여부를 확인할 파일/폴더 경로 필드
+PATH_FIELDS = ("path", "video_dir")
+
+
+def _serialize_output(output) -> dict:
+    data = {f.name: getattr(output, f.name) for f in fields(output) if f.name not in TRANSIENT_FIELDS}
+    return {"type": type(output).__name__, "data": data}
+
+
+def _restore_output(saved: Optional[dict]):
+    """manifest에 저장된 출력을 복원합니다. 결과 파일이 사라졌으면 None (단계를 다시 실행)"""
+    if not saved or saved.get("type") not in OUTPUT_TYPES:
+        return None
+    data = saved.get("data") or {}
+    for name in PATH_FIELDS:
+        value = data.get(name)
+        if isinstance(value, str) and not os.path.exists(value):
+            return None
+    return OUTPUT_TYPES[saved["type"]](**data)
+
+
+def _resolve_order(stages: List[Stage]) -> List[Stage]:
+    """의존성(deps) 기준으로 단계 실행 순서를 정렬 (위상 정렬)"""
+    by_name = {s.name: s for s in stages}
+    ordered, visiting, done = [], set(), set()
+
+    def visit(stage: Stage):
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"파이프라인 순환 의존성: {stage.name}")
+        visiting.add(stage.name)
+        for dep in stage.deps:
+            if dep in by_name:
+                visit(by_name[dep])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        ordered.append(stage)
+
+    for s in stages:
+        visit(s)
+    return ordered
+
+
+class PipelineRunner:
+    """
+    LLM 에이전트를 거치지 않고, 고정된 순서의 툴들을 직접 호출하는 파이프라인.
+    각 단계는 스레드에서 실행되어 이벤트 루프(FastAPI)를 막지 않습니다.
+    """
+
+    def __init__(self, stages: Optional[List[Stage]] = None):
+        self.stages = _resolve_order(stages or DEFAULT_STAGES)
+
+    async def run(
+        self,
+        inp: PipelineInput,
+        workspace: JobWorkspace,
+        on_stage_done: Optional[Callable[[str, Any], None]] = None,
+    ) -> PipelineResult:
+        """
+        단계를 순서대로 실행합니다. 각 단계는 사용하는 자원의 동시 실행 제한(STAGE_LIMITS) 안에서 실행됩니다.
+        on_stage_done(stage name, output)은 단계가 끝날 때마다 이벤트 루프에서 호출됩니다. (미리보기 공개 등)
+        """
+        outputs: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+
+        manifest = get_manifest(workspace)
+        inp_data = asdict(inp)
+        manifest.record_input(inp_data)
+
+        try:
+            with use_workspace(workspace):
+                for stage in self.stages:
+                    stage_input = {name: inp_data[name] for name in stage.inputs}
+                    input_hash = inputs_hash(stage.name, stage_input, [manifest.token(dep) for dep in stage.deps])
+                    cached = _restore_output(manifest.completed_output(stage.name, input_hash))
+
+                    if cached is not None:
+                        outputs[stage.name] = cached
+                        timings[stage.name] = 0.0
+                        print(f"⏭️ [Pipeline] '{stage.name}' 단계는 이미 완료됨 (건너뜀)")
+                        emit("stage", task_id=workspace.task_id, stage=stage.name, state="skipped")
+                    else:
+                        args = [outputs[dep] for dep in stage.deps]
+                        # 같은 자원(LLM, Mureka, Whisper, ComfyUI, ffmpeg)을 쓰는 다른 작업의 단계가 많으면 차례를 기다림
+                        async with stage_slot(stage.name, label=f"Pipeline {workspace.task_id or ''}".strip()):
+                            print(f"\n▶️ [Pipeline] '{stage.name}' 단계 시작")
+                            started = time.time()
+                            manifest.start_stage(stage.name, input_hash)
+                            emit("stage", task_id=workspace.task_id, stage=stage.name, state="started")
+                            try:
+                                # to_thread는 현재 context를 복사하므로 스레드에서도 같은 workspace를 사용
+                                outputs[stage.name] = await asyncio.to_thread(stage.run, inp, *args)
+                            except Exception as e:
+                                manifest.fail_stage(stage.name, str(e))
+                                emit("stage", task_id=workspace.task_id, stage=stage.name, state="failed", error=str(e))
+                                raise
+
+                        manifest.complete_stage(stage.name, input_hash, _serialize_output(outputs[stage.name]))
+                        timings[stage.name] = round(time.time() - started, 2)
+                        print(f"✅ [Pipeline] '{stage.name}' 단계 완료 ({timings[stage.name]}초)")
+                        emit("stage", task_id=workspace.task_id, stage=stage.name, state="completed",
+                             elapsed=timings[stage.name])
+
+                    if on_stage_done is not None:
+                        on_stage_done(stage.name, outputs[stage.name])
+        finally:
+            release_manifest(workspace)
+
+        last = outputs[self.stages[-1].name]
+        return PipelineResult(output_path=last.path, outputs=outputs, timings=timings)
+
+
+async def run_pipeline(
+    topic: str,
+    style: str,
+    workspace: JobWorkspace,
+    encoder_profile: Optional[str] = None,
+    on_stage_done: Optional[Callable[[str, Any], None]] = None,
+) -> PipelineResult:
+    """기본 단계 구성으로 파이프라인을 실행하고 결과를 반환합니다."""
+    inp = PipelineInput(topic=topic, style=style, encoder_profile=encoder_profile)
+    return await PipelineRunner().run(inp, workspace, on_stage_done=on_stage_done)
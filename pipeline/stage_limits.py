@@ -0,0 +1,113 @@
+import os
+import asyncio
+import contextlib
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from merge_video.encoding import CPU_COUNT
+
+# 자원 종류별 동시 실행 수 (여러 작업이 동시에 실행돼도 이 수를 넘지 않음)
+#   llm: 가사 / 영상 프롬프트 생성, mureka: 노래 생성 API, whisper: 자막 정렬 (CPU/GPU),
+#   comfyui: 영상 생성 (작업 1개가 모든 ComfyUI 서버를 사용), ffmpeg: 미리보기 / 최종 인코딩 (CPU)
+STAGE_LIMITS: Dict[str, int] = {
+    "llm": int(os.getenv("STAGE_LIMIT_LLM", "4")),
+    "mureka": int(os.getenv("STAGE_LIMIT_MUREKA", "2")),
+    "whisper": int(os.getenv("STAGE_LIMIT_WHISPER", "1")),
+    "comfyui": int(os.getenv("STAGE_LIMIT_COMFYUI", "1")),
+    "ffmpeg": int(os.getenv("STAGE_LIMIT_FFMPEG", str(max(1, CPU_COUNT // 8)))),
+}
+
+# 파이프라인 단계 → 사용하는 자원
+STAGE_RESOURCES: Dict[str, str] = {
+    "lyrics": "llm",
+    "song": "mureka",
+    "srt": "whisper",
+    "video_prompt": "llm",
+    "video": "comfyui",
+    "preview": "ffmpeg",
+    "merge": "ffmpeg",
+}
+
+# 이벤트 루프별 세마포어 (asyncio.Semaphore는 처음 대기한 루프에 묶이므로 루프마다 따로 생성)
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+_waiting: Dict[str, int] = {resource: 0 for resource in STAGE_LIMITS}
+# 단계가 실행 중인 이벤트 루프 (단계 스레드에서 다른 자원의 슬롯을 얻을 때 사용, to_thread가 context를 복사함)
+_stage_loop: ContextVar[Optional[asyncio.AbstractEventLoop]] = ContextVar("stage_loop", default=None)
+
+
+def _semaphore(resource: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    per_loop = _semaphores.setdefault(loop, {})
+    if resource not in per_loop:
+        per_loop[resource] = asyncio.Semaphore(max(1, STAGE_LIMITS[resource]))
+    return per_loop[resource]
+
+
+async def _acquire(resource: str, label: str) -> asyncio.Semaphore:
+    semaphore = _semaphore(resource)
+    if semaphore.locked():
+        print(f"⏳ [{label}] '{resource}' 자원 대기 중... (동시 실행 {STAGE_LIMITS[resource]}개 제한)")
+    started = time.time()
+    _waiting[resource] += 1
+    try:
+        await semaphore.acquire()
+    finally:
+        _waiting[resource] -= 1
+    waited = time.time() - started
+    if waited >= 1:
+        print(f"▶️ [{label}] '{resource}' 슬롯 획득 ({waited:.1f}초 대기)")
+    return semaphore
+
+
+@contextlib.asynccontextmanager
+async def stage_slot(stage: str, label: Optional[str] = None):
+    """
+    단계가 사용하는 자원의 실행 슬롯을 얻을 때까지 기다립니다. (자원 제한이 없는 단계는 바로 실행)
+    단계 실행은 스레드에서 이뤄지지만, 대기는 이벤트 루프에서 하므로 스레드를 점유하지 않습니다.
+    """
+    loop_token = _stage_loop.set(asyncio.get_running_loop())
+    try:
+        resource = STAGE_RESOURCES.get(stage)
+        if resource is None or resource not in STAGE_LIMITS:
+            yield
+            return
+
+        semaphore = await _acquire(resource, label or stage)
+        try:
+            yield
+        finally:
+            semaphore.release()
+    finally:
+        _stage_loop.reset(loop_token)
+
+
+@contextlib.contextmanager
+def resource_slot(resource: str, label: Optional[str] = None):
+    """
+    단계 스레드 안에서 다른 자원의 슬롯을 얻습니다. (예: 스트리밍 영상 단계의 프롬프트 생성 → llm)
+    파이프라인 단계 밖(CLI / 에이전트 모드)에서 호출되면 제한 없이 바로 실행합니다.
+    """
+    loop = _stage_loop.get()
+    if loop is None or resource not in STAGE_LIMITS:
+        yield
+        return
+
+    semaphore = asyncio.run_coroutine_threadsafe(_acquire(resource, label or resource), loop).result()
+    try:
+        yield
+    finally:
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # 이벤트 루프가 이미 닫힘
+            pass
+
+
+def get_stage_limit_metrics() -> Dict[str, dict]:
+    """자원별 제한 / 대기 중인 단계 수 (/api/metrics 용)"""
+    return {
+        resource: {"limit": limit, "waiting": _waiting[resource]}
+        for resource, limit in STAGE_LIMITS.items()
+    }
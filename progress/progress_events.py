@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from workspace.job_workspace import get_workspace
+
+# 작업별로 보관하는 최근 이벤트 수 (늦게 연결한 클라이언트에게 다시 보내줌)
+PROGRESS_HISTORY = int(os.getenv("PROGRESS_HISTORY", "200"))
+# 이벤트를 보관하는 최대 작업 수 (넘으면 오래된 작업부터 삭제)
+PROGRESS_MAX_TASKS = int(os.getenv("PROGRESS_MAX_TASKS", "1000"))
+
+# 이 상태의 status 이벤트가 나오면 스트림을 닫음
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class ProgressBus:
+    """
+    작업별 진행 이벤트를 구독자(SSE 연결)에게 전달합니다.
+    이벤트는 툴 스레드, ComfyUI 루프 등 어디서든 발행할 수 있고,
+    구독자는 자기 이벤트 루프의 asyncio.Queue로 받습니다.
+    """
+
+    def __init__(self, history: int = PROGRESS_HISTORY, max_tasks: int = PROGRESS_MAX_TASKS):
+        self.history_size = history
+        self.max_tasks = max_tasks
+        self._history: "OrderedDict[str, deque]" = OrderedDict()
+        self._seq: Dict[str, int] = {}
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, task_id: str, event: str, data: dict) -> dict:
+        with self._lock:
+            seq = self._seq.get(task_id, 0) + 1
+            self._seq[task_id] = seq
+            item = {"id": seq, "event": event, "task_id": task_id, "time": round(time.time(), 3), **data}
+
+            history = self._history.get(task_id)
+            if history is None:
+                history = self._history[task_id] = deque(maxlen=self.history_size)
+            history.append(item)
+            self._history.move_to_end(task_id)
+            while len(self._history) > self.max_tasks:
+                old_id, _ = self._history.popitem(last=False)
+                self._seq.pop(old_id, None)
+
+            subscribers = list(self._subscribers.get(task_id, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # 구독자의 이벤트 루프가 이미 닫힘
+                pass
+        return item
+
+    def subscribe(self, task_id: str, after: int = 0) -> Tuple[List[dict], asyncio.Queue]:
+        """
+        (지금까지의 이벤트 중 id > after 인 것, 이후 이벤트를 받을 queue)
+        히스토리 조회와 구독 등록을 한 번에 해서 그 사이에 발행된 이벤트를 놓치지 않습니다.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            past = [e for e in self._history.get(task_id, ()) if e["id"] > after]
+            self._subscribers.setdefault(task_id, []).append((asyncio.get_running_loop(), queue))
+        return past, queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        with self._lock:
+            remaining = [s for s in self._subscribers.get(task_id, []) if s[1] is not queue]
+            if remaining:
+                self._subscribers[task_id] = remaining
+            else:
+                self._subscribers.pop(task_id, None)
+
+    def history(self, task_id: str) -> List[dict]:
+        with self._lock:
+            return list(self._history.get(task_id, ()))
+
+
+_bus = ProgressBus()
+
+
+def get_progress_bus() -> ProgressBus:
+    return _bus
+
+
+def current_task_id() -> Optional[str]:
+    """현재 작업 context의 task_id (CLI 실행 등 작업 밖이면 None)"""
+    return get_workspace().task_id
+
+
+def emit(event: str, task_id: Optional[str] = None, **data) -> Optional[dict]:
+    """
+    진행 이벤트 발행. task_id를 주지 않으면 현재 작업(workspace)의 task_id를 사용하고,
+    작업 밖에서 호출되면 아무것도 하지 않습니다. (print 로그를 대체하지 않고 함께 사용)
+    """
+    task_id = task_id or current_task_id()
+    if not task_id:
+        return None
+    return _bus.publish(task_id, event, data)
+
+
+def is_terminal(event: dict) -> bool:
+    """작업이 끝났음을 알리는 이벤트인지 (이후로는 이벤트가 오지 않음)"""
+    return event.get("event") == "status" and event.get("status") in TERMINAL_STATUSES
+
+
+def current_run(events: List[dict], finished: bool) -> List[dict]:
+    """
+    재시도한 작업의 이벤트 기록에서 현재 실행의 이벤트만 남깁니다.
+    이전 실행은 종료 이벤트(failed 등)로 끝나므로 마지막 경계 이후만 반환하고,
+    작업이 끝났다면(finished) 기록의 마지막 종료 이벤트는 현재 실행의 것이므로 경계로 보지 않습니다.
+    """
+    ends = [i for i, event in enumerate(events) if is_terminal(event)]
+    if finished and ends and ends[-1] == len(events) - 1:
+        ends.pop()
+    return events[ends[-1] + 1:] if ends else events
+
+
+def format_sse(event: dict) -> str:
+    """Server-Sent Events 메시지 형식 (id는 재연결 시 Last-Event-ID로 돌아옴)"""
+    lines = []
+    if "id" in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['event']}")
+    lines.append(f"data: {json.dumps(event, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
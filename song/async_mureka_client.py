@@ -0,0 +1,207 @@
+import os
+import uuid
+import asyncio
+from dataclasses import dataclass
+from typing import List, Optional
+
+import httpx
+
+from common.download import DOWNLOAD_TIMEOUT, adownload_file
+from progress.progress_events import emit
+
+# 폴링 간격: 처음에는 짧게, 이후 POLL_BACKOFF배씩 늘려 POLL_MAX_INTERVAL까지 (초)
+POLL_INITIAL_INTERVAL = 3.0
+POLL_MAX_INTERVAL = 15.0
+POLL_BACKOFF = 1.5
+# 노래 1곡 생성 최대 대기 시간 (초)
+GENERATION_TIMEOUT = 600
+REQUEST_TIMEOUT = 30
+
+FAILED_STATUSES = ("failed", "timeouted", "cancelled")
+
+
+class MurekaError(Exception):
+    """Mureka 작업 생성/조회 실패"""
+
+
+@dataclass
+class SongCandidate:
+    path: str
+    duration: float
+    task_id: str
+    choice_index: int
+
+
+class AsyncMurekaClient:
+    """
+    Mureka API asyncio 클라이언트 (httpx 연결 풀 사용).
+    고정 10초 대기 대신 POLL_INITIAL_INTERVAL부터 점점 늘려가며 상태를 조회합니다.
+    """
+
+    def __init__(self, api_url: str, api_key: str):
+        self.api_url = (api_url or "").rstrip("/")
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            timeout=REQUEST_TIMEOUT,
+        )
+        # 노래 파일(CDN) 다운로드 전용: API 키를 보내지 않고, 리다이렉트를 따라감
+        self.download_client = httpx.AsyncClient(follow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+
+    async def close(self):
+        await asyncio.gather(self.client.aclose(), self.download_client.aclose())
+
+    async def create_task(self, lyrics: str, prompt: str, model: str = "mureka-7.5") -> str:
+        response = await self.client.post(
+            f"{self.api_url}/v1/song/generate",
+            json={"lyrics": lyrics, "model": model, "prompt": prompt},
+        )
+        response.raise_for_status()
+        task_id = response.json().get("id")
+        if not task_id:
+            raise MurekaError("작업 ID 수신 실패")
+        return task_id
+
+    async def query(self, task_id: str) -> dict:
+        response = await self.client.get(f"{self.api_url}/v1/song/query/{task_id}")
+        response.raise_for_status()
+        return response.json()
+
+    async def wait_for_choices(self, task_id: str, timeout: float = GENERATION_TIMEOUT) -> List[dict]:
+        """작업이 끝날 때까지 폴링하고 choices(생성된 노래 목록)를 반환합니다."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = POLL_INITIAL_INTERVAL
+
+        while True:
+            await asyncio.sleep(interval)
+            data = await self.query(task_id)
+            status = (data.get("status") or "").lower()
+            print(f"   ... [{task_id}] 진행 중 (상태: {status})")
+
+            if status == "succeeded":
+                choices = [c for c in data.get("choices", []) if c.get("url")]
+                if not choices:
+                    raise MurekaError("결과 URL이 없습니다.")
+                return choices
+            if status in FAILED_STATUSES:
+                raise MurekaError(f"생성 실패: {data.get('error_message') or status}")
+            if loop.time() >= deadline:
+                raise MurekaError(f"생성 대기 시간 초과 ({timeout}초)")
+
+            interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+
+    async def download_choice(self, choice: dict, dest_path: str) -> str:
+        return await adownload_file(self.download_client, choice["url"], dest_path)
+
+
+async def generate_candidate(
+    client: AsyncMurekaClient,
+    lyrics: str,
+    prompt: str,
+    work_dir: str,
+    measure_duration,
+    max_duration: float,
+    label: str,
+) -> List[SongCandidate]:
+    """
+    노래 1개 작업을 생성하고, 결과 choices를 순서대로 확인합니다.
+    길이 조건을 만족하는 곡을 찾으면 그 곡만, 없으면 확인한 모든 곡을 반환합니다.
+    """
+    task_id = await client.create_task(lyrics, prompt)
+    print(f"✅ [{label}] 작업 ID: {task_id}")
+
+    choices = await client.wait_for_choices(task_id)
+    checked = []
+    for i, choice in enumerate(choices):
+        path = os.path.join(work_dir, f"candidate_{uuid.uuid4().hex[:8]}.mp3")
+        await client.download_choice(choice, path)
+        # ffprobe 등 동기 측정 함수는 이벤트 루프를 막지 않도록 스레드에서 실행
+        duration = await asyncio.to_thread(measure_duration, path)
+        print(f"⏱️ [{label}] choice {i + 1}/{len(choices)} 길이: {duration:.1f}초")
+        emit("song", state="candidate", candidate=label, choice=i + 1, duration=round(duration, 1),
+             accepted=duration <= max_duration)
+
+        candidate = SongCandidate(path=path, duration=duration, task_id=task_id, choice_index=i)
+        if duration <= max_duration:
+            return [candidate]
+        checked.append(candidate)
+    return checked
+
+
+async def generate_song(
+    client: AsyncMurekaClient,
+    lyrics: str,
+    prompt: str,
+    work_dir: str,
+    measure_duration,
+    max_duration: float,
+    candidates: int = 1,
+    max_generations: int = 5,
+) -> Optional[SongCandidate]:
+    """
+    candidates개의 노래 생성을 동시에 시작하고, 길이 조건을 만족하는 곡이 처음 나오면 나머지는 취소합니다.
+    조건을 만족하는 곡이 없으면 총 max_generations개까지 다시 시도하고,
+    끝내 없으면 가장 짧은 곡을 반환합니다. (하나도 생성되지 않으면 None)
+    """
+    candidates = max(1, candidates)
+    fallback: Optional[SongCandidate] = None
+    started = 0
+    round_no = 0
+
+    def _discard(items: List[SongCandidate]):
+        for c in items:
+            if os.path.exists(c.path):
+                os.remove(c.path)
+
+    while started < max_generations:
+        round_no += 1
+        batch = min(candidates, max_generations - started)
+        started += batch
+        print(f"\n🎵 [라운드 {round_no}] 노래 후보 {batch}개 동시 생성 시작... (누적 {started}/{max_generations})")
+        emit("song", state="attempt", attempt=round_no, candidates=batch, started=started, max_generations=max_generations)
+
+        tasks = [
+            asyncio.create_task(
+                generate_candidate(client, lyrics, prompt, work_dir, measure_duration, max_duration, f"후보 {started - batch + i + 1}")
+            )
+            for i in range(batch)
+        ]
+
+        winner = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    results = await next_done
+                except Exception as e:
+                    print(f"❌ 후보 생성 실패: {e}")
+                    emit("song", state="candidate_failed", error=str(e))
+                    continue
+
+                for c in results:
+                    if winner is None and c.duration <= max_duration:
+                        winner = c
+                    elif fallback is None or c.duration < fallback.duration:
+                        if fallback is not None:
+                            _discard([fallback])
+                        fallback = c
+                    else:
+                        _discard([c])
+                if winner is not None:
+                    break
+        finally:
+            # 이미 조건을 만족하는 곡을 찾았으면 나머지 후보는 기다리지 않음
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if winner is not None:
+            if fallback is not None:
+                _discard([fallback])
+            return winner
+
+        if started < max_generations:
+            print("♻️ 길이 조건을 만족하는 곡이 없어 다시 생성합니다...")
+
+    if fallback is not None:
+        print("🛑 최대 생성 횟수 초과. 가장 짧은 결과물을 사용합니다.")
+    return fallback
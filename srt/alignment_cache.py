@@ -0,0 +1,83 @@
+import os
+import uuid
+import shutil
+import hashlib
+import threading
+from typing import Optional
+
+from common.file_hash import file_digest
+from workspace.job_workspace import FILES_DIR
+
+# 같은 오디오 + 가사 + 모델 + 언어의 정렬 결과(SRT)를 저장하는 폴더
+CACHE_DIR = os.path.join(FILES_DIR, "cache", "alignment")
+# 캐시 전체 최대 크기 (넘으면 가장 오래 사용하지 않은 항목부터 삭제)
+MAX_CACHE_BYTES = int(os.getenv("ALIGNMENT_CACHE_MAX_MB", "200")) * 1024 * 1024
+
+
+def cache_key(audio_path: str, lyrics_text: str, model_name: str, language: str) -> str:
+    """오디오 내용 해시 + 가사 + 모델 + 언어로 캐시 키 생성"""
+    h = hashlib.sha256()
+    for part in (file_digest(audio_path), lyrics_text, model_name, language):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class AlignmentCache:
+    """
+    정렬 결과 SRT를 내용 해시로 저장하는 디스크 캐시.
+    재시도 등으로 같은 노래/가사를 다시 정렬할 때 Whisper를 실행하지 않고 바로 복사합니다.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.srt")
+
+    def get(self, key: str, dest_path: str) -> bool:
+        """캐시에 있으면 dest_path로 복사하고 True를 반환합니다."""
+        path = self._path(key)
+        with self._lock:
+            if not os.path.exists(path):
+                return False
+            os.utime(path)  # 최근 사용 시각 갱신 (LRU)
+            shutil.copyfile(path, dest_path)
+        return True
+
+    def put(self, key: str, src_path: str):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self._path(key)}.{uuid.uuid4().hex[:8]}.part"
+        shutil.copyfile(src_path, tmp_path)
+        with self._lock:
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".srt"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+
+_cache: Optional[AlignmentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_alignment_cache() -> AlignmentCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AlignmentCache()
+    return _cache
@@ -0,0 +1,210 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+# Whisper 모델 크기 (tiny, base, ...)
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", "base")
+CPU_COUNT = os.cpu_count() or 1
+# 정렬 작업 실행 방식: "thread" (모델 1개 공유, worker 1개) 또는 "process" (worker 프로세스마다 모델 1개)
+# 파이프라인은 한 번에 1개 작업만 정렬하므로(STAGE_LIMIT_WHISPER) 기본값은 thread 1개, 병렬 정렬은 process로 직접 설정
+POOL_KIND = os.getenv("WHISPER_POOL", "thread")
+POOL_WORKERS = int(os.getenv("WHISPER_WORKERS", "1"))
+
+# 프로세스(또는 thread 모드의 메인 프로세스)마다 모델을 하나만 로드
+_models = {}
+_model_lock = threading.Lock()
+
+
+def get_model(model_name: str = WHISPER_MODEL_NAME):
+    """Whisper 모델을 처음 사용할 때 로드합니다. (import 시점에는 로드하지 않음)"""
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _model_lock:
+        model = _models.get(model_name)
+        if model is None:
+            import stable_whisper
+
+            print(f"⏳ Whisper 모델 로딩 중... ({model_name}, 최초 1회)")
+            model = stable_whisper.load_model(model_name)
+            _models[model_name] = model
+            print("✅ Whisper 모델 로드 완료.")
+    return model
+
+
+def _preload_models(model_names: Sequence[str]):
+    for model_name in model_names:
+        get_model(model_name)
+
+
+def _init_process_worker(model_names: Sequence[str], torch_threads: int):
+    """process 모드 worker 초기화: CPU 코어를 worker끼리 나눠 쓰고 정렬에 사용할 모델을 미리 로드"""
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except Exception:
+        pass
+    _preload_models(model_names)
+
+
+def align_to_srt(audio_path: str, lyrics_text: str, output_srt_path: str,
+                 language: str = "ko", model_name: str = WHISPER_MODEL_NAME) -> str:
+    """worker에서 실행되는 실제 정렬 작업. SRT 파일 경로를 반환합니다."""
+    result = get_model(model_name).align(audio_path, lyrics_text, language=language)
+    result.to_srt_vtt(output_srt_path)
+    return output_srt_path
+
+
+def align_segments(audio_path: str, lyrics_text: str, language: str = "ko",
+                   model_name: str = WHISPER_MODEL_NAME) -> List[dict]:
+    """정렬 결과를 SRT 파일 대신 구간 목록 [{start, end, text}]으로 반환합니다. (빠른 정렬 모드용)"""
+    result = get_model(model_name).align(audio_path, lyrics_text, language=language)
+    return [
+        {"start": float(seg.start), "end": float(seg.end), "text": seg.text.strip()}
+        for seg in result.segments
+        if seg.text.strip()
+    ]
+
+
+class AlignmentPool:
+    """
+    Whisper 정렬(align) 전용 작업 풀.
+    FastAPI 이벤트 루프나 다른 단계의 스레드를 막지 않도록 정해진 수의 worker에서만 실행하고,
+    대기열 길이 등 상태를 metrics()로 제공합니다.
+    """
+
+    def __init__(self, kind: str = POOL_KIND, workers: int = POOL_WORKERS, model_name: str = WHISPER_MODEL_NAME,
+                 preload: Optional[Sequence[str]] = None):
+        if kind == "thread" and workers > 1:
+            # 공유 모델 1개를 동시에 사용하지 않도록 thread 모드는 한 번에 1개씩만 정렬
+            print(f"⚠️ WHISPER_POOL=thread 에서는 모델을 공유하므로 worker를 1개로 제한합니다. (요청: {workers}개, 병렬 정렬은 WHISPER_POOL=process)")
+            workers = 1
+        self.kind = kind
+        self.workers = workers
+        self.model_name = model_name
+        # worker 시작 / warm_up 때 미리 로드할 모델 (정렬 모드가 실제로 사용하는 모델)
+        self.preload = tuple(preload or (model_name,))
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    torch_threads = max(1, CPU_COUNT // self.workers)
+                    # 멀티스레드 서버 프로세스를 fork하면 다른 스레드가 잡고 있던 lock 때문에 멈출 수 있으므로 spawn 사용
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_process_worker,
+                        initargs=(self.preload, torch_threads),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whisper-align")
+            return self._executor
+
+    def _run(self, fn, *args):
+        """thread 모드: 실행 시작/종료 시점을 기록하며 작업 실행"""
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def submit_task(self, fn, *args) -> Future:
+        """worker에서 fn(*args)를 실행합니다. (process 모드에서는 fn과 인자가 pickle 가능해야 함)"""
+        executor = self._get_executor()
+        started = time.time()
+
+        with self._lock:
+            self.submitted += 1
+
+        if self.kind == "process":
+            future = executor.submit(fn, *args)
+        else:
+            future = executor.submit(self._run, fn, *args)
+
+        def _on_done(f):
+            with self._lock:
+                self.total_seconds += time.time() - started
+                if f.exception() is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+        future.add_done_callback(_on_done)
+        return future
+
+    def submit(self, audio_path: str, lyrics_text: str, output_srt_path: str, language: str = "ko") -> Future:
+        return self.submit_task(align_to_srt, audio_path, lyrics_text, output_srt_path, language, self.model_name)
+
+    def align(self, audio_path: str, lyrics_text: str, output_srt_path: str, language: str = "ko") -> str:
+        """정렬을 풀에 맡기고 끝날 때까지 기다립니다. (동기 툴용)"""
+        return self.submit(audio_path, lyrics_text, output_srt_path, language).result()
+
+    async def aalign(self, audio_path: str, lyrics_text: str, output_srt_path: str, language: str = "ko") -> str:
+        """이벤트 루프를 막지 않고 정렬 결과를 기다립니다."""
+        return await asyncio.wrap_future(self.submit(audio_path, lyrics_text, output_srt_path, language))
+
+    def warm_up(self):
+        """모델을 미리 로드합니다. (process 모드는 worker들을 미리 띄움)"""
+        executor = self._get_executor()
+        if self.kind == "process":
+            # 동시에 workers개를 제출하면 worker 프로세스가 모두 시작되고, 각 worker가 initializer에서 모델을 로드
+            for f in [executor.submit(_preload_models, self.preload) for _ in range(self.workers)]:
+                f.result()
+        else:
+            _preload_models(self.preload)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            finished = self.completed + self.failed
+            pending = self.submitted - finished
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "model": ",".join(self.preload),
+                "model_loaded": all(m in _models for m in self.preload) if self.kind == "thread" else self._executor is not None,
+                "queue_depth": max(0, pending - self.running) if self.kind == "thread" else max(0, pending - self.workers),
+                "in_progress": pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_seconds": round(self.total_seconds / finished, 2) if finished else None,
+            }
+
+
+_pool: Optional[AlignmentPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_alignment_pool() -> AlignmentPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 순환 import 방지 (fast_alignment가 이 모듈을 import함)
+            from srt.fast_alignment import ALIGN_MODE, model_for_mode
+
+            _pool = AlignmentPool(preload=(model_for_mode(ALIGN_MODE),))
+    return _pool
+
+
+def warm_up():
+    """서버 시작 시 호출할 수 있는 warm-up hook"""
+    get_alignment_pool().warm_up()
+
+
+def get_alignment_metrics() -> dict:
+    return get_alignment_pool().metrics()
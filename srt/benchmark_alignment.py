@@ -0,0 +1,77 @@
+"""
+정렬 모드별 소요 시간과 자막 시간 오차(drift)를 비교하는 스크립트.
+full 모드 결과를 기준으로 각 자막의 시작 시간 차이를 계산합니다.
+
+사용법 (프로젝트 루트에서):
+    python -m srt.benchmark_alignment files/song.mp3 files/lyrics.txt --modes full,fast,chunked --runs 2
+    python -m srt.benchmark_alignment files/song.mp3 files/lyrics.txt --pool process --workers 4
+"""
+import argparse
+import statistics
+import time
+
+from srt.alignment_pool import POOL_KIND, POOL_WORKERS, AlignmentPool
+from srt.fast_alignment import ALIGN_MODES, collect_segments, model_for_mode
+
+
+def timestamp_drift(reference, segments):
+    """같은 가사 줄끼리 시작 시간 차이(초)를 비교합니다. (기준에 없는 줄은 제외)"""
+    ref_starts = {}
+    for seg in reference:
+        ref_starts.setdefault(seg["text"], seg["start"])
+
+    diffs = [abs(seg["start"] - ref_starts[seg["text"]]) for seg in segments if seg["text"] in ref_starts]
+    if not diffs:
+        return None
+    return {
+        "matched": f"{len(diffs)}/{len(reference)}",
+        "mean": round(statistics.mean(diffs), 3),
+        "max": round(max(diffs), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper 정렬 모드 벤치마크")
+    parser.add_argument("audio")
+    parser.add_argument("lyrics")
+    parser.add_argument("--modes", default=",".join(ALIGN_MODES))
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--language", default="ko")
+    parser.add_argument("--pool", choices=("thread", "process"), default=POOL_KIND)
+    parser.add_argument("--workers", type=int, default=POOL_WORKERS)
+    args = parser.parse_args()
+
+    with open(args.lyrics, "r", encoding="utf-8") as f:
+        lyrics_text = f.read()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    # full 모드는 drift 계산 기준이므로 항상 실행
+    if "full" not in modes:
+        modes.insert(0, "full")
+
+    # 모델 로딩 시간은 측정에서 제외: 정렬이 실제로 실행되는 worker(process 모드는 worker 프로세스마다)에 미리 로드
+    pool = AlignmentPool(kind=args.pool, workers=args.workers, preload=sorted({model_for_mode(m) for m in modes}))
+    pool.warm_up()
+
+    results = {}
+    for mode in modes:
+        latencies, segments = [], []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            segments = collect_segments(args.audio, lyrics_text, args.language, mode, pool=pool)
+            latencies.append(time.perf_counter() - started)
+        results[mode] = (latencies, segments)
+
+    reference = results["full"][1]
+    print(f"\npool: {pool.kind} x {pool.workers}")
+    print(f"{'mode':<10}{'model':<8}{'latency(s)':>12}{'segments':>10}  drift(s)")
+    for mode, (latencies, segments) in results.items():
+        drift = timestamp_drift(reference, segments) if mode != "full" else None
+        print(
+            f"{mode:<10}{model_for_mode(mode):<8}{statistics.median(latencies):>12.2f}{len(segments):>10}  "
+            f"{drift if drift else '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import os
+import re
+import tempfile
+from typing import List, Optional, Tuple
+
+from srt.alignment_pool import WHISPER_MODEL_NAME, AlignmentPool, align_segments, get_alignment_pool
+
+# 정렬 모드
+#   full    : 원본 mp3 전체를 WHISPER_MODEL로 정렬 (기존 방식)
+#   fast    : 16kHz mono 변환 + 앞뒤 무음 제거 후 WHISPER_FAST_MODEL로 정렬
+#   chunked : fast 전처리 후 가사 섹션([Verse 1], [Chorus] ...)별로 나눠 병렬 정렬
+ALIGN_MODES = ("full", "fast", "chunked")
+ALIGN_MODE = os.getenv("WHISPER_ALIGN_MODE", "full")
+FAST_MODEL_NAME = os.getenv("WHISPER_FAST_MODEL", "tiny")
+
+SAMPLE_RATE = 16000
+# 이 값(dBFS)보다 작은 소리는 무음으로 간주
+SILENCE_THRESHOLD_DB = -45.0
+# 섹션별 구간을 자를 때 앞뒤로 여유를 두는 시간 (초) - 구간 추정 오차 보정
+CHUNK_PADDING = 3.0
+
+SECTION_PATTERN = re.compile(r"^\s*\[(.+?)\]\s*$")
+
+
+def model_for_mode(mode: str) -> str:
+    return WHISPER_MODEL_NAME if mode == "full" else FAST_MODEL_NAME
+
+
+def preprocess_audio(audio_path: str, out_path: str) -> Tuple[float, float]:
+    """
+    오디오를 16kHz mono wav로 변환하고 앞뒤 무음을 잘라 out_path에 저장합니다.
+    (잘라낸 앞부분 길이(초), 남은 길이(초))를 반환합니다.
+    """
+    from pydub import AudioSegment
+    from pydub.silence import detect_leading_silence
+
+    audio = AudioSegment.from_file(audio_path).set_channels(1).set_frame_rate(SAMPLE_RATE)
+    head = detect_leading_silence(audio, silence_threshold=SILENCE_THRESHOLD_DB)
+    tail = detect_leading_silence(audio.reverse(), silence_threshold=SILENCE_THRESHOLD_DB)
+
+    if head + tail >= len(audio):
+        head, tail = 0, 0
+    trimmed = audio[head:len(audio) - tail]
+    trimmed.export(out_path, format="wav")
+    return head / 1000.0, len(trimmed) / 1000.0
+
+
+def split_sections(lyrics_text: str) -> List[str]:
+    """가사를 [Verse 1], [Outro] 같은 섹션 태그 기준으로 나눕니다. (태그 줄은 제외)"""
+    sections, current = [], []
+    for line in lyrics_text.splitlines():
+        if SECTION_PATTERN.match(line):
+            if current:
+                sections.append("\n".join(current))
+            current = []
+        elif line.strip():
+            current.append(line.strip())
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+
+def plan_chunks(sections: List[str], duration: float) -> List[Tuple[float, float, str]]:
+    """
+    섹션마다 오디오 구간 (start, end, text)을 정합니다.
+    섹션 위치는 알 수 없으므로 가사 글자 수에 비례해 나누고 앞뒤로 CHUNK_PADDING만큼 겹치게 자릅니다.
+    """
+    total_chars = sum(len(s) for s in sections) or 1
+    chunks, cursor = [], 0.0
+    for text in sections:
+        span = duration * len(text) / total_chars
+        start = max(0.0, cursor - CHUNK_PADDING)
+        end = min(duration, cursor + span + CHUNK_PADDING)
+        chunks.append((start, end, text))
+        cursor += span
+    return chunks
+
+
+def _stitch(segments: List[dict]) -> List[dict]:
+    """시작 시간 순으로 정렬하고 겹치는 자막이 없도록 정리"""
+    stitched = []
+    for seg in sorted(segments, key=lambda s: s["start"]):
+        if stitched and seg["start"] < stitched[-1]["end"]:
+            seg = {**seg, "start": stitched[-1]["end"]}
+        if seg["end"] <= seg["start"]:
+            continue
+        stitched.append(seg)
+    return stitched
+
+
+def _shift(segments: List[dict], offset: float) -> List[dict]:
+    return [{**seg, "start": seg["start"] + offset, "end": seg["end"] + offset} for seg in segments]
+
+
+def collect_segments(audio_path: str, lyrics_text: str, language: str = "ko",
+                     mode: str = ALIGN_MODE, pool: Optional[AlignmentPool] = None) -> List[dict]:
+    """지정한 모드로 정렬해 원본 오디오 기준 시간의 구간 목록을 반환합니다."""
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"지원하지 않는 정렬 모드: {mode} (가능: {', '.join(ALIGN_MODES)})")
+
+    pool = pool or get_alignment_pool()
+    model_name = model_for_mode(mode)
+
+    if mode == "full":
+        return pool.submit_task(align_segments, audio_path, lyrics_text, language, model_name).result()
+
+    from pydub import AudioSegment
+
+    with tempfile.TemporaryDirectory(prefix="align_") as tmp_dir:
+        prepared_path = os.path.join(tmp_dir, "prepared.wav")
+        offset, duration = preprocess_audio(audio_path, prepared_path)
+
+        sections = split_sections(lyrics_text) if mode == "chunked" else []
+        if len(sections) < 2:
+            segments = pool.submit_task(align_segments, prepared_path, lyrics_text, language, model_name).result()
+            return _shift(segments, offset)
+
+        prepared = AudioSegment.from_wav(prepared_path)
+        futures = []
+        for i, (start, end, text) in enumerate(plan_chunks(sections, duration)):
+            chunk_path = os.path.join(tmp_dir, f"chunk_{i}.wav")
+            prepared[int(start * 1000):int(end * 1000)].export(chunk_path, format="wav")
+            futures.append((start, pool.submit_task(align_segments, chunk_path, text, language, model_name)))
+
+        segments = []
+        for start, future in futures:
+            segments.extend(_shift(future.result(), offset + start))
+        return _stitch(segments)
+
+
+def _format_timestamp(seconds: float) -> str:
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def write_srt(segments: List[dict], output_srt_path: str) -> str:
+    with open(output_srt_path, "w", encoding="utf-8") as f:
+        for i, seg in enumerate(segments, start=1):
+            f.write(f"{i}\n{_format_timestamp(seg['start'])} --> {_format_timestamp(seg['end'])}\n{seg['text']}\n\n")
+    return output_srt_path
+
+
+def align_with_mode(audio_path: str, lyrics_text: str, output_srt_path: str,
+                    language: str = "ko", mode: str = ALIGN_MODE) -> str:
+    """
+    모드에 따라 정렬하고 SRT를 저장합니다.
+    full 모드는 기존과 같은 stable-ts 출력(to_srt_vtt)을 그대로 사용합니다.
+    """
+    if mode == "full":
+        return get_alignment_pool().align(audio_path, lyrics_text, output_srt_path, language=language)
+    return write_srt(collect_segments(audio_path, lyrics_text, language, mode), output_srt_path)
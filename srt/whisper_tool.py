@@ -8,16 +8,12 @@ os.environ["GRPC_TRACE"] = ""             # gRPC 트레이스 끄기
 warnings.filterwarnings("ignore")         # 파이썬 경고 무시
 
 
-import stable_whisper
 from langchain.tools import tool
 
-print("⏳ Whisper 모델 로딩 중... (최초 1회)")
-try:
-    model = stable_whisper.load_model("base")
-    print("✅ Whisper 모델 로드 완료.")
-except Exception as e:
-    print(f"⚠️ 모델 로드 실패: {e}")
-    model = None
+from srt.alignment_cache import cache_key, get_alignment_cache
+from srt.fast_alignment import ALIGN_MODE, align_with_mode, model_for_mode
+from workspace.job_workspace import get_workspace
+
 
 @tool
 def generate_srt_tool(audio_file_path: str, lyrics_file_path: str) -> str:
@@ -29,9 +25,6 @@ def generate_srt_tool(audio_file_path: str, lyrics_file_path: str) -> str:
     """
     print(f"\n--- 🛠️ 'SRT 자막 생성' 툴 호출됨 ---")
     
-    if model is None:
-        return "오류: Whisper 모델이 로드되지 않았습니다. stable-ts 패키지 설치를 확인하세요."
-
     if not os.path.exists(audio_file_path):
         return f"오류: 오디오 파일 '{audio_file_path}'을 찾을 수 없습니다."
     if not os.path.exists(lyrics_file_path):
@@ -44,21 +37,32 @@ def generate_srt_tool(audio_file_path: str, lyrics_file_path: str) -> str:
     except Exception as e:
         return f"오류: 가사 파일 읽기 실패. {e}"
 
-    # 출력 파일명 설정 (song.mp3 -> song.srt)
-    output_srt_path = os.path.splitext(audio_file_path)[0] + ".srt"
+    # 출력 파일명 설정 (작업 폴더의 song.srt - merge 단계에서 이 경로를 사용)
+    output_srt_path = get_workspace().srt_path
+
+    # 같은 오디오 + 가사를 이미 정렬한 적이 있으면 캐시된 결과를 사용
+    cache = get_alignment_cache()
+    key = cache_key(audio_file_path, lyrics_text, f"{model_for_mode(ALIGN_MODE)}:{ALIGN_MODE}", 'ko')
+    if cache.get(key, output_srt_path):
+        print(f"✅ SRT 캐시 사용: {output_srt_path}")
+        return output_srt_path
 
     # 3. 강제 정렬 (Alignment) 실행
-    print(f"🎵 '{audio_file_path}' 오디오와 가사를 매칭 중...")
+    print(f"🎵 '{audio_file_path}' 오디오와 가사를 매칭 중... (모드: {ALIGN_MODE})")
     try:
-        # align() 함수가 핵심입니다.
-        result = model.align(audio_file_path, lyrics_text, language='ko')
-        
-        # SRT 저장
-        result.to_srt_vtt(output_srt_path)
+        # 정렬은 정렬 전용 worker 풀에서 실행 (모델은 처음 사용할 때 로드)
+        align_with_mode(audio_file_path, lyrics_text, output_srt_path, language='ko', mode=ALIGN_MODE)
         print(f"✅ SRT 생성 완료: {output_srt_path}")
+
+        try:
+            cache.put(key, output_srt_path)
+        except OSError as e:
+            print(f"⚠️ SRT 캐시 저장 실패: {e}")
         
         return output_srt_path
 
+    except ImportError as e:
+        return f"오류: Whisper 모델을 로드할 수 없습니다. stable-ts 패키지 설치를 확인하세요. {e}"
     except Exception as e:
         print(f"SRT 생성 중 오류 발생: {e}")
         return f"실패: SRT 생성 중 오류가 발생했습니다. {e}"
\ No newline at end of file
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+from workspace.job_workspace import FILES_DIR
+
+# 작업 저장소: "memory" (프로세스 1개 전용) 또는 "sqlite" (여러 uvicorn worker가 공유)
+TASK_STORE = os.getenv("TASK_STORE", "memory")
+TASK_STORE_PATH = os.getenv("TASK_STORE_PATH", os.path.join(FILES_DIR, "tasks.db"))
+# 끝난(completed/failed) 작업을 보관하는 시간 (초)
+TASK_TTL_SECONDS = int(os.getenv("TASK_TTL_SECONDS", str(24 * 3600)))
+# memory 저장소의 최대 작업 수 (넘으면 끝난 작업을 오래된 것부터 삭제)
+TASK_MAX_ENTRIES = int(os.getenv("TASK_MAX_ENTRIES", "10000"))
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+class TaskStore(ABC):
+    """
+    작업 상태 저장소 인터페이스.
+    작업 1개는 /api/status 응답 그대로의 dict 입니다. ({"status", "result", "error", ...})
+    """
+
+    @abstractmethod
+    def create(self, task_id: str, record: dict):
+        """새 작업을 저장합니다. (같은 task_id가 있으면 덮어씀)"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[dict]:
+        """작업 조회. 없거나 만료되었으면 None"""
+
+    @abstractmethod
+    def update(self, task_id: str, **fields) -> Optional[dict]:
+        """일부 필드만 갱신합니다. 작업이 없으면 None"""
+
+    @abstractmethod
+    def list(self, status: Optional[str] = None, older_than: Optional[float] = None, limit: int = 100) -> List[dict]:
+        """status / 마지막 갱신 후 경과 시간(초) 조건으로 작업 목록 조회 (오래된 순)"""
+
+    @abstractmethod
+    def purge_expired(self) -> List[str]:
+        """TTL이 지난 끝난 작업을 삭제하고 삭제한 task_id 목록을 반환합니다. (작업 폴더 정리용)"""
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+
+class MemoryTaskStore(TaskStore):
+    """프로세스 메모리 저장소. 끝난 작업은 TTL이 지나면, 전체 개수가 max_entries를 넘으면 오래된 것부터 삭제 (진행 중인 작업은 유지)"""
+
+    def __init__(self, ttl: float = TASK_TTL_SECONDS, max_entries: int = TASK_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # task_id → (record, created_at, updated_at), 마지막 갱신 순서로 유지
+        self._tasks: "OrderedDict[str, tuple]" = OrderedDict()
+        # 삭제했지만 아직 purge_expired로 반환하지 않은 task_id (get / create 중에 삭제된 작업 포함)
+        self._removed: List[str] = []
+        self._lock = threading.Lock()
+
+    def create(self, task_id: str, record: dict):
+        now = time.time()
+        with self._lock:
+            self._tasks[task_id] = (dict(record), now, now)
+            self._tasks.move_to_end(task_id)
+            self._evict(now)
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._tasks.get(task_id)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                del self._tasks[task_id]
+                self._removed.append(task_id)
+                return None
+            return dict(entry[0])
+
+    def update(self, task_id: str, **fields) -> Optional[dict]:
+        with self._lock:
+            entry = self._tasks.get(task_id)
+            if entry is None:
+                return None
+            record, created_at, _ = entry
+            record.update(fields)
+            self._tasks[task_id] = (record, created_at, time.time())
+            self._tasks.move_to_end(task_id)
+            return dict(record)
+
+    def list(self, status: Optional[str] = None, older_than: Optional[float] = None, limit: int = 100) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            rows = []
+            for task_id, (record, created_at, updated_at) in self._tasks.items():
+                if status and record.get("status") != status:
+                    continue
+                if older_than is not None and now - updated_at < older_than:
+                    continue
+                rows.append({"task_id": task_id, **record})
+                if len(rows) >= limit:
+                    break
+            return rows
+
+    def purge_expired(self) -> List[str]:
+        with self._lock:
+            self._evict(time.time())
+            removed, self._removed = self._removed, []
+            return removed
+
+    def _expired(self, entry: tuple, now: float) -> bool:
+        record, _, updated_at = entry
+        return record.get("status") in FINISHED_STATUSES and now - updated_at > self.ttl
+
+    def _evict(self, now: float) -> int:
+        expired = [task_id for task_id, entry in self._tasks.items() if self._expired(entry, now)]
+        for task_id in expired:
+            del self._tasks[task_id]
+        self._removed.extend(expired)
+        removed = len(expired)
+
+        over = len(self._tasks) - self.max_entries
+        if over > 0:
+            # 대기 중 / 실행 중인 작업은 지우지 않고, 끝난 작업만 오래된 것부터 삭제
+            finished = [
+                task_id for task_id, (record, _, _) in self._tasks.items()
+                if record.get("status") in FINISHED_STATUSES
+            ][:over]
+            for task_id in finished:
+                del self._tasks[task_id]
+            self._removed.extend(finished)
+            removed += len(finished)
+            if len(self._tasks) > self.max_entries:
+                print(f"⚠️ 작업 저장소가 최대 개수를 넘었습니다: {len(self._tasks)}/{self.max_entries} (진행 중인 작업은 삭제하지 않음)")
+        return removed
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    SQLite 파일 저장소. 여러 worker 프로세스가 같은 파일을 공유할 수 있고 (WAL 모드),
+    status / 갱신 시각 인덱스로 상태별 조회와 만료 작업 삭제를 빠르게 처리합니다.
+    """
+
+    def __init__(self, path: str = TASK_STORE_PATH, ttl: float = TASK_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " task_id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_updated ON tasks (status, updated_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_updated ON tasks (updated_at)")
+
+    @contextmanager
+    def _connect(self):
+        # 요청마다 연결 (스레드/프로세스 간 공유하지 않음), 다른 worker가 쓰는 중이면 잠시 대기
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            conn.execute("PRAGMA busy_timeout=10000")
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, task_id: str, record: dict):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tasks (task_id, status, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (task_id, record.get("status") or "", json.dumps(record, ensure_ascii=False), now, now),
+            )
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT data, status, updated_at FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        data, status, updated_at = row
+        if status in FINISHED_STATUSES and time.time() - updated_at > self.ttl:
+            return None
+        return json.loads(data)
+
+    def update(self, task_id: str, **fields) -> Optional[dict]:
+        with self._connect() as conn:
+            try:
+                # 다른 worker의 갱신과 섞이지 않도록 읽기-수정-쓰기를 하나의 쓰기 트랜잭션으로 처리
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                record = json.loads(row[0])
+                record.update(fields)
+                conn.execute(
+                    "UPDATE tasks SET status = ?, data = ?, updated_at = ? WHERE task_id = ?",
+                    (record.get("status") or "", json.dumps(record, ensure_ascii=False), time.time(), task_id),
+                )
+                conn.execute("COMMIT")
+                return record
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def list(self, status: Optional[str] = None, older_than: Optional[float] = None, limit: int = 100) -> List[dict]:
+        query, params = "SELECT task_id, data FROM tasks WHERE 1=1", []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if older_than is not None:
+            query += " AND updated_at <= ?"
+            params.append(time.time() - older_than)
+        query += " ORDER BY updated_at LIMIT ?"
+        params.append(limit)
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [{"task_id": task_id, **json.loads(data)} for task_id, data in rows]
+
+    def purge_expired(self) -> List[str]:
+        placeholders = ",".join("?" for _ in FINISHED_STATUSES)
+        condition = f"status IN ({placeholders}) AND updated_at < ?"
+        params = (*FINISHED_STATUSES, time.time() - self.ttl)
+        with self._connect() as conn:
+            try:
+                # 삭제할 task_id 조회와 삭제 사이에 다른 worker가 끼어들지 않도록 하나의 쓰기 트랜잭션으로 처리
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(f"SELECT task_id FROM tasks WHERE {condition}", params).fetchall()
+                conn.execute(f"DELETE FROM tasks WHERE {condition}", params)
+                conn.execute("COMMIT")
+                return [task_id for (task_id,) in rows]
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+
+_store: Optional[TaskStore] = None
+_store_lock = threading.Lock()
+
+
+def get_task_store() -> TaskStore:
+    """TASK_STORE 설정에 맞는 저장소 (프로세스당 1개)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if TASK_STORE == "sqlite":
+                _store = SQLiteTaskStore()
+            elif TASK_STORE == "memory":
+                _store = MemoryTaskStore()
+            else:
+                raise ValueError(f"지원하지 않는 TASK_STORE: {TASK_STORE} (memory | sqlite)")
+    return _store
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from video.backend_scheduler import BackendScheduler, SegmentCancelled
+
+
+def _items(*indexes):
+    return [{"segment": i} for i in indexes]
+
+
+class Recorder:
+    """render_fn 대용: 호출 기록 + 지정한 (세그먼트, 서버, 시도 순번) 조합에서 실패"""
+
+    def __init__(self, fail=(), delay=0.01, slow=None):
+        self.calls = []
+        self.fail = set(fail)
+        self.delay = delay
+        self.slow = slow or {}
+        self._lock = threading.Lock()
+
+    def __call__(self, item, url):
+        index = item["segment"]
+        with self._lock:
+            self.calls.append((index, url))
+            attempt = sum(1 for i, _ in self.calls if i == index)
+        time.sleep(self.slow.get(index, self.delay))
+        if (index, url, attempt) in self.fail or (index, url) in self.fail:
+            raise RuntimeError(f"render failed: {index}@{url}")
+        return {"local_files": [f"{index}.mp4"], "url": url}
+
+
+def test_all_segments_complete_and_on_result_is_called():
+    render = Recorder()
+    seen = []
+    scheduler = BackendScheduler(["a", "b"], render_fn=render, on_result=lambda item, res: seen.append(item["segment"]))
+    results = scheduler.run(_items(1, 2, 3, 4))
+
+    assert sorted(results) == [1, 2, 3, 4]
+    assert all(res["local_files"] == [f"{i}.mp4"] for i, res in results.items())
+    assert sorted(seen) == [1, 2, 3, 4]
+
+
+def test_failed_segment_is_retried_on_another_backend():
+    render = Recorder(fail={(1, "a", 1)})
+    scheduler = BackendScheduler(["a", "b"], render_fn=render, failure_threshold=10)
+    results = scheduler.run(_items(1))
+
+    assert results[1]["url"] == "b"
+    assert render.calls == [(1, "a"), (1, "b")]
+
+
+def test_retry_waiting_for_other_backend_does_not_block_queue():
+    # 1번은 a에서 실패 → b를 기다려야 함, b는 느린 2번을 처리 중 → 그동안 3번은 a에서 먼저 실행
+    render = Recorder(fail={(1, "a", 1)}, slow={2: 0.3})
+    scheduler = BackendScheduler(["a", "b"], render_fn=render, failure_threshold=10)
+    results = scheduler.run(_items(1, 2, 3))
+
+    assert sorted(results) == [1, 2, 3]
+    assert render.calls.index((3, "a")) < render.calls.index((1, "b"))
+
+
+def test_backend_in_cooldown_is_skipped():
+    render = Recorder(fail={(1, "a")})
+    scheduler = BackendScheduler(["a", "b"], render_fn=render, failure_threshold=1, cooldown=60)
+    results = scheduler.run(_items(1, 2, 3))
+
+    assert not any(isinstance(res, Exception) for res in results.values())
+    assert [url for _, url in render.calls].count("a") == 1
+    assert {b["url"]: b["healthy"] for b in scheduler.stats()} == {"a": False, "b": True}
+
+
+def test_segment_fails_after_max_attempts():
+    render = Recorder(fail={(1, "a"), (1, "b")})
+    scheduler = BackendScheduler(["a", "b"], render_fn=render, max_attempts=2, failure_threshold=10)
+    results = scheduler.run(_items(1, 2))
+
+    assert isinstance(results[1], RuntimeError)
+    assert results[2]["local_files"] == ["2.mp4"]
+    assert len([c for c in render.calls if c[0] == 1]) == 2
+
+
+def test_fail_fast_cancels_remaining_segments_and_stops_reading_source():
+    consumed = []
+
+    def source():
+        for i in range(1, 50):
+            consumed.append(i)
+            time.sleep(0.01)
+            yield {"segment": i}
+
+    render = Recorder(fail={(1, "a")})
+    scheduler = BackendScheduler(["a"], render_fn=render, max_attempts=1, fail_fast=True)
+    results = scheduler.run(source())
+
+    assert isinstance(results[1], RuntimeError)
+    assert all(isinstance(res, SegmentCancelled) for i, res in results.items() if i != 1)
+    time.sleep(0.1)
+    assert len(consumed) < 10
+
+
+def test_source_error_is_raised():
+    def source():
+        yield {"segment": 1}
+        raise ValueError("prompt generation failed")
+
+    scheduler = BackendScheduler(["a"], render_fn=Recorder())
+    with pytest.raises(ValueError, match="prompt generation failed"):
+        scheduler.run(source())
+
+
+def test_run_timeout_cancels_unfinished_segments():
+    render = Recorder(slow={1: 0.5})
+    scheduler = BackendScheduler(["a"], render_fn=render, timeout=0.1)
+    results = scheduler.run(_items(1, 2))
+
+    assert isinstance(results[1], SegmentCancelled)
+    assert isinstance(results[2], SegmentCancelled)
+
+
+def test_requires_backend_and_render_function():
+    with pytest.raises(RuntimeError):
+        BackendScheduler([None, ""], render_fn=Recorder())
+    with pytest.raises(ValueError):
+        BackendScheduler(["a"])
@@ -0,0 +1,86 @@
+from pipeline.manifest import JobManifest, inputs_hash
+
+INPUT = {"topic": "봄", "style": "kpop"}
+
+
+def _run_stage(manifest: JobManifest, name: str, inp: dict, deps=(), output=None):
+    """PipelineRunner와 같은 방식으로 단계를 실행(또는 건너뜀)하고 실제로 실행했는지 반환"""
+    input_hash = inputs_hash(name, inp, [manifest.token(dep) for dep in deps])
+    if manifest.completed_output(name, input_hash) is not None:
+        return False
+    manifest.start_stage(name, input_hash)
+    manifest.complete_stage(name, input_hash, output or {"path": f"{name}.out"})
+    return True
+
+
+def test_inputs_hash_depends_on_stage_input_and_deps():
+    base = inputs_hash("song", {}, ["a"])
+    assert base == inputs_hash("song", {}, ["a"])
+    assert base != inputs_hash("song", {}, ["b"])
+    assert base != inputs_hash("srt", {}, ["a"])
+    assert inputs_hash("lyrics", INPUT, []) != inputs_hash("lyrics", {**INPUT, "style": "ballad"}, [])
+
+
+def test_resume_skips_completed_stages_with_same_inputs(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = JobManifest(path)
+    assert _run_stage(manifest, "lyrics", INPUT)
+    assert _run_stage(manifest, "song", {}, deps=["lyrics"])
+
+    # 같은 작업을 다시 실행 (파일에서 다시 읽음)
+    resumed = JobManifest(path)
+    assert not _run_stage(resumed, "lyrics", INPUT)
+    assert not _run_stage(resumed, "song", {}, deps=["lyrics"])
+    assert resumed.token("song") == manifest.token("song")
+
+
+def test_upstream_rerun_invalidates_downstream(tmp_path):
+    manifest = JobManifest(str(tmp_path / "manifest.json"))
+    _run_stage(manifest, "lyrics", INPUT)
+    _run_stage(manifest, "song", {}, deps=["lyrics"])
+    _run_stage(manifest, "srt", {}, deps=["lyrics", "song"])
+    song_token = manifest.token("song")
+
+    # 가사 입력이 바뀌면 lyrics가 새 token을 받고, 그 뒤 단계도 모두 다시 실행
+    assert _run_stage(manifest, "lyrics", {**INPUT, "topic": "여름"})
+    assert _run_stage(manifest, "song", {}, deps=["lyrics"])
+    assert _run_stage(manifest, "srt", {}, deps=["lyrics", "song"])
+    assert manifest.token("song") != song_token
+
+
+def test_failed_stage_is_not_reused(tmp_path):
+    manifest = JobManifest(str(tmp_path / "manifest.json"))
+    input_hash = inputs_hash("lyrics", INPUT, [])
+    manifest.start_stage("lyrics", input_hash)
+    manifest.fail_stage("lyrics", "LLM 오류")
+    assert manifest.completed_output("lyrics", input_hash) is None
+    assert manifest.stage("lyrics")["error"] == "LLM 오류"
+
+
+def test_segments_survive_resume_but_not_input_change(tmp_path):
+    clip = tmp_path / "segment_1.mp4"
+    clip.write_bytes(b"x")
+    path = str(tmp_path / "manifest.json")
+    manifest = JobManifest(path)
+    video_hash = inputs_hash("video", {}, ["prompt-token"])
+    manifest.start_stage("video", video_hash)
+    manifest.record_segment("video", 1, [str(clip)])
+    manifest.record_segment("video", 2, [str(tmp_path / "missing.mp4")])
+
+    resumed = JobManifest(path)
+    # 파일이 사라진 세그먼트는 완료로 보지 않음
+    assert resumed.completed_segments("video") == {1: [str(clip)]}
+
+    resumed.start_stage("video", video_hash)
+    assert resumed.completed_segments("video") == {1: [str(clip)]}
+
+    resumed.start_stage("video", inputs_hash("video", {}, ["new-token"]))
+    assert resumed.completed_segments("video") == {}
+
+
+def test_corrupt_manifest_starts_fresh(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text("{not json", encoding="utf-8")
+    manifest = JobManifest(str(path))
+    assert manifest.input is None
+    assert manifest.stage("lyrics") is None
@@ -0,0 +1,88 @@
+import struct
+
+import pytest
+
+from common.media_info import MediaInfoError, mp3_duration, mp4_duration
+
+# MPEG1 Layer III, 128kbps, 44.1kHz, stereo (프레임 417바이트, 1152 샘플)
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+FRAME_SIZE = 417
+SAMPLES_PER_FRAME = 1152
+
+
+def _frame(payload: bytes = b"") -> bytes:
+    body = payload + b"\x00" * (FRAME_SIZE - 4 - len(payload))
+    return FRAME_HEADER + body
+
+
+def _id3v2(size: int) -> bytes:
+    # synchsafe 크기 (7비트씩)
+    synchsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + synchsafe + b"\x00" * size
+
+
+def _write(tmp_path, name: str, data: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_cbr_mp3_duration_from_file_size(tmp_path):
+    frames = 100
+    path = _write(tmp_path, "cbr.mp3", _frame() * frames)
+    assert mp3_duration(path) == pytest.approx(frames * FRAME_SIZE * 8 / 128000)
+
+
+def test_cbr_mp3_ignores_id3v2_and_id3v1_tags(tmp_path):
+    frames = 100
+    data = _id3v2(2000) + _frame() * frames + b"TAG" + b"\x00" * 125
+    path = _write(tmp_path, "tagged.mp3", data)
+    assert mp3_duration(path) == pytest.approx(frames * FRAME_SIZE * 8 / 128000)
+
+
+def test_xing_vbr_mp3_uses_frame_count(tmp_path):
+    frames = 5000
+    # stereo MPEG1: side info 32바이트 뒤에 Xing 헤더 (flags: 프레임 수 있음)
+    xing = b"\x00" * 32 + b"Xing" + struct.pack(">II", 0x01, frames)
+    path = _write(tmp_path, "vbr.mp3", _frame(xing) + _frame() * 10)
+    assert mp3_duration(path) == pytest.approx(frames * SAMPLES_PER_FRAME / 44100)
+
+
+def test_xing_after_id3v2_tag(tmp_path):
+    frames = 3000
+    xing = b"\x00" * 32 + b"Info" + struct.pack(">II", 0x01, frames)
+    path = _write(tmp_path, "vbr_tagged.mp3", _id3v2(500) + _frame(xing) + _frame() * 10)
+    assert mp3_duration(path) == pytest.approx(frames * SAMPLES_PER_FRAME / 44100)
+
+
+def test_mp3_without_frames_raises(tmp_path):
+    path = _write(tmp_path, "broken.mp3", b"\x00" * 4096)
+    with pytest.raises(MediaInfoError):
+        mp3_duration(path)
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def _mvhd(version: int, timescale: int, duration: int) -> bytes:
+    if version == 1:
+        body = struct.pack(">B3xQQIQ", 1, 0, 0, timescale, duration)
+    else:
+        body = struct.pack(">B3xIIII", 0, 0, 0, timescale, duration)
+    return _box(b"mvhd", body + b"\x00" * 80)
+
+
+@pytest.mark.parametrize("version", [0, 1])
+def test_mp4_duration_from_mvhd(tmp_path, version):
+    data = _box(b"ftyp", b"isom\x00\x00\x02\x00") + _box(b"mdat", b"\x00" * 1000) + _box(
+        b"moov", _mvhd(version, 1000, 12345)
+    )
+    path = _write(tmp_path, "clip.mp4", data)
+    assert mp4_duration(path) == pytest.approx(12.345)
+
+
+def test_mp4_without_moov_raises(tmp_path):
+    path = _write(tmp_path, "empty.mp4", _box(b"ftyp", b"isom\x00\x00\x02\x00") + _box(b"mdat", b"\x00" * 100))
+    with pytest.raises(MediaInfoError):
+        mp4_duration(path)
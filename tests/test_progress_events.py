@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+
+from progress.progress_events import ProgressBus, current_run, format_sse, is_terminal
+
+
+def _status(event_id, status):
+    return {"id": event_id, "event": "status", "status": status}
+
+
+def _stage(event_id):
+    return {"id": event_id, "event": "stage", "stage": "lyrics"}
+
+
+# 1차 실행 실패 → 재시도(2차 실행) 성공
+HISTORY = [
+    _status(1, "queued"), _stage(2), _status(3, "failed"),
+    _status(4, "queued"), _stage(5), _status(6, "completed"),
+]
+
+
+def _ids(events):
+    return [event["id"] for event in events]
+
+
+def test_is_terminal():
+    assert is_terminal(_status(1, "completed"))
+    assert is_terminal(_status(1, "failed"))
+    assert not is_terminal(_status(1, "processing"))
+    assert not is_terminal({"id": 1, "event": "merge", "status": "failed"})
+
+
+def test_current_run_of_finished_retried_task_keeps_its_final_event():
+    assert _ids(current_run(HISTORY, finished=True)) == [4, 5, 6]
+
+
+def test_current_run_of_running_retried_task():
+    assert _ids(current_run(HISTORY[:5], finished=False)) == [4, 5]
+
+
+def test_current_run_right_after_retry_before_new_events():
+    # 상태는 이미 queued로 바뀌었지만 재시도 이벤트가 아직 발행되지 않음 → 이전 실행은 보내지 않음
+    assert current_run(HISTORY[:3], finished=False) == []
+
+
+def test_current_run_without_retry():
+    assert _ids(current_run(HISTORY[:3], finished=True)) == [1, 2, 3]
+    assert _ids(current_run(HISTORY[:2], finished=False)) == [1, 2]
+    assert current_run([], finished=True) == []
+
+
+def test_current_run_after_last_event_id():
+    # 재연결(Last-Event-ID=4)로 현재 실행의 일부만 남은 경우
+    assert _ids(current_run(HISTORY[4:], finished=True)) == [5, 6]
+
+
+def test_subscribe_replays_history_and_receives_events_from_other_threads():
+    bus = ProgressBus(history=10)
+    bus.publish("t1", "status", {"status": "queued"})
+    bus.publish("t1", "stage", {"stage": "lyrics"})
+
+    async def main():
+        past, queue = bus.subscribe("t1", after=1)
+        thread = threading.Thread(target=bus.publish, args=("t1", "status", {"status": "completed"}))
+        thread.start()
+        event = await asyncio.wait_for(queue.get(), timeout=1)
+        thread.join()
+        bus.unsubscribe("t1", queue)
+        return past, event
+
+    past, event = asyncio.run(main())
+    assert _ids(past) == [2]
+    assert event["id"] == 3 and is_terminal(event)
+
+
+def test_history_is_bounded_per_task_and_by_task_count():
+    bus = ProgressBus(history=2, max_tasks=2)
+    for i in range(5):
+        bus.publish("a", "stage", {"n": i})
+    assert [event["n"] for event in bus.history("a")] == [3, 4]
+
+    bus.publish("b", "stage", {})
+    bus.publish("c", "stage", {})
+    assert bus.history("a") == []
+    # 삭제된 작업은 id가 1부터 다시 시작
+    assert bus.publish("a", "stage", {})["id"] == 1
+
+
+def test_format_sse():
+    message = format_sse({"id": 7, "event": "stage", "stage": "가사"})
+    lines = message.split("\n")
+    assert lines[:2] == ["id: 7", "event: stage"]
+    assert json.loads(lines[2][len("data: "):])["stage"] == "가사"
+    assert message.endswith("\n\n")
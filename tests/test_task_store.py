@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from task_store.task_store import MemoryTaskStore, SQLiteTaskStore, TaskStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def _make(ttl=3600, **kwargs):
+        if request.param == "memory":
+            return MemoryTaskStore(ttl=ttl, **kwargs)
+        return SQLiteTaskStore(path=str(tmp_path / "tasks.db"), ttl=ttl)
+    return _make
+
+
+def test_create_get_update(make_store):
+    store = make_store()
+    store.create("t1", {"status": "queued", "result": None})
+
+    assert store.get("t1") == {"status": "queued", "result": None}
+    assert "t1" in store
+    assert store.update("t1", status="completed", result="url")["result"] == "url"
+    assert store.get("t1")["status"] == "completed"
+    assert store.update("missing", status="failed") is None
+    assert store.get("missing") is None
+
+
+def test_list_filters_by_status(make_store):
+    store = make_store()
+    store.create("a", {"status": "queued"})
+    store.create("b", {"status": "completed"})
+
+    assert [row["task_id"] for row in store.list(status="completed")] == ["b"]
+    assert {row["task_id"] for row in store.list()} == {"a", "b"}
+
+
+def test_purge_expired_removes_only_finished_tasks(make_store):
+    store = make_store(ttl=0.05)
+    store.create("done", {"status": "completed"})
+    store.create("failed", {"status": "failed"})
+    store.create("running", {"status": "processing"})
+    time.sleep(0.1)
+
+    assert sorted(store.purge_expired()) == ["done", "failed"]
+    assert store.purge_expired() == []
+    assert store.get("running") == {"status": "processing"}
+    assert store.get("done") is None
+
+
+def test_get_hides_expired_task(make_store):
+    store = make_store(ttl=0.05)
+    store.create("done", {"status": "completed"})
+    time.sleep(0.1)
+    assert store.get("done") is None
+
+
+def test_memory_store_reports_tasks_dropped_by_get():
+    store = MemoryTaskStore(ttl=0.05)
+    store.create("done", {"status": "completed"})
+    time.sleep(0.1)
+    assert store.get("done") is None
+    # 조회 중에 삭제된 작업도 purge_expired가 반환 (작업 폴더 정리용)
+    assert store.purge_expired() == ["done"]
+
+
+def test_memory_store_evicts_only_finished_tasks_over_capacity():
+    store = MemoryTaskStore(max_entries=2)
+    store.create("old-done", {"status": "completed"})
+    store.create("running", {"status": "processing"})
+    store.create("queued", {"status": "queued"})
+
+    assert store.get("old-done") is None
+    assert store.get("running") is not None
+    assert store.purge_expired() == ["old-done"]
+
+
+def test_memory_store_exceeds_capacity_rather_than_dropping_active_tasks(capsys):
+    store = MemoryTaskStore(max_entries=1)
+    store.create("a", {"status": "queued"})
+    store.create("b", {"status": "processing"})
+
+    assert store.get("a") is not None and store.get("b") is not None
+    assert "최대 개수" in capsys.readouterr().out
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    SQLiteTaskStore(path=path).create("t1", {"status": "queued"})
+    assert SQLiteTaskStore(path=path).get("t1") == {"status": "queued"}
+
+
+def test_incomplete_store_cannot_be_instantiated():
+    class PartialStore(TaskStore):
+        def get(self, task_id):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
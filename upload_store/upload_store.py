@@ -0,0 +1,192 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import magic
+
+from workspace.job_workspace import JOBS_DIR, JobWorkspace
+
+# 업로드 파일 최대 크기
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "20")) * 1024 * 1024
+# 한 번에 읽고 쓰는 크기
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# 파일 형식을 판단할 때 사용하는 앞부분 크기
+UPLOAD_SNIFF_BYTES = 8192
+# 허용하는 형식 (가사 주제로 읽을 수 있는 PDF / 텍스트)
+ALLOWED_MIME_PREFIXES = ("application/pdf", "text/")
+
+# 업로드 파일 보관 기간 (초) / 전체 업로드 용량 한도 (넘으면 오래된 파일부터 삭제)
+UPLOAD_TTL_SECONDS = int(os.getenv("UPLOAD_TTL_SECONDS", str(7 * 24 * 3600)))
+UPLOAD_QUOTA_BYTES = int(os.getenv("UPLOAD_QUOTA_MB", "1024")) * 1024 * 1024
+
+# 작업 폴더 안의 업로드 폴더 이름 (files/jobs/{task_id}/uploads)
+UPLOAD_DIRNAME = "uploads"
+
+# 업로드 경로 → 스트리밍 중에 확인한 MIME 형식 (lyric 단계에서 파일을 다시 열지 않도록)
+_mime_registry: Dict[str, str] = {}
+_registry_lock = threading.Lock()
+
+
+class UploadTooLarge(Exception):
+    """업로드 파일이 UPLOAD_MAX_BYTES를 넘음"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"업로드 파일은 최대 {max_bytes // (1024 * 1024)}MB까지 가능합니다.")
+        self.max_bytes = max_bytes
+
+
+class UnsupportedUploadType(Exception):
+    """PDF / 텍스트가 아닌 업로드 파일"""
+
+    def __init__(self, mime_type: str):
+        super().__init__(f"지원하지 않는 파일 형식입니다: {mime_type} (PDF 또는 텍스트 파일만 가능)")
+        self.mime_type = mime_type
+
+
+def record_mime(path: str, mime_type: str):
+    with _registry_lock:
+        _mime_registry[os.path.abspath(path)] = mime_type
+
+
+def sniffed_mime(path: str) -> Optional[str]:
+    """업로드할 때 확인한 MIME 형식. 이 프로세스에서 받은 업로드가 아니면 None"""
+    with _registry_lock:
+        return _mime_registry.get(os.path.abspath(path))
+
+
+def _forget(path: str):
+    with _registry_lock:
+        _mime_registry.pop(os.path.abspath(path), None)
+
+
+def _safe_filename(filename: Optional[str]) -> str:
+    """경로 구분자 / 특수문자를 제거한 파일 이름 (확장자 유지)"""
+    name = os.path.basename((filename or "").replace("\\", "/"))
+    name = re.sub(r"[^\w.\-]", "_", name).lstrip(".")
+    return name[:120] or "upload"
+
+
+def _check_mime(head: bytes) -> str:
+    mime_type = magic.from_buffer(head, mime=True)
+    if not mime_type.startswith(ALLOWED_MIME_PREFIXES):
+        raise UnsupportedUploadType(mime_type)
+    return mime_type
+
+
+def upload_dir(workspace: JobWorkspace) -> str:
+    return os.path.join(workspace.root, UPLOAD_DIRNAME)
+
+
+def forget_uploads(workspace: JobWorkspace):
+    """작업 폴더를 삭제할 때 그 작업의 업로드 MIME 기록도 삭제합니다."""
+    prefix = os.path.abspath(upload_dir(workspace)) + os.sep
+    with _registry_lock:
+        for path in [p for p in _mime_registry if p.startswith(prefix)]:
+            del _mime_registry[path]
+
+
+async def save_upload(upload, workspace: JobWorkspace, max_bytes: int = UPLOAD_MAX_BYTES) -> Tuple[str, str, int]:
+    """
+    UploadFile을 작업 폴더(files/jobs/{task_id}/uploads)에 조각 단위로 저장합니다.
+    디스크 쓰기는 스레드에서 처리해 이벤트 루프를 막지 않고,
+    받는 도중에 크기 한도(UploadTooLarge)와 파일 형식(UnsupportedUploadType)을 확인합니다.
+    반환값: (저장 경로, MIME 형식, 크기)
+    """
+    dest_dir = upload_dir(workspace)
+    await asyncio.to_thread(os.makedirs, dest_dir, exist_ok=True)
+    path = os.path.join(dest_dir, _safe_filename(upload.filename))
+    tmp_path = f"{path}.part"
+
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    size, head, mime_type = 0, b"", None
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            if mime_type is None:
+                head += chunk
+                if len(head) >= UPLOAD_SNIFF_BYTES:
+                    mime_type = _check_mime(head[:UPLOAD_SNIFF_BYTES])
+                    head = b""
+            await asyncio.to_thread(f.write, chunk)
+
+        if mime_type is None:
+            # 앞부분 크기보다 작은 파일
+            mime_type = _check_mime(head)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(_remove, tmp_path)
+        raise
+
+    await asyncio.to_thread(f.close)
+    await asyncio.to_thread(os.replace, tmp_path, path)
+    record_mime(path, mime_type)
+    print(f"📥 업로드 저장 완료: {path} ({mime_type}, {size / 1024:.1f}KB)")
+    return os.path.abspath(path), mime_type, size
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def is_upload_path(path: str) -> bool:
+    """작업 폴더의 업로드 파일 경로인지 (주제 텍스트와 구분)"""
+    path = os.path.abspath(path)
+    return path.startswith(os.path.abspath(JOBS_DIR) + os.sep) and os.path.basename(os.path.dirname(path)) == UPLOAD_DIRNAME
+
+
+def purge_uploads(
+    is_active: Callable[[str], bool],
+    ttl: float = UPLOAD_TTL_SECONDS,
+    quota_bytes: int = UPLOAD_QUOTA_BYTES,
+) -> Tuple[int, int]:
+    """
+    보관 기간이 지난 업로드를 삭제하고, 전체 용량이 한도를 넘으면 오래된 것부터 삭제합니다.
+    대기 중이거나 실행 중인 작업(is_active(task_id))의 업로드는 삭제하지 않습니다.
+    반환값: (삭제한 파일 수, 확보한 바이트)
+    """
+    if not os.path.isdir(JOBS_DIR):
+        return 0, 0
+
+    files = []
+    for task_id in os.listdir(JOBS_DIR):
+        dir_path = os.path.join(JOBS_DIR, task_id, UPLOAD_DIRNAME)
+        if not os.path.isdir(dir_path):
+            continue
+        for name in os.listdir(dir_path):
+            path = os.path.join(dir_path, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path, task_id))
+
+    # 오래된 파일부터 확인
+    files.sort()
+    total = sum(size for _, size, _, _ in files)
+    now = time.time()
+    removed, freed = 0, 0
+
+    for mtime, size, path, task_id in files:
+        expired = now - mtime > ttl
+        # 아직 받는 중인 업로드(.part)는 용량 한도 때문에 지우지 않음
+        over_quota = total - freed > quota_bytes and not path.endswith(".part")
+        if (expired or over_quota) and not is_active(task_id):
+            _remove(path)
+            _forget(path)
+            removed += 1
+            freed += size
+
+    if removed:
+        print(f"🧹 업로드 파일 {removed}개 삭제 ({freed / (1024 * 1024):.1f}MB 확보)")
+    return removed, freed
@@ -0,0 +1,371 @@
+import asyncio
+import json
+import os
+import ssl
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+import httpx
+import websockets
+
+from common.download import adownload_file
+from common.file_hash import file_digest
+from progress.progress_events import emit
+from video.generate_video import build_workflow
+from video.upload_cache import content_filename, upload_cache
+from workspace.job_workspace import JobWorkspace, get_workspace
+
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+# 서버 1대당 유지할 HTTP keep-alive 연결 수
+MAX_CONNECTIONS = 20
+# WebSocket 재연결 대기 시간 (초)
+WS_RECONNECT_DELAY = 2
+# 이 시간 동안 WebSocket 메시지가 없으면 history로 완료 여부를 직접 확인 (초)
+WS_IDLE_CHECK = 30
+# 세그먼트 1개 최대 대기 시간 (초)
+RENDER_TIMEOUT = 600
+
+IMAGE_NODE_ID = "12"
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_clients: Dict[str, "AsyncComfyClient"] = {}
+
+
+def get_comfy_loop() -> asyncio.AbstractEventLoop:
+    """
+    ComfyUI 통신 전용 이벤트 루프 (백그라운드 스레드 1개).
+    서버별 HTTP 연결 풀과 WebSocket 연결이 작업 간에 계속 유지되도록 프로세스에 하나만 둡니다.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="comfy-client-loop", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+class AsyncComfyClient:
+    """
+    asyncio 기반 ComfyUI 클라이언트.
+    - HTTP: httpx.AsyncClient 연결 풀 (keep-alive)로 TLS 핸드셰이크를 재사용
+    - WebSocket: 서버당 1개를 계속 유지하고, 메시지를 prompt_id 별로 나눠서 전달
+    """
+
+    def __init__(self, base_url: str, auth_token: str = None, comfy_api_key: str = None):
+        self.base_url = base_url.rstrip('/')
+        self.client_id = str(uuid.uuid4())
+        self.comfy_api_key = comfy_api_key
+
+        headers = {}
+        if auth_token:
+            headers['Authorization'] = f"Bearer {auth_token}"
+
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+        )
+
+        self._ws = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        self._waiters: Dict[str, asyncio.Queue] = {}
+
+    # --- WebSocket ---
+    def get_ws_url(self) -> str:
+        if self.base_url.startswith("https"):
+            ws_base = self.base_url.replace("https://", "wss://")
+        else:
+            ws_base = self.base_url.replace("http://", "ws://")
+        return f"{ws_base}/ws?clientId={self.client_id}"
+
+    async def _connect(self):
+        ws_url = self.get_ws_url()
+        ssl_context = None
+        if ws_url.startswith("wss"):
+            ssl_context = ssl.create_default_context()
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+
+        ws = await websockets.connect(ws_url, ssl=ssl_context, max_size=None, ping_interval=20, open_timeout=30)
+        print(f"[*] WebSocket Connected: {ws_url}")
+        return ws
+
+    async def _ensure_ws(self):
+        """WebSocket이 없거나 끊겼으면 연결하고 메시지 수신 task를 시작합니다."""
+        async with self._connect_lock:
+            if self._reader_task is None or self._reader_task.done():
+                self._ws = await self._connect()
+                self._reader_task = asyncio.create_task(self._reader())
+
+    def _dispatch(self, raw):
+        # 바이너리 메시지는 미리보기 이미지이므로 무시
+        if isinstance(raw, bytes):
+            return
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        data = message.get('data') or {}
+        waiter = self._waiters.get(data.get('prompt_id'))
+        if waiter is not None:
+            waiter.put_nowait(message)
+
+    def _broadcast(self, message: dict):
+        for waiter in self._waiters.values():
+            waiter.put_nowait(message)
+
+    async def _reader(self):
+        """하나의 WebSocket에서 받은 메시지를 prompt_id 별 대기열로 전달 (끊기면 재연결)"""
+        while True:
+            try:
+                async for raw in self._ws:
+                    self._dispatch(raw)
+            except Exception as e:
+                print(f"[!] WebSocket 연결 끊김 ({self.base_url}): {e}")
+
+            # 서버가 재시작되었을 수 있으므로 업로드 기록을 버림
+            upload_cache.invalidate(self.base_url)
+
+            # 끊긴 동안 놓친 메시지가 있을 수 있으므로 대기 중인 작업에 알림 (history로 직접 확인)
+            self._broadcast({"type": "disconnected", "data": {}})
+            if not self._waiters:
+                self._ws = None
+                return
+
+            await asyncio.sleep(WS_RECONNECT_DELAY)
+            try:
+                self._ws = await self._connect()
+            except Exception as e:
+                print(f"[!] WebSocket 재연결 실패 ({self.base_url}): {e}")
+
+    # --- HTTP ---
+    async def upload_image(self, image_path: str, overwrite: bool = False, filename: str = None) -> dict:
+        try:
+            with open(image_path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            raise Exception(f"로컬에서 파일을 찾을 수 없습니다: {image_path}")
+
+        files = {'image': (filename or os.path.basename(image_path), content, 'image/png')}
+        data = {'overwrite': str(overwrite).lower()}
+        response = await self.http.post("/upload/image", files=files, data=data)
+
+        if response.status_code == 200:
+            return response.json()
+        raise Exception(f"Image upload failed: {response.text}")
+
+    async def _server_has_input(self, filename: str) -> bool:
+        try:
+            response = await self.http.head("/view", params={"filename": filename, "type": "input"})
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    async def ensure_image(self, image_path: str) -> str:
+        """
+        참조 이미지를 서버에 한 번만 올리고 서버 파일명을 반환합니다.
+        내용 해시로 파일명을 정하므로, 이미 서버에 있으면 업로드를 건너뜁니다.
+        """
+        if not os.path.exists(image_path):
+            raise Exception(f"로컬에서 파일을 찾을 수 없습니다: {image_path}")
+
+        digest = file_digest(image_path)
+        server_name = upload_cache.get(self.base_url, digest)
+        if server_name:
+            return server_name
+
+        server_name = content_filename(image_path, digest)
+        if not await self._server_has_input(server_name):
+            print(f"[*] Uploading image: {image_path} → {server_name}")
+            upload_resp = await self.upload_image(image_path, overwrite=True, filename=server_name)
+            server_name = upload_resp['name']
+
+        upload_cache.put(self.base_url, digest, server_name)
+        return server_name
+
+    async def queue_prompt(self, workflow: dict, prompt_id: str) -> dict:
+        extra_data = {
+            "extra_pnginfo": {"workflow": workflow}
+        }
+
+        headers = {}
+        if self.comfy_api_key:
+            extra_data["api_key"] = self.comfy_api_key
+            extra_data["api_key_comfy_org"] = self.comfy_api_key
+            extra_data["cd_token"] = self.comfy_api_key
+            headers['Authorization'] = f"Bearer {self.comfy_api_key}"
+
+        payload = {
+            "prompt": workflow,
+            "prompt_id": prompt_id,
+            "client_id": self.client_id,
+            "extra_data": extra_data
+        }
+
+        response = await self.http.post("/prompt", json=payload, headers=headers)
+        if response.status_code == 200:
+            return response.json()
+        raise Exception(f"Queue prompt failed: {response.text}")
+
+    async def get_history(self, prompt_id: str) -> dict:
+        response = await self.http.get(f"/history/{prompt_id}")
+        return response.json()
+
+    async def _check_history(self, prompt_id: str) -> bool:
+        """history에 결과가 있으면 완료로 판단 (에러로 끝났으면 예외)"""
+        entry = (await self.get_history(prompt_id)).get(prompt_id)
+        if not entry:
+            return False
+        if entry.get('status', {}).get('status_str') == 'error':
+            raise Exception(f"ComfyUI execution error (prompt {prompt_id})")
+        return True
+
+    async def _wait_for_completion(
+        self,
+        prompt_id: str,
+        queue: asyncio.Queue,
+        timeout: float,
+        on_progress: Optional[Callable[[dict], None]] = None,
+    ):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise TimeoutError(f"영상 생성 대기 시간 초과 ({timeout}초, prompt {prompt_id})")
+
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=min(WS_IDLE_CHECK, remaining))
+            except asyncio.TimeoutError:
+                message = {"type": "idle", "data": {}}
+
+            msg_type = message['type']
+            data = message.get('data') or {}
+
+            if msg_type == 'executing':
+                if data.get('node') is None:
+                    print("[*] Execution Finished!")
+                    return
+                print(f"[-] Node Executing: {data['node']} ({prompt_id[:8]})")
+                if on_progress is not None:
+                    on_progress({"node": data['node']})
+            elif msg_type == 'progress':
+                # 샘플러 등 단계가 있는 노드의 진행률 (value / max)
+                if on_progress is not None:
+                    on_progress({"node": data.get('node'), "value": data.get('value'), "max": data.get('max')})
+            elif msg_type == 'execution_success':
+                print("[*] Execution Finished!")
+                return
+            elif msg_type == 'execution_error':
+                print(f"[!] Execution Error: {data}")
+                # 업로드한 이미지가 사라졌을 수도 있으므로 다음 시도에서는 다시 확인
+                upload_cache.invalidate(self.base_url)
+                raise Exception(f"ComfyUI execution error: {data.get('exception_message', data)}")
+            elif msg_type in ('disconnected', 'idle'):
+                if await self._check_history(prompt_id):
+                    print("[*] Execution Finished! (history 확인)")
+                    return
+
+    async def _download(self, item: dict, save_dir: str) -> str:
+        params = {"filename": item['filename'], "subfolder": item['subfolder'], "type": item['type']}
+        local_path = os.path.join(save_dir, item['filename'])
+        # 파일 전체를 메모리에 올리지 않고 스트리밍 저장 (임시 파일 → rename)
+        return await adownload_file(self.http, "/view", local_path, params=params)
+
+    async def execute_workflow(
+        self,
+        workflow: dict,
+        save_dir: str,
+        timeout: float = RENDER_TIMEOUT,
+        on_progress: Optional[Callable[[dict], None]] = None,
+    ) -> dict:
+        """
+        workflow를 실행하고 결과 파일을 save_dir에 저장합니다. 실패 시 예외를 발생시킵니다.
+        on_progress({"node", "value", "max"})는 노드 실행/진행 메시지를 받을 때마다 호출됩니다.
+        """
+        local_image_path = workflow[IMAGE_NODE_ID]["inputs"]["images"]
+
+        workflow[IMAGE_NODE_ID]["inputs"]["image"] = await self.ensure_image(local_image_path)
+
+        await self._ensure_ws()
+
+        # prompt_id를 미리 정해서 대기열을 먼저 등록 (queue 직후 오는 메시지도 놓치지 않음)
+        prompt_id = str(uuid.uuid4())
+        queue = asyncio.Queue()
+        self._waiters[prompt_id] = queue
+
+        try:
+            resp = await self.queue_prompt(workflow, prompt_id)
+            if resp.get('prompt_id') and resp['prompt_id'] != prompt_id:
+                # prompt_id 지정을 지원하지 않는 서버: 서버가 준 ID로 다시 등록
+                self._waiters.pop(prompt_id, None)
+                prompt_id = resp['prompt_id']
+                self._waiters[prompt_id] = queue
+            print(f"[*] Prompt Queued. ID: {prompt_id} ({self.base_url})")
+
+            await self._wait_for_completion(prompt_id, queue, timeout, on_progress)
+        finally:
+            self._waiters.pop(prompt_id, None)
+
+        history = await self.get_history(prompt_id)
+        outputs = history[prompt_id].get('outputs', {})
+
+        results = []
+        saved_files = []
+        for node_id, output_data in outputs.items():
+            for key in ['videos', 'images', 'gifs']:
+                for item in output_data.get(key, []):
+                    results.append(f"{self.base_url}/view?filename={item['filename']}&subfolder={item['subfolder']}&type={item['type']}")
+                    try:
+                        local_path = await self._download(item, save_dir)
+                        print(f"[*] Saved locally: {local_path}")
+                        saved_files.append(local_path)
+                    except Exception as e:
+                        print(f"[!] Failed to save {item['filename']}: {e}")
+
+        if not saved_files:
+            raise Exception(f"No output files saved for prompt {prompt_id}")
+
+        return {
+            "urls": results,
+            "local_files": saved_files
+        }
+
+
+def _get_client(cloud_url: str) -> AsyncComfyClient:
+    """서버별 클라이언트를 하나만 만들어 재사용 (comfy 루프 안에서 호출)"""
+    key = cloud_url.rstrip('/')
+    client = _clients.get(key)
+    if client is None:
+        client = AsyncComfyClient(key, auth_token=None, comfy_api_key=os.getenv("COMFY_API_KEY"))
+        _clients[key] = client
+    return client
+
+
+async def render_segment_async(item: dict, cloud_url: str, workspace: JobWorkspace) -> dict:
+    """render_segment의 async 버전. workflow를 디스크에 쓰지 않고 바로 전달합니다."""
+    print(f"    Cloud URL: {cloud_url}")
+    workflow = build_workflow(item)
+    client = _get_client(cloud_url)
+
+    def _on_progress(progress: dict):
+        emit("comfyui", task_id=workspace.task_id, segment=item["segment"], server=cloud_url, **progress)
+
+    return await client.execute_workflow(workflow, save_dir=workspace.generated_videos_dir, on_progress=_on_progress)
+
+
+def submit_segment(item: dict, cloud_url: str) -> Future:
+    """
+    세그먼트 렌더링을 comfy 루프에 등록하고 concurrent.futures.Future를 반환합니다.
+    렌더링마다 스레드를 쓰지 않으므로 많은 세그먼트를 동시에 처리할 수 있습니다.
+    """
+    # comfy 루프에는 작업 context가 없으므로 workspace를 직접 전달
+    workspace = get_workspace()
+    return asyncio.run_coroutine_threadsafe(render_segment_async(item, cloud_url, workspace), get_comfy_loop())
@@ -0,0 +1,322 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+# 서버 1대가 동시에 처리할 세그먼트 수
+BACKEND_CAPACITY = 1
+# 세그먼트 1개당 최대 시도 횟수 (실패 시 다른 서버로 재시도)
+MAX_ATTEMPTS = 3
+# 연속 실패가 이 횟수에 도달하면 해당 서버를 잠시 제외
+FAILURE_THRESHOLD = 2
+# 제외된 서버를 다시 사용하기까지 대기 시간 (초)
+COOLDOWN_SECONDS = 60
+# 시작 전 서버 상태 확인 요청 타임아웃 (초)
+HEALTH_CHECK_TIMEOUT = 5
+
+
+class SegmentCancelled(Exception):
+    """다른 세그먼트 실패(fail_fast) 또는 전체 시간 초과로 완료되지 못한 세그먼트"""
+
+
+@dataclass
+class Backend:
+    """ComfyUI 서버 1대의 상태 (동시 실행 수, 연속 실패 수, 제외 만료 시각)"""
+    url: str
+    capacity: int = BACKEND_CAPACITY
+    in_flight: int = 0
+    completed: int = 0
+    failures: int = 0
+    disabled_until: float = 0.0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.disabled_until
+
+    def has_slot(self, now: float) -> bool:
+        return self.in_flight < self.capacity and self.is_healthy(now)
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failures": self.failures,
+            "healthy": self.is_healthy(time.time()),
+        }
+
+
+def check_backend_health(url: str, timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+    """ComfyUI /system_stats 에 응답하는지 확인합니다."""
+    try:
+        response = requests.get(f"{url.rstrip('/')}/system_stats", timeout=timeout)
+        return response.status_code == 200
+    except Exception:
+        return False
+
+
+class BackendScheduler:
+    """
+    세그먼트 대기열을 두고, 작업이 끝나 비어 있는 서버가 다음 세그먼트를 가져가는 스케줄러.
+    고정 배치(4개씩) 대신 서버가 비는 즉시 다음 작업을 배정하므로,
+    느린 서버 1대 때문에 나머지 서버가 놀지 않습니다.
+
+    render_fn(item, cloud_url)은 실패 시 예외를 발생시켜야 합니다.
+    submit_fn(item, cloud_url)을 주면 스레드 풀 대신 그 함수가 반환하는 Future로 완료를 추적합니다. (async 클라이언트용)
+    on_result(item, result)는 세그먼트가 성공할 때마다 바로 호출됩니다. (다음 단계 작업을 미리 시작하는 용도)
+    실패한 세그먼트는 가능한 한 다른 서버로 재시도하고, 연속으로 실패하는 서버는 잠시 제외합니다.
+    """
+
+    def __init__(
+        self,
+        urls: List[Optional[str]],
+        render_fn: Optional[Callable[[dict, str], object]] = None,
+        submit_fn: Optional[Callable[[dict, str], Future]] = None,
+        capacity: int = BACKEND_CAPACITY,
+        max_attempts: int = MAX_ATTEMPTS,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        cooldown: float = COOLDOWN_SECONDS,
+        fail_fast: bool = False,
+        timeout: Optional[float] = None,
+        on_result: Optional[Callable[[dict, object], None]] = None,
+    ):
+        # 설정되지 않은(None, "") 서버는 제외
+        self.backends = [Backend(url=url, capacity=capacity) for url in urls if url]
+        if not self.backends:
+            raise RuntimeError("사용 가능한 ComfyUI 서버(CLOUD_URL)가 없습니다.")
+
+        if render_fn is None and submit_fn is None:
+            raise ValueError("render_fn 또는 submit_fn 중 하나는 필요합니다.")
+
+        self.render_fn = render_fn
+        self.submit_fn = submit_fn
+        self.max_attempts = max_attempts
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.fail_fast = fail_fast
+        self.timeout = timeout
+        self.on_result = on_result
+
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._source_done = False
+        self._source_error: Optional[BaseException] = None
+        self._attempts: Dict[int, int] = {}
+        self._last_backend: Dict[int, str] = {}
+        self._running: Dict[int, Future] = {}
+        self._aborted: Optional[str] = None
+        self.results: Dict[int, object] = {}
+
+    # --- 상태 ---
+    def stats(self) -> List[dict]:
+        with self._cond:
+            return [b.snapshot() for b in self.backends]
+
+    def _in_flight(self) -> int:
+        return sum(b.in_flight for b in self.backends)
+
+    def probe(self):
+        """시작 전에 응답하지 않는 서버를 잠시 제외합니다. (모두 실패하면 아무것도 제외하지 않음)"""
+        alive = {b.url: check_backend_health(b.url) for b in self.backends}
+        if not any(alive.values()):
+            print("⚠️ 모든 ComfyUI 서버 상태 확인 실패. 그대로 시도합니다.")
+            return
+        for b in self.backends:
+            if not alive[b.url]:
+                print(f"⚠️ 서버 응답 없음, {self.cooldown}초 동안 제외: {b.url}")
+                b.disabled_until = time.time() + self.cooldown
+
+    # --- 스케줄링 ---
+    def _feed(self, items: Iterable[dict]):
+        """입력(리스트 또는 generator)을 대기열에 넣는 스레드. 중단(_abort)되면 입력을 더 읽지 않음"""
+        try:
+            for item in items:
+                with self._cond:
+                    if self._aborted:
+                        self.results.setdefault(item["segment"], SegmentCancelled(self._aborted))
+                        break
+                    self._pending.append(item)
+                    self._cond.notify_all()
+        except BaseException as e:
+            self._source_error = e
+        finally:
+            # 중단으로 끝까지 읽지 않은 generator도 바로 정리 (generator가 잡고 있는 자원 슬롯 등 해제)
+            close = getattr(items, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+            with self._cond:
+                self._source_done = True
+                self._cond.notify_all()
+
+    def _pick_backend(self, item: dict, now: float) -> Optional[Backend]:
+        """여유가 있는 서버 중 부하가 가장 적은 서버 선택 (직전에 실패한 서버는 가능하면 피함)"""
+        candidates = [b for b in self.backends if b.has_slot(now)]
+        if not candidates:
+            return None
+
+        last_url = self._last_backend.get(item["segment"])
+        others = [b for b in candidates if b.url != last_url]
+        if others:
+            candidates = others
+        elif last_url and any(b.url != last_url and b.is_healthy(now) for b in self.backends):
+            # 다른 정상 서버가 곧 비워질 예정이면 그 서버를 기다림
+            return None
+
+        return min(candidates, key=lambda b: (b.in_flight / b.capacity, b.failures))
+
+    def _next_ready(self, now: float):
+        """
+        대기열에서 지금 배정할 수 있는 첫 세그먼트의 (위치, 서버). 없으면 (None, None)
+        맨 앞의 재시도 세그먼트가 다른 서버를 기다리는 동안에도 뒤의 세그먼트는 배정합니다.
+        """
+        for position, item in enumerate(self._pending):
+            backend = self._pick_backend(item, now)
+            if backend is not None:
+                return position, backend
+        return None, None
+
+    def _next_wakeup(self, now: float) -> Optional[float]:
+        """제외된 서버 중 가장 먼저 복귀하는 서버까지 남은 시간 (없으면 완료 알림까지 대기)"""
+        disabled = [b.disabled_until - now for b in self.backends if not b.is_healthy(now)]
+        if disabled:
+            return max(0.1, min(disabled))
+        return None
+
+    def _abort(self, reason: str):
+        """남은 세그먼트를 모두 취소 처리하고 run()이 바로 반환되도록 합니다."""
+        if self._aborted:
+            return
+        self._aborted = reason
+        print(f"🛑 스케줄러 중단: {reason}")
+
+        for item in self._pending:
+            self.results.setdefault(item["segment"], SegmentCancelled(reason))
+        self._pending.clear()
+        for index, future in self._running.items():
+            self.results.setdefault(index, SegmentCancelled(reason))
+            future.cancel()
+
+    def _on_done(self, item: dict, backend: Backend, future):
+        index = item["segment"]
+        error = SegmentCancelled("cancelled") if future.cancelled() else future.exception()
+        completed = False
+
+        with self._cond:
+            backend.in_flight -= 1
+            self._running.pop(index, None)
+
+            if self._aborted:
+                # 이미 중단된 뒤 끝난 작업은 결과에 반영하지 않음
+                self._cond.notify_all()
+                return
+
+            if error is None:
+                backend.failures = 0
+                backend.completed += 1
+                self.results[index] = future.result()
+                completed = True
+                print(f"[*] 세그먼트 {index} 완료 ({backend.url})")
+            else:
+                backend.failures += 1
+                print(f"[Error] 세그먼트 {index} 실패 ({backend.url}): {error}")
+
+                if backend.failures >= self.failure_threshold:
+                    backend.disabled_until = time.time() + self.cooldown
+                    print(f"⚠️ 연속 {backend.failures}회 실패, {self.cooldown}초 동안 제외: {backend.url}")
+
+                if self._attempts[index] < self.max_attempts:
+                    # 재시도는 대기열 맨 앞에 넣어 먼저 처리
+                    self._pending.appendleft(item)
+                else:
+                    self.results[index] = error
+                    if self.fail_fast:
+                        self._abort(f"세그먼트 {index} 최종 실패: {error}")
+
+            self._cond.notify_all()
+
+        # 콜백은 lock 밖에서 호출 (오래 걸리거나 실패해도 스케줄링에 영향 없음)
+        if completed and self.on_result is not None:
+            try:
+                self.on_result(item, future.result())
+            except Exception as e:
+                print(f"⚠️ 세그먼트 {index} on_result 콜백 오류: {e}")
+
+    def run(self, items: Iterable[dict]) -> Dict[int, object]:
+        """
+        모든 세그먼트를 처리하고 {segment index: 결과 또는 예외}를 반환합니다.
+        items가 generator이면 항목이 생성되는 즉시 배정됩니다.
+        """
+        total_capacity = sum(b.capacity for b in self.backends)
+        print(f"[*] 스케줄러 시작: 서버 {len(self.backends)}대, 동시 실행 최대 {total_capacity}개")
+
+        # 입력 generator 안에서도 현재 작업의 workspace를 사용하도록 context 복사
+        feeder = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._feed, items),
+            daemon=True,
+        )
+        feeder.start()
+
+        deadline = time.time() + self.timeout if self.timeout else None
+        exe = ThreadPoolExecutor(max_workers=total_capacity) if self.submit_fn is None else None
+
+        try:
+            with self._cond:
+                while True:
+                    if self._aborted:
+                        break
+                    if self._source_done and not self._pending and self._in_flight() == 0:
+                        break
+
+                    now = time.time()
+                    if deadline and now >= deadline:
+                        self._abort(f"전체 대기 시간 초과 ({self.timeout}초)")
+                        break
+
+                    position, backend = self._next_ready(now)
+
+                    if backend is None:
+                        wakeup = self._next_wakeup(now)
+                        if deadline:
+                            wakeup = min(wakeup or deadline - now, deadline - now)
+                        self._cond.wait(timeout=wakeup)
+                        continue
+
+                    item = self._pending[position]
+                    del self._pending[position]
+                    index = item["segment"]
+                    self._attempts[index] = self._attempts.get(index, 0) + 1
+                    self._last_backend[index] = backend.url
+                    backend.in_flight += 1
+
+                    print(f"\n=== 세그먼트 {index} → {backend.url} (시도 {self._attempts[index]}/{self.max_attempts}) ===")
+
+                    if exe is None:
+                        future = self.submit_fn(item, backend.url)
+                    else:
+                        # 스레드에서도 현재 작업의 workspace를 사용하도록 context 복사
+                        ctx = contextvars.copy_context()
+                        future = exe.submit(ctx.run, self.render_fn, item, backend.url)
+
+                    self._running[index] = future
+                    future.add_done_callback(lambda f, item=item, backend=backend: self._on_done(item, backend, f))
+        finally:
+            # 중단된 경우 실행 중인 작업을 기다리지 않고 바로 반환
+            if exe is not None:
+                exe.shutdown(wait=not self._aborted, cancel_futures=True)
+
+        if not self._aborted:
+            feeder.join()
+        if self._source_error is not None:
+            raise self._source_error
+
+        with self._cond:
+            return dict(self.results)
+
@@ -1,17 +1,21 @@
 import json
 import os
-import shutil
-import time
-from typing import List
+from typing import Callable, Iterable, List, Optional
 from langchain_core.tools import tool
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from video.generate_video import generate_video_tool as gen_tool
+from progress.progress_events import emit
+from video.generate_video import render_segment
+from video.async_comfy_client import submit_segment
+from video.backend_scheduler import BackendScheduler, SegmentCancelled
+from workspace.job_workspace import get_workspace
 
-CONCURRENCY_LIMIT = 4
-GENERATED_VIDEO_DIR = "files/generated_videos"
-POLLING_TIMEOUT = 600  # 최대 대기 시간 (초) - 10분
-POLLING_INTERVAL = 5   # 확인 간격 (초)
+# 서버 1대가 동시에 처리할 세그먼트 수
+BACKEND_CAPACITY = int(os.getenv("COMFY_BACKEND_CAPACITY", "1"))
+# 영상 생성 전체(프롬프트 생성 + 모든 세그먼트 + 재시도) 최대 대기 시간 (초), 0이면 제한 없음
+# 세그먼트 1개의 대기 시간은 ComfyUI 클라이언트가 RENDER_TIMEOUT(600초)으로 제한
+RUN_TIMEOUT = float(os.getenv("COMFY_RUN_TIMEOUT", "0")) or None
+# 1이면 asyncio 클라이언트(연결 풀 + 서버당 WebSocket 1개) 사용, 0이면 기존 동기 클라이언트
+USE_ASYNC_CLIENT = os.getenv("COMFY_ASYNC_CLIENT", "1") == "1"
 
 CLOUD_URLS = [
     os.getenv("CLOUD_URL_1"),
@@ -21,98 +25,123 @@ CLOUD_URLS = [
 ]
 
 
-def _clear_generated_video_dir():
-    """files/generated_video 폴더를 완전히 비우는 함수"""
-    if os.path.exists(GENERATED_VIDEO_DIR):
-        shutil.rmtree(GENERATED_VIDEO_DIR)
-    os.makedirs(GENERATED_VIDEO_DIR, exist_ok=True)
+def _clear_generated_video_dir(keep_files: Optional[Iterable[str]] = None):
+    """현재 작업의 generated_videos 폴더를 비우는 함수 (keep_files에 있는 파일은 유지)"""
+    workspace = get_workspace()
+    if keep_files is None:
+        workspace.reset_generated_videos()
+        return
 
+    keep = {os.path.abspath(f) for f in keep_files}
+    os.makedirs(workspace.generated_videos_dir, exist_ok=True)
+    for name in os.listdir(workspace.generated_videos_dir):
+        path = os.path.join(workspace.generated_videos_dir, name)
+        if os.path.isfile(path) and os.path.abspath(path) not in keep:
+            os.remove(path)
 
-def call_generate_video(index: int, cloud_url: str):
-    """generate_video_tool 내부 실제 동기함수 호출"""
-    func = getattr(gen_tool, "func", None)
-    if callable(func):
-        return func(index=index, cloud_url=cloud_url)
 
-    if callable(getattr(gen_tool, "run", None)):
-        return gen_tool.run(index=index, cloud_url=cloud_url)
-
-    if callable(getattr(gen_tool, "invoke", None)):
-        return gen_tool.invoke(index=index, cloud_url=cloud_url)
+def summarize_results(results: dict, indexes: List[int]) -> dict:
+    """
+    스케줄러 결과를 세그먼트별 상태로 정리합니다.
+    → {index: {"status": "completed" | "failed" | "cancelled" | "missing", "files": [...], "error": str}}
+    """
+    summary = {}
+    for idx in indexes:
+        res = results.get(idx)
+        if res is None:
+            summary[idx] = {"status": "missing", "files": [], "error": "결과 없음"}
+        elif isinstance(res, SegmentCancelled):
+            summary[idx] = {"status": "cancelled", "files": [], "error": str(res)}
+        elif isinstance(res, Exception):
+            summary[idx] = {"status": "failed", "files": [], "error": str(res)}
+        else:
+            summary[idx] = {"status": "completed", "files": res.get("local_files", []), "error": None}
+    return summary
 
-    raise RuntimeError("generate_video_tool을 호출할 수 없습니다.")
 
+def _load_prompt_items(indexes: List[int]) -> List[dict]:
+    """video_prompt.json 을 한 번만 읽어 indexes 에 해당하는 항목을 반환"""
+    with open(get_workspace().video_prompt_path, "r", encoding="utf-8") as f:
+        data = {item["segment"]: item for item in json.load(f)}
 
-def chunk_list(lst, size):
-    for i in range(0, len(lst), size):
-        yield lst[i:i + size]
+    missing = [idx for idx in indexes if idx not in data]
+    if missing:
+        raise Exception(f"Index {missing} not found in video_prompt.json")
+    return [data[idx] for idx in indexes]
 
 
-def _wait_for_files(target_count: int):
+def stream_generate_videos(
+    items: Iterable[dict],
+    fail_fast: bool = True,
+    on_result: Optional[Callable[[dict, dict], None]] = None,
+    keep_files: Optional[Iterable[str]] = None,
+    total: Optional[int] = None,
+) -> dict:
     """
-    목표 파일 개수(target_count)만큼 파일이 생성될 때까지 대기하는 함수
+    프롬프트 항목이 하나씩 도착할 때마다(generator 가능) 비어 있는 ComfyUI 서버에 바로 영상 생성을 요청합니다.
+    프롬프트 생성(LLM)과 영상 생성(ComfyUI)이 겹쳐서 진행되어 전체 대기 시간이 줄어듭니다.
+    완료 여부는 각 요청의 결과로 바로 판단하며, fail_fast이면 재시도까지 실패한 세그먼트가 생기는 즉시 반환합니다.
+    on_result(item, result)는 세그먼트가 완료될 때마다 호출됩니다. (점진적 병합 등)
+    keep_files를 주면 generated_videos 폴더를 비울 때 그 파일들(이전 실행에서 완료된 세그먼트)은 남겨둡니다.
+    total은 진행 이벤트에 표시할 전체 세그먼트 수입니다.
+    반환값: {segment index: execute_workflow 결과 또는 예외}
     """
-    start_time = time.time()
-    print(f"[*] 파일 생성 대기 시작... (목표: {target_count}개)")
-
-    while True:
-        # 현재 디렉토리의 .mp4 파일 개수 확인
-        if os.path.exists(GENERATED_VIDEO_DIR):
-            files = [f for f in os.listdir(GENERATED_VIDEO_DIR) if f.endswith(".mp4")]
-            current_count = len(files)
-        else:
-            current_count = 0
-
-        # 목표 개수에 도달하면 대기 종료
-        if current_count >= target_count:
-            print(f"[*] 배치 작업 완료 확인: 현재 {current_count}개의 파일이 존재합니다.")
-            break
-
-        # 타임아웃 체크
-        if time.time() - start_time > POLLING_TIMEOUT:
-            raise TimeoutError(f"비디오 생성 대기 시간 초과 ({POLLING_TIMEOUT}초). 현재 파일 수: {current_count}")
-
-        print(f"   ...파일 생성 기다리는 중 ({current_count}/{target_count})")
-        time.sleep(POLLING_INTERVAL)
+    _clear_generated_video_dir(keep_files)
+
+    # on_result는 ComfyUI 루프 등 다른 스레드에서 호출될 수 있으므로 task_id를 미리 확보
+    task_id = get_workspace().task_id
+    completed = []
+
+    def _on_result(item: dict, result: dict):
+        completed.append(item["segment"])
+        emit("segment", task_id=task_id, segment=item["segment"], state="completed",
+             completed=len(completed), total=total)
+        if on_result is not None:
+            on_result(item, result)
+
+    scheduler = BackendScheduler(
+        CLOUD_URLS,
+        render_fn=None if USE_ASYNC_CLIENT else render_segment,
+        submit_fn=submit_segment if USE_ASYNC_CLIENT else None,
+        capacity=BACKEND_CAPACITY,
+        fail_fast=fail_fast,
+        timeout=RUN_TIMEOUT,
+        on_result=_on_result,
+    )
+    scheduler.probe()
+    results = scheduler.run(items)
+
+    for index, result in results.items():
+        if isinstance(result, Exception):
+            emit("segment", task_id=task_id, segment=index, state="failed", error=str(result),
+                 completed=len(completed), total=total)
+
+    print(f"\n[*] 영상 생성 완료: {len(results)}개 세그먼트, 서버 상태: {scheduler.stats()}")
+    return results
 
 
 @tool
-def batch_generate_video_tool(indexes: List[int]) -> None:
+def batch_generate_video_tool(indexes: List[int]) -> dict:
     """
     LangGraph가 어떤 index 리스트를 주든 무시하고
     무조건 index 1~8만 실행한다.
-    실행 시작할 때 files/generated_video 폴더를 비운다.
-    4개씩 끊어서 실행하며, 파일 생성을 확인한 후 다음 배치로 넘어간다.
+    실행 시작할 때 현재 작업의 generated_videos 폴더를 비운다.
+    세그먼트 대기열에서 비어 있는 서버가 다음 세그먼트를 가져가는 방식으로 실행한다.
     """
 
-    _clear_generated_video_dir()
-
     real_indexes = [1, 2, 3, 4, 5, 6, 7, 8]
-    accumulated_target_count = 0  # 누적 목표 파일 개수
-
-    print(f"[*] 총 {len(real_indexes)}개의 작업을 {CONCURRENCY_LIMIT}개씩 나누어 실행합니다.")
-
-    # chunk_list로 4개씩 잘라서 반복
-    for batch_idx, batch in enumerate(chunk_list(real_indexes, CONCURRENCY_LIMIT)):
-        print(f"\n=== [Batch {batch_idx + 1}] 시작: 인덱스 {batch} ===")
-        
-        # 1. 4개 작업 병렬 요청 (Request)
-        with ThreadPoolExecutor(max_workers=CONCURRENCY_LIMIT) as exe:
-            futures = []
-
-            for idx in batch:
-                # index 기반 URL 매핑
-                cloud_url = CLOUD_URLS[(idx - 1) % len(CLOUD_URLS)]
-                futures.append(exe.submit(call_generate_video, idx, cloud_url))
-
-            for fut in as_completed(futures):
-                try:
-                    _ = fut.result()
-                except Exception as e:
-                    print(f"[Error] 인덱스 요청 중 에러 발생: {e}")
-
-        # 2. 이번 배치의 파일들이 생성될 때까지 대기 (Polling)
-        accumulated_target_count += len(batch)
-        _wait_for_files(accumulated_target_count)
-
-    print("\n[*] 모든 배치 작업 및 파일 생성이 완료되었습니다.")
\ No newline at end of file
+    items = _load_prompt_items(real_indexes)
+
+    print(f"[*] 총 {len(real_indexes)}개의 작업을 비어 있는 서버에 순서대로 배정합니다.")
+    results = stream_generate_videos(items, total=len(items))
+
+    # 세그먼트별 상태 (파일 개수 폴링 대신 각 요청의 결과로 확인)
+    summary = summarize_results(results, real_indexes)
+    failed = [idx for idx, info in summary.items() if info["status"] != "completed"]
+
+    if failed:
+        print(f"\n[!] 영상 생성 실패 세그먼트: {failed}")
+    else:
+        print("\n[*] 모든 배치 작업 및 파일 생성이 완료되었습니다.")
+
+    return summary
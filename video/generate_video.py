@@ -6,10 +6,17 @@ import urllib.parse
 import requests
 import os
 import ssl
+import time
+from functools import lru_cache
 from itertools import cycle
 from langchain_core.tools import tool
 from dotenv import load_dotenv
 
+from common.download import download_file
+from common.file_hash import file_digest
+from video.upload_cache import REVALIDATE_SECONDS, content_filename, upload_cache
+from workspace.job_workspace import get_workspace
+
 load_dotenv()
 
 IMAGE_DIR = "images"
@@ -19,6 +26,32 @@ image_paths = [
 ]
 image_cycle = cycle(image_paths)
 
+WORKFLOW_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "video_workflow_api.json")
+# 세그먼트마다 값이 바뀌는 노드 (7: 저장 파일명, 12: 이미지, 13: 프롬프트/길이)
+PATCHED_NODE_IDS = ("7", "12", "13")
+# 세그먼트 1개 최대 대기 시간 (초)
+RENDER_TIMEOUT = 600
+
+
+@lru_cache(maxsize=1)
+def _load_workflow_template() -> dict:
+    """video_workflow_api.json 은 프로세스당 한 번만 읽어서 재사용"""
+    with open(WORKFLOW_TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def copy_workflow_template() -> dict:
+    """
+    캐시된 템플릿의 복사본. 값을 바꾸는 노드(7/12/13)의 inputs만 새로 복사하고
+    나머지 노드는 템플릿 객체를 그대로 공유합니다.
+    """
+    template = _load_workflow_template()
+    workflow = dict(template)
+    for node_id in PATCHED_NODE_IDS:
+        node = template[node_id]
+        workflow[node_id] = {**node, "inputs": dict(node["inputs"])}
+    return workflow
+
 
 class ComfyCloudClient:
     def __init__(self, base_url, auth_token=None, comfy_api_key=None):
@@ -36,11 +69,11 @@ class ComfyCloudClient:
         else:
             return self.base_url.replace("http://", "ws://")
 
-    def upload_image(self, image_path, overwrite=False):
+    def upload_image(self, image_path, overwrite=False, filename=None):
         url = f"{self.base_url}/upload/image"
         try:
             with open(image_path, 'rb') as f:
-                files = {'image': f}
+                files = {'image': (filename or os.path.basename(image_path), f)}
                 data = {'overwrite': str(overwrite).lower()}
                 response = requests.post(url, files=files, data=data, headers=self.headers)
         except FileNotFoundError:
@@ -51,6 +84,38 @@ class ComfyCloudClient:
         else:
             raise Exception(f"Image upload failed: {response.text}")
 
+    def ensure_image(self, image_path):
+        """
+        참조 이미지를 서버에 한 번만 올리고 서버 파일명을 반환합니다.
+        (WebSocket을 유지하지 않으므로 REVALIDATE_SECONDS 마다 서버에 파일이 있는지 다시 확인)
+        """
+        if not os.path.exists(image_path):
+            raise Exception(f"로컬에서 파일을 찾을 수 없습니다: {image_path}")
+
+        digest = file_digest(image_path)
+        server_name = upload_cache.get(self.base_url, digest, max_age=REVALIDATE_SECONDS)
+        if server_name:
+            return server_name
+
+        server_name = content_filename(image_path, digest)
+        try:
+            head = requests.head(
+                f"{self.base_url}/view",
+                params={"filename": server_name, "type": "input"},
+                headers=self.headers,
+                timeout=10,
+            )
+            exists = head.status_code == 200
+        except Exception:
+            exists = False
+
+        if not exists:
+            print(f"[*] Uploading image: {image_path} → {server_name}")
+            server_name = self.upload_image(image_path, overwrite=True, filename=server_name)['name']
+
+        upload_cache.put(self.base_url, digest, server_name)
+        return server_name
+
     def queue_prompt(self, workflow):
         url = f"{self.base_url}/prompt"
         
@@ -106,17 +171,20 @@ class ComfyCloudClient:
 
         return workflow
 
-    def execute_workflow(self, workflow_file_path):
-        with open(workflow_file_path, 'r', encoding='utf-8') as f:
-            workflow = json.load(f)
+    def execute_workflow(self, workflow, save_dir=None):
+        """workflow(dict, 또는 workflow json 파일 경로)를 실행하고 결과 파일을 save_dir에 저장합니다."""
+        if save_dir is None:
+            save_dir = get_workspace().generated_videos_dir
+
+        if isinstance(workflow, str):
+            with open(workflow, 'r', encoding='utf-8') as f:
+                workflow = json.load(f)
 
         # inject_prompt_to_workflow에서 넣어준 이미지 경로 읽기
         image_node_id = "12"
         local_image_path = workflow[image_node_id]["inputs"]["images"]
 
-        print(f"[*] Uploading image: {local_image_path}")
-        upload_resp = self.upload_image(local_image_path, overwrite=True)
-        server_filename = upload_resp['name']
+        server_filename = self.ensure_image(local_image_path)
 
         # ComfyUI workflow 이미지 노드 12번에 파일명 삽입
         workflow[image_node_id]["inputs"]["image"] = server_filename
@@ -143,7 +211,10 @@ class ComfyCloudClient:
             prompt_id = resp['prompt_id']
             print(f"[*] Prompt Queued. ID: {prompt_id}")
 
+            deadline = time.time() + RENDER_TIMEOUT
             while True:
+                if time.time() > deadline:
+                    raise TimeoutError(f"영상 생성 대기 시간 초과 ({RENDER_TIMEOUT}초, prompt {prompt_id})")
                 out = ws.recv()
                 if isinstance(out, str):
                     message = json.loads(out)
@@ -158,8 +229,10 @@ class ComfyCloudClient:
                             print(f"[-] Node Executing: {data['node']}")
                             
                     elif msg_type == 'execution_error':
-                        print(f"[!] Execution Error: {message['data']}")
-                        break
+                        if message['data'].get('prompt_id') == prompt_id:
+                            print(f"[!] Execution Error: {message['data']}")
+                            upload_cache.invalidate(self.base_url)
+                            raise Exception(f"ComfyUI execution error: {message['data'].get('exception_message', message['data'])}")
         finally:
             ws.close()
 
@@ -178,30 +251,34 @@ class ComfyCloudClient:
                         print(f"Output ({key}): {file_url}")
                         results.append(file_url)
 
-                        save_dir = os.path.join("files", "generated_videos")
                         os.makedirs(save_dir, exist_ok=True)
 
                         local_path = os.path.join(save_dir, item['filename'])
 
                         try:
-                            r = requests.get(file_url)
-                            r.raise_for_status()
-                            with open(local_path, "wb") as f:
-                                f.write(r.content)
+                            # 파일 전체를 메모리에 올리지 않고 스트리밍 저장
+                            download_file(file_url, local_path, headers=self.headers)
                             print(f"[*] Saved locally: {local_path}")
                             saved_files.append(local_path)
                         except Exception as e:
                             print(f"[!] Failed to save {file_url}: {e}")
                             continue
 
+        # 결과 파일이 하나도 저장되지 않았다면 실패로 처리 (호출하는 쪽에서 재시도)
+        if not saved_files:
+            raise Exception(f"No output files saved for prompt {prompt_id}")
+
         return {
             "urls": results,
             "local_files": saved_files
         }
 
 
-def load_prompt_by_index(index: int):
-    with open("files/video_prompt.json", "r") as f:
+def load_prompt_by_index(index: int, prompt_path: str = None):
+    if prompt_path is None:
+        prompt_path = get_workspace().video_prompt_path
+
+    with open(prompt_path, "r", encoding="utf-8") as f:
         data = json.load(f)
     for item in data:
         if item["segment"] == index:
@@ -209,6 +286,41 @@ def load_prompt_by_index(index: int):
     raise Exception(f"Index {index} not found in video_prompt.json")
 
 
+def build_workflow(item: dict) -> dict:
+    """캐시된 workflow 템플릿 복사본에 프롬프트 항목의 prompt/time/이미지를 넣어 반환합니다. (디스크 I/O 없음)"""
+    index = item["segment"]
+    prompt = item["prompt"]
+    time = item["time"]
+
+    print(f"[*] Using prompt index={index}")
+    print(f"    Time: {time}")
+    print(f"    Prompt: {prompt[:50]}...")
+
+    workflow = copy_workflow_template()
+
+    # inject prompt + time + image
+    return ComfyCloudClient.inject_prompt_to_workflow(workflow, prompt, time, index)
+
+
+def render_segment(item: dict, cloud_url: str) -> dict:
+    """
+    프롬프트 항목 하나({'segment', 'time', 'prompt', ...})로 영상을 생성합니다.
+    video_prompt.json을 거치지 않고 바로 호출할 수 있으며, 실패 시 예외를 발생시킵니다.
+    """
+    if cloud_url is None:
+        raise Exception("cloud_url parameter not provided")
+
+    COMFY_API_KEY= os.getenv("COMFY_API_KEY")
+    workspace = get_workspace()
+
+    print(f"    Cloud URL: {cloud_url}")
+    workflow = build_workflow(item)
+
+    # workflow는 파일로 저장하지 않고 메모리에서 바로 전달
+    client = ComfyCloudClient(cloud_url, auth_token=None, comfy_api_key=COMFY_API_KEY)
+    return client.execute_workflow(workflow, save_dir=workspace.generated_videos_dir)
+
+
 @tool
 def generate_video_tool(index: int, cloud_url: str = None) -> list:
     """
@@ -219,34 +331,9 @@ def generate_video_tool(index: int, cloud_url: str = None) -> list:
     if cloud_url is None:
         raise Exception("cloud_url parameter not provided")
 
-    COMFY_API_KEY= os.getenv("COMFY_API_KEY")
-    
     item = load_prompt_by_index(index)
-    prompt = item["prompt"]
-    time = item["time"]
 
-    print(f"[*] Using prompt index={index}")
-    print(f"    Cloud URL: {cloud_url}")
-    print(f"    Time: {time}")
-    print(f"    Prompt: {prompt[:50]}...")
-    
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    workflow_file_path = os.path.join(current_dir, "video_workflow_api.json")
-
-    with open(workflow_file_path, "r") as f:
-        workflow = json.load(f)
-    
-    # inject prompt + time + image
-    workflow = ComfyCloudClient.inject_prompt_to_workflow(workflow, prompt, time, index)
-
-    # 임시 workflow 저장
-    tmp_workflow_path = os.path.join(current_dir, f"workflow_index_{index}.json")
-    with open(tmp_workflow_path, "w") as f:
-        json.dump(workflow, f, indent=4)
-
-    client = ComfyCloudClient(cloud_url, auth_token=None, comfy_api_key=COMFY_API_KEY)
-    
     try:
-        return client.execute_workflow(tmp_workflow_path)
+        return render_segment(item, cloud_url)
     except Exception as e:
-        return [f"Error: {e}"]
\ No newline at end of file
+        return [f"Error: {e}"]
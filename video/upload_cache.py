@@ -0,0 +1,49 @@
+import os
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+# 동기 클라이언트(WebSocket 유지 안 함)는 이 시간이 지나면 서버에 파일이 있는지 다시 확인 (초)
+REVALIDATE_SECONDS = 300
+
+
+def content_filename(path: str, digest: str) -> str:
+    """내용 해시를 붙인 서버 저장용 파일명 (내용이 같으면 항상 같은 이름)"""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return f"{stem}_{digest[:12]}{ext}"
+
+
+class UploadCache:
+    """
+    ComfyUI 서버별로 이미 업로드한 이미지(내용 해시 → 서버 파일명)를 기억합니다.
+    서버가 재시작되면(WebSocket 재연결, 실행 오류) 해당 서버의 기록을 지웁니다.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, base_url: str, digest: str, max_age: Optional[float] = None) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get((base_url, digest))
+        if entry is None:
+            return None
+        name, stored_at = entry
+        if max_age is not None and time.time() - stored_at > max_age:
+            return None
+        return name
+
+    def put(self, base_url: str, digest: str, server_name: str):
+        with self._lock:
+            self._entries[(base_url, digest)] = (server_name, time.time())
+
+    def invalidate(self, base_url: str):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == base_url]
+            for key in stale:
+                del self._entries[key]
+        if stale:
+            print(f"[*] 업로드 캐시 초기화: {base_url} ({len(stale)}개)")
+
+
+upload_cache = UploadCache()
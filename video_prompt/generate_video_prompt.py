@@ -9,12 +9,15 @@ key = os.getenv("GOOGLE_API_KEY_GEMINI")
 from langchain_core.tools import tool
 from langchain_google_genai import ChatGoogleGenerativeAI
 
-from pydub import AudioSegment
+from common.media_info import get_duration
+from workspace.job_workspace import get_workspace
 
 load_dotenv()
 # key = os.getenv("GOOGLE_API_KEY_GEMINI") # 로컬 테스트용 
 
 TOTAL_SEGMENTS = 8
+# 동시에 보낼 LLM 프롬프트 생성 요청 수 (1이면 기존처럼 순차 실행)
+PROMPT_CONCURRENCY = int(os.getenv("VIDEO_PROMPT_CONCURRENCY", str(TOTAL_SEGMENTS)))
 THEME_STYLE = (
     "Futuristic sleek aesthetic, bright soft studio lighting, "
     "high fidelity, fluid motion, holographic UI elements, "
@@ -92,43 +95,9 @@ def get_lyrics_for_segment(subtitles, seg_start, seg_end):
     return " ".join(dict.fromkeys(segment_texts))
 
 
-@tool
-def generate_video_prompt_tool(srt_file_path: str) -> list:
-    """
-    mp3 길이를 기준으로 8분할 → 각 구간에 대응하는 SRT 가사 → LLM 프롬프트 생성
-    """
-
-    print(f"SRT 분석 시작: {srt_file_path}")
-
-    try:
-        subtitles = parse_srt(srt_file_path)
-    except FileNotFoundError as e:
-        return [str(e)]
-
-    mp3_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "files", "song.mp3")
-    if not os.path.exists(mp3_path):
-        return [f"song.mp3 파일을 찾을 수 없습니다: {mp3_path}"]
-
-    audio = AudioSegment.from_mp3(mp3_path)
-    total_duration = audio.duration_seconds
-
-    print(f"MP3 총 길이: {total_duration:.2f} 초")
-
-    segment_duration = total_duration / TOTAL_SEGMENTS
-    print(f"세그먼트 1개 길이: {segment_duration:.2f} 초")
-
-    results = []
-
-    for i in range(TOTAL_SEGMENTS):
-        seg_start = i * segment_duration
-        seg_end = (i + 1) * segment_duration
-        segment_time = int(round(segment_duration))
-
-        lyrics = get_lyrics_for_segment(subtitles, seg_start, seg_end)
-        if not lyrics:
-            lyrics = "(Instrumental/Transition)"
-
-        gemini_prompt = f"""
+def build_gemini_prompt(lyrics: str, segment_time: int) -> str:
+    """구간 가사와 길이로 영상 프롬프트 생성을 위한 LLM 입력을 만듭니다."""
+    return f"""
             You are an expert AI Video Prompt Engineer specialized in Image-to-Video generation.
             I have a REFERENCE IMAGE of a character. I need a prompt to animate this character within a specific consistent world.
 
@@ -153,31 +122,117 @@ def generate_video_prompt_tool(srt_file_path: str) -> list:
             Provide ONLY the final prompt string.
         """
 
-        print(f"[Segment {i+1}/{TOTAL_SEGMENTS}] LLM 프롬프트 생성 중...")
 
-        try:
-            response = llm.invoke(gemini_prompt)
-            generated_prompt = response.content.strip()
-        except Exception as e:
-            generated_prompt = f"LLM Error: {str(e)}"
+def plan_segments(srt_file_path: str, mp3_path: str) -> list:
+    """
+    mp3 길이를 기준으로 8분할하고, 각 구간에 해당하는 가사를 매칭합니다.
+    → [{'segment': int, 'time': int, 'start': float, 'end': float, 'lyrics': str}, ...]
+    start/end는 노래 기준 구간의 정확한 시간 (영상 길이 맞추기, 자막 나누기에 사용)
+    """
+    subtitles = parse_srt(srt_file_path)
+
+    if not os.path.exists(mp3_path):
+        raise FileNotFoundError(f"song.mp3 파일을 찾을 수 없습니다: {mp3_path}")
+
+    # 전체 디코딩 없이 mp3 헤더에서 길이 계산
+    total_duration = get_duration(mp3_path)
+
+    print(f"MP3 총 길이: {total_duration:.2f} 초")
+
+    segment_duration = total_duration / TOTAL_SEGMENTS
+    print(f"세그먼트 1개 길이: {segment_duration:.2f} 초")
 
-        results.append({
+    plan = []
+    for i in range(TOTAL_SEGMENTS):
+        seg_start = i * segment_duration
+        seg_end = (i + 1) * segment_duration
+
+        lyrics = get_lyrics_for_segment(subtitles, seg_start, seg_end)
+        if not lyrics:
+            lyrics = "(Instrumental/Transition)"
+
+        plan.append({
             "segment": i + 1,
-            "time": segment_time,
-            "lyrics": lyrics,
-            "prompt": generated_prompt
+            "time": int(round(segment_duration)),
+            "start": round(seg_start, 3),
+            "end": round(seg_end, 3),
+            "lyrics": lyrics
         })
 
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    parent_dir = os.path.dirname(current_dir)
-    files_dir = os.path.join(parent_dir, "files")
-    os.makedirs(files_dir, exist_ok=True)
+    return plan
+
+
+def fallback_prompt(lyrics: str) -> str:
+    """LLM 호출이 실패한 구간에 사용할 기본 프롬프트 (가사 + 공통 배경 + 스타일)."""
+    return (
+        f"The character is engaged with glowing holographic screens, reacting to the lyrics: \"{lyrics}\". "
+        f"{GLOBAL_BACKGROUND} {THEME_STYLE}"
+    )
+
+
+def iter_video_prompts(srt_file_path: str, mp3_path: str = None, concurrency: int = None):
+    """
+    구간별 영상 프롬프트를 동시에(최대 concurrency개) 생성하고, 완료되는 순서대로 바로 yield 합니다.
+    → 호출하는 쪽에서 프롬프트가 나오는 즉시 영상 생성을 시작할 수 있습니다.
+    LLM 호출이 실패한 구간은 fallback_prompt로 대체합니다.
+    """
+    if mp3_path is None:
+        mp3_path = get_workspace().song_path
+    if concurrency is None:
+        concurrency = PROMPT_CONCURRENCY
+
+    plan = plan_segments(srt_file_path, mp3_path)
+    inputs = [build_gemini_prompt(seg["lyrics"], seg["time"]) for seg in plan]
+
+    print(f"[*] {len(plan)}개 구간 LLM 프롬프트 생성 중... (동시 요청: {concurrency})")
+
+    responses = llm.batch_as_completed(
+        inputs,
+        config={"max_concurrency": max(1, concurrency)},
+        return_exceptions=True,
+    )
+
+    for i, response in responses:
+        seg = plan[i]
+
+        if isinstance(response, Exception):
+            print(f"⚠️ [Segment {seg['segment']}/{TOTAL_SEGMENTS}] LLM 오류, 기본 프롬프트 사용: {response}")
+            generated_prompt = fallback_prompt(seg["lyrics"])
+        else:
+            generated_prompt = (response.content or "").strip()
+            if not generated_prompt:
+                generated_prompt = fallback_prompt(seg["lyrics"])
+            print(f"[Segment {seg['segment']}/{TOTAL_SEGMENTS}] LLM 프롬프트 생성 완료")
+
+        yield {**seg, "prompt": generated_prompt}
+
 
-    save_path = os.path.join(files_dir, "video_prompt.json")
+def save_video_prompts(results: list, save_path: str = None) -> str:
+    """생성된 프롬프트 목록을 video_prompt.json 으로 저장합니다."""
+    if save_path is None:
+        save_path = get_workspace().video_prompt_path
 
+    results = sorted(results, key=lambda item: item["segment"])
     with open(save_path, "w", encoding="utf-8") as f:
         json.dump(results, f, indent=4, ensure_ascii=False)
 
     print(f"\n JSON 저장 완료: {save_path}")
+    return save_path
+
+
+@tool
+def generate_video_prompt_tool(srt_file_path: str) -> list:
+    """
+    mp3 길이를 기준으로 8분할 → 각 구간에 대응하는 SRT 가사 → LLM 프롬프트 생성
+    """
+
+    print(f"SRT 분석 시작: {srt_file_path}")
+
+    try:
+        results = list(iter_video_prompts(srt_file_path))
+    except FileNotFoundError as e:
+        return [str(e)]
+
+    save_video_prompts(results)
 
-    return [item["segment"] for item in results]
\ No newline at end of file
+    return sorted(item["segment"] for item in results)
@@ -0,0 +1,100 @@
+import os
+import shutil
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# 프로젝트 루트 기준 절대 경로 (실행 위치(cwd)와 무관하게 동일한 경로 사용)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILES_DIR = os.path.join(PROJECT_ROOT, "files")
+JOBS_DIR = os.path.join(FILES_DIR, "jobs")
+OUTPUT_FILES_DIR = os.path.join(PROJECT_ROOT, "output_files")
+
+
+class JobWorkspace:
+    """
+    작업(task_id) 하나가 사용하는 파일 경로 모음.
+    task_id가 있으면 files/jobs/{task_id}/ 와 output_files/{task_id}/ 를 사용하고,
+    없으면 (CLI, 단일 실행) 기존과 같은 files/ 와 output_files/ 를 사용합니다.
+    """
+
+    def __init__(self, task_id: Optional[str] = None):
+        self.task_id = task_id
+
+        if task_id:
+            self.root = os.path.join(JOBS_DIR, task_id)
+            self.output_dir = os.path.join(OUTPUT_FILES_DIR, task_id)
+        else:
+            self.root = FILES_DIR
+            self.output_dir = OUTPUT_FILES_DIR
+
+    @property
+    def lyrics_path(self) -> str:
+        return os.path.join(self.root, "lyrics.txt")
+
+    @property
+    def song_path(self) -> str:
+        return os.path.join(self.root, "song.mp3")
+
+    @property
+    def srt_path(self) -> str:
+        return os.path.join(self.root, "song.srt")
+
+    @property
+    def video_prompt_path(self) -> str:
+        return os.path.join(self.root, "video_prompt.json")
+
+    @property
+    def generated_videos_dir(self) -> str:
+        return os.path.join(self.root, "generated_videos")
+
+    def ensure(self) -> "JobWorkspace":
+        """작업 폴더들을 생성합니다."""
+        os.makedirs(self.root, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        return self
+
+    def reset_generated_videos(self):
+        """이 작업의 generated_videos 폴더만 비웁니다."""
+        if os.path.exists(self.generated_videos_dir):
+            shutil.rmtree(self.generated_videos_dir)
+        os.makedirs(self.generated_videos_dir, exist_ok=True)
+
+    def cleanup(self):
+        """작업 중간 파일(files/jobs/{task_id})을 삭제합니다. 결과물(output_dir)은 유지합니다."""
+        if self.task_id and os.path.exists(self.root):
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def remove(self):
+        """작업의 모든 파일(중간 파일 + 결과물 output_files/{task_id})을 삭제합니다. (작업 기록이 만료될 때)"""
+        self.cleanup()
+        if self.task_id and os.path.exists(self.output_dir):
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def __repr__(self):
+        return f"JobWorkspace(task_id={self.task_id!r}, root={self.root!r})"
+
+
+# 현재 실행 중인 작업의 workspace (asyncio task / 스레드 context 별로 분리됨)
+_current_workspace: ContextVar[Optional[JobWorkspace]] = ContextVar("current_workspace", default=None)
+
+
+def get_workspace() -> JobWorkspace:
+    """현재 context의 workspace를 반환합니다. 설정되지 않았다면 공용 workspace를 사용합니다."""
+    workspace = _current_workspace.get()
+    if workspace is None:
+        workspace = JobWorkspace()
+    return workspace.ensure()
+
+
+@contextmanager
+def use_workspace(workspace: JobWorkspace):
+    """
+    with 블록 안에서 호출되는 툴들이 지정한 workspace를 사용하도록 설정합니다.
+    LangChain은 동기 툴을 실행할 때 context를 복사하므로 툴 내부에서도 그대로 보입니다.
+    """
+    token = _current_workspace.set(workspace.ensure())
+    try:
+        yield workspace
+    finally:
+        _current_workspace.reset(token)